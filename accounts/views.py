@@ -2,13 +2,15 @@ from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.shortcuts import redirect, render, get_object_or_404
-from django.db.models import Count, Q
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 import json
 
 from campus.models import Bookmark, Tour, TourBookmark
+from campus.serializers import TourSerializer
 
 from .forms import CustomUserCreationForm, ProfileEditForm
 from .models import UserProfile, Friendship
@@ -43,11 +45,11 @@ def profile(request):
         TourBookmark.objects
         .filter(user=request.user)
         .select_related('tour')
+        .defer('tour__route_data')
     )
-    created_tours_qs = (
+    created_tours_qs = TourSerializer().prepare(
         Tour.objects
         .filter(user=request.user)
-        .prefetch_related('stops__location')
         .annotate(stop_total=Count('stops'))
     )
 
@@ -109,54 +111,60 @@ def edit_profile(request):
     return render(request, 'accounts/edit_profile.html', {'form': form})
 
 
+def _count_per_user(model):
+    """Correlated COUNT of ``model`` rows owned by each user, for annotate()."""
+    counts = model.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
 @login_required
 def discover_users(request):
     """Display public user profiles."""
     search_query = request.GET.get('search', '').strip()
 
-    # Get all users with public profiles (exclude current user)
-    users_qs = User.objects.exclude(id=request.user.id).select_related('profile')
-
-    # Filter out private profiles
-    public_users = []
-    for user in users_qs:
-        profile, _ = UserProfile.objects.get_or_create(user=user)
-        if not profile.is_private:
-            public_users.append(user)
+    # Public users (no profile yet means public), with their stats counted in the same query
+    users_qs = (
+        User.objects.exclude(id=request.user.id)
+        .exclude(profile__is_private=True)
+        .select_related('profile')
+        .annotate(
+            location_count=_count_per_user(Bookmark),
+            tour_count=_count_per_user(Tour),
+        )
+    )
 
     # Apply search filter if provided
     if search_query:
-        filtered_users = []
-        for user in public_users:
-            # Search in first name, last name, username, or affiliation
-            profile = user.profile
-            if (search_query.lower() in user.first_name.lower() or
-                search_query.lower() in user.last_name.lower() or
-                search_query.lower() in user.username.lower() or
-                search_query.lower() in profile.affiliation.lower()):
-                filtered_users.append(user)
-        public_users = filtered_users
-
-    # Annotate with stats
+        users_qs = users_qs.filter(
+            Q(first_name__icontains=search_query) |
+            Q(last_name__icontains=search_query) |
+            Q(username__icontains=search_query) |
+            Q(profile__affiliation__icontains=search_query)
+        )
+
+    public_users = list(users_qs)
+    missing_profiles = [user for user in public_users if not hasattr(user, 'profile')]
+    if missing_profiles:
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user) for user in missing_profiles], ignore_conflicts=True
+        )
+        for user in missing_profiles:
+            user.profile = UserProfile(user=user)
+
     user_data = []
     for user in public_users:
-        profile = user.profile
         full_name = user.get_full_name().strip()
         display_name = full_name if full_name else user.username
         name_for_initial = user.first_name or user.username or '?'
         initial = name_for_initial[0].upper()
 
-        # Get stats
-        location_count = Bookmark.objects.filter(user=user).count()
-        tour_count = Tour.objects.filter(user=user).count()
-
         user_data.append({
             'user': user,
-            'profile': profile,
+            'profile': user.profile,
             'display_name': display_name,
             'initial': initial,
-            'location_count': location_count,
-            'tour_count': tour_count,
+            'location_count': user.location_count,
+            'tour_count': user.tour_count,
         })
 
     context = {
@@ -188,12 +196,11 @@ def view_user_profile(request, username):
         .filter(user=user)
         .select_related('location')
     )
-    created_tours = list(
+    created_tours = list(TourSerializer().prepare(
         Tour.objects
         .filter(user=user)
-        .prefetch_related('stops__location')
         .annotate(stop_total=Count('stops'))
-    )
+    ))
 
     full_name = user.get_full_name().strip()
     display_name = full_name if full_name else user.username
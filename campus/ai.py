@@ -9,6 +9,8 @@ from django.contrib.auth.models import User
 from pydantic_ai import Agent, RunContext
 from pydantic_ai.models import ModelSettings
 
+from .metrics import external_call
+
 
 class CampusAiError(Exception):
     """Raised when the campus AI assistant cannot be prepared."""
@@ -93,45 +95,23 @@ def _build_agent() -> Agent[TourAgentDeps, str]:
             tour_description: Brief description of the tour theme
             location_ids: Ordered list of location IDs to visit
         """
-        from .models import Tour, TourStop
-        from .route_utils import calculate_route_segments, RouteCalculationError
+        from .tours import TourWriteError, save_tour
 
         user = ctx.deps.user
         locations_map = ctx.deps.locations_map
 
         valid_locations = []
         for loc_id in location_ids:
-            if loc_id in locations_map:
+            if loc_id in locations_map and locations_map[loc_id] not in valid_locations:
                 valid_locations.append(locations_map[loc_id])
 
         if not valid_locations:
             return "Error: None of the specified locations were found."
 
-        tour = Tour.objects.create(
-            user=user,
-            name=tour_name,
-            description=tour_description,
-        )
-
-        for order, location in enumerate(valid_locations, start=1):
-            TourStop.objects.create(tour=tour, location=location, order=order)
-
-        if len(valid_locations) >= 2:
-            stops_data = [
-                {
-                    'id': loc.id,
-                    'name': loc.name,
-                    'latitude': float(loc.latitude),
-                    'longitude': float(loc.longitude),
-                }
-                for loc in valid_locations
-            ]
-            try:
-                route_segments = calculate_route_segments(stops_data)
-                tour.route_data = {'segments': route_segments} if route_segments else None
-                tour.save()
-            except (RouteCalculationError, Exception):
-                pass
+        try:
+            tour = save_tour(user, tour_name, tour_description, [loc.id for loc in valid_locations])
+        except TourWriteError as e:
+            return f"Error: {e}"
 
         ctx.deps.created_tour_id = tour.id
 
@@ -180,7 +160,6 @@ def run_landmark_chat(
     landmark_context: str,
     deps: Optional[TourAgentDeps] = None,
 ) -> ChatResult:
-    agent = _build_agent()
     history_text = _format_history(history)
 
     prompt_parts = [
@@ -197,7 +176,9 @@ def run_landmark_chat(
 
     prompt = "".join(prompt_parts)
 
-    result = agent.run_sync(prompt, deps=deps)
+    with external_call('llm'):
+        agent = _build_agent()
+        result = agent.run_sync(prompt, deps=deps)
 
     created_tour_id = deps.created_tour_id if deps else None
     return ChatResult(reply=result.output, created_tour_id=created_tour_id)
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CampusConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'campus'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import install_search_index_after_migrate
+
+        post_migrate.connect(install_search_index_after_migrate, sender=self)
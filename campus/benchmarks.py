@@ -0,0 +1,103 @@
+"""
+Timing endpoints in-process, for comparing performance across commits.
+
+``benchmark`` requests a URL through Django's test client (no server, no
+network) a number of times after a few warm-up requests, and reports latency
+percentiles, the SQL queries per request and the peak memory Python allocated
+while handling one. Results are plain dicts, so ``manage.py
+benchmark_endpoints`` can write them out as JSON and diff two runs.
+
+Pair it with ``manage.py generate_load_data`` to see how the views scale.
+"""
+import math
+import statistics
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values: Sequence[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of ``values``; ``fraction`` is between 0 and 1."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies_ms: Sequence[float]) -> Dict[str, Any]:
+    return {
+        'count': len(latencies_ms),
+        'p50_ms': round(percentile(latencies_ms, 0.50), 2) if latencies_ms else None,
+        'p95_ms': round(percentile(latencies_ms, 0.95), 2) if latencies_ms else None,
+        'mean_ms': round(statistics.fmean(latencies_ms), 2) if latencies_ms else None,
+        'max_ms': round(max(latencies_ms), 2) if latencies_ms else None,
+    }
+
+
+def benchmark_client(user=None, raise_request_exception: bool = True) -> Client:
+    """A test client for an allowed host, logged in as ``user`` when given."""
+    hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '')]
+    client = Client(
+        HTTP_HOST=hosts[0].lstrip('.') if hosts else 'localhost',
+        raise_request_exception=raise_request_exception,
+    )
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+def benchmark(client: Client, url: str, iterations: int = 20, warmup: int = 2) -> Dict[str, Any]:
+    """Request ``url`` ``iterations`` times and summarize latency, queries and memory."""
+    for _ in range(warmup):
+        client.get(url)
+
+    latencies: List[float] = []
+    query_counts: List[int] = []
+    peaks: List[int] = []
+    statuses = set()
+    for _ in range(iterations):
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                latencies.append((time.perf_counter() - started) * 1000)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        query_counts.append(len(queries))
+        statuses.add(response.status_code)
+
+    # tracemalloc slows allocation-heavy code down, so latency is measured
+    # with it running every time rather than only sometimes.
+    return {
+        'url': url,
+        'status': sorted(statuses),
+        **latency_summary(latencies),
+        'queries': max(query_counts),
+        'peak_memory_kb': round(max(peaks) / 1024, 1),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-endpoint changes from ``baseline`` to ``current`` (both ``benchmark_endpoints`` outputs)."""
+    changes = []
+    for name, result in current.get('endpoints', {}).items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        change = {'endpoint': name}
+        for metric in ('p50_ms', 'p95_ms', 'queries', 'peak_memory_kb'):
+            if before.get(metric) is None or result.get(metric) is None:
+                continue
+            change[metric] = round(result[metric] - before[metric], 2)
+            if before[metric]:
+                change[f'{metric}_pct'] = round((result[metric] - before[metric]) * 100 / before[metric], 1)
+        changes.append(change)
+    return changes
@@ -0,0 +1,67 @@
+"""
+Versioned cache of the serialized location catalog.
+
+Every page that shows the campus map needs every Location as a dict. Building
+that list is the same work for every visitor, so it is done once per catalog
+version and kept both in Django's shared cache (for other worker processes) and
+in a process-local slot (so steady-state reads don't even deserialize).
+
+The version (``campus.versions.catalog_version``) changes whenever a Location,
+or anything folded into its serialized form, is saved or deleted; see
+``campus.signals``.
+"""
+import json
+from typing import Any, Dict, List, Tuple
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .metrics import cache_lookup
+from .models import Location
+from .serializers import serialize_location
+from .versions import catalog_version
+
+CATALOG_TIMEOUT = 60 * 60 * 24
+
+# Same escaping Django's json_script filter applies.
+_SCRIPT_ESCAPES = {ord('>'): '\\u003E', ord('<'): '\\u003C', ord('&'): '\\u0026'}
+
+# (version, rows, rows_by_id, embeddable_json); swapped as one tuple so readers
+# on other threads never observe a half-updated slot.
+_local_catalog: Tuple[Any, ...] = (None, None, None, None)
+
+
+def build_catalog() -> List[Dict[str, Any]]:
+    return [serialize_location(location) for location in Location.objects.all()]
+
+
+def _load() -> Tuple[Any, ...]:
+    global _local_catalog
+    version = catalog_version()
+    if _local_catalog[0] == version:
+        cache_lookup('catalog', True)
+        return _local_catalog
+
+    rows = cache.get(f'campus:catalog:rows:{version}')
+    cache_lookup('catalog', rows is not None)
+    if rows is None:
+        rows = build_catalog()
+        cache.set(f'campus:catalog:rows:{version}', rows, CATALOG_TIMEOUT)
+
+    blob = json.dumps(rows, cls=DjangoJSONEncoder).translate(_SCRIPT_ESCAPES)
+    _local_catalog = (version, rows, {row['id']: row for row in rows}, blob)
+    return _local_catalog
+
+
+def get_catalog() -> List[Dict[str, Any]]:
+    """Serialized locations in name order. Shared between requests: do not mutate."""
+    return _load()[1]
+
+
+def get_catalog_by_id() -> Dict[int, Dict[str, Any]]:
+    return _load()[2]
+
+
+def get_catalog_json() -> str:
+    """The catalog as JSON already escaped for embedding in a <script> tag."""
+    return _load()[3]
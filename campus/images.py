@@ -0,0 +1,186 @@
+"""
+Resized derivatives of uploaded Location photos.
+
+Originals can be several megabytes, so every upload is rendered into a few
+widths (``DERIVATIVE_WIDTHS``) in WebP and JPEG. Rendering runs on a small
+thread pool after the saving transaction commits; the results, the original's
+dimensions, an inline placeholder, the dominant colour and the source file
+name are written back onto the Location, and serialized payloads expose them
+(the derivatives as ``srcset`` strings). Derivatives live in the
+content-addressed storage, so their URLs are immutable too.
+
+Set ``IMAGE_DERIVATIVES_INLINE = True`` (e.g. in tests) to render in the
+calling thread instead of the pool.
+"""
+import base64
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .metrics import register_gauge
+from .models import Location, LocationChange
+from .storage import content_addressed_storage
+from .versions import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Name -> maximum width in pixels. Images are never upscaled.
+DERIVATIVE_WIDTHS = {
+    'thumb': 320,
+    'card': 640,
+    'hero': 1600,
+}
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DERIVATIVE_DIR = 'locations/derivatives'
+# Longest side of the inline placeholder, in pixels.
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2),
+            thread_name_prefix='image-derivatives',
+        )
+    return _executor
+
+
+def queue_depth() -> int:
+    """Renders submitted but not yet picked up by a worker."""
+    return _executor._work_queue.qsize() if _executor is not None else 0
+
+
+register_gauge('campus_image_derivative_queue_depth', 'Photo derivative renders waiting for a worker.', queue_depth)
+
+
+def needs_derivatives(location) -> bool:
+    source = location.photo.name if location.photo else ''
+    return (location.photo_derivatives or {}).get('source', '') != source
+
+
+def render_derivatives(source_bytes: bytes) -> Dict[str, Any]:
+    """Render every size/format; returns the original size and {name: (width, height, {fmt: bytes})}."""
+    with Image.open(io.BytesIO(source_bytes)) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image = image.convert('RGB')
+
+    rendered = {}
+    for name, max_width in DERIVATIVE_WIDTHS.items():
+        resized = image
+        if image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            resized = image.resize((max_width, height), Image.LANCZOS)
+        encoded = {}
+        for fmt, (pil_format, options) in DERIVATIVE_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            encoded[fmt] = buffer.getvalue()
+        rendered[name] = (resized.width, resized.height, encoded)
+    return {
+        'width': image.width,
+        'height': image.height,
+        'derivatives': rendered,
+        'placeholder': render_placeholder(image),
+        'color': dominant_color(image),
+    }
+
+
+def render_placeholder(image: Image.Image) -> str:
+    """A blurry, few-hundred-byte WebP of the image as a data: URI, shown while the photo loads."""
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def dominant_color(image: Image.Image) -> str:
+    """Average colour of the image as #rrggbb."""
+    red, green, blue = image.resize((1, 1), Image.BOX).getpixel((0, 0))[:3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def generate_location_derivatives(location_id: int, force: bool = False) -> bool:
+    """
+    Render and store derivatives for a location's current photo; returns True when updated.
+
+    ``force`` re-renders even when the stored derivatives match the photo, e.g.
+    to backfill fields added since they were rendered.
+    """
+    location = Location.objects.filter(pk=location_id).only('id', 'slug', 'photo', 'photo_derivatives').first()
+    if location is None or not (force or needs_derivatives(location)):
+        return False
+
+    updates: Dict[str, Any] = {
+        'photo_width': None,
+        'photo_height': None,
+        'photo_derivatives': {},
+        'photo_placeholder': '',
+        'photo_color': '',
+    }
+    if location.photo:
+        try:
+            with location.photo.open('rb') as photo:
+                source_bytes = photo.read()
+            rendered = render_derivatives(source_bytes)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.error(f"Could not render derivatives for location {location_id}: {e}")
+            return False
+
+        variants: List[Dict[str, Any]] = []
+        for name, (width, height, encoded) in rendered['derivatives'].items():
+            variant = {'name': name, 'width': width, 'height': height}
+            for fmt, data in encoded.items():
+                # Content-addressed: re-rendering identical output reuses the stored file.
+                variant[fmt] = content_addressed_storage.save(f'{DERIVATIVE_DIR}/{name}.{fmt}', ContentFile(data))
+            variants.append(variant)
+        updates = {
+            'photo_width': rendered['width'],
+            'photo_height': rendered['height'],
+            'photo_derivatives': {'source': location.photo.name, 'variants': variants},
+            'photo_placeholder': rendered['placeholder'],
+            'photo_color': rendered['color'],
+        }
+
+    # Only write if the photo is still the one we rendered.
+    if location.photo:
+        unchanged = Q(photo=location.photo.name)
+    else:
+        unchanged = Q(photo='') | Q(photo__isnull=True)
+    updated = Location.objects.filter(unchanged, pk=location_id).update(**updates)
+    if updated:
+        # update() sends no signals; publish the new payload like a save would.
+        LocationChange.objects.create(location_id=location_id, slug=location.slug, action='upsert')
+        bump_catalog_version()
+    return bool(updated)
+
+
+def _run_in_worker(location_id: int) -> None:
+    try:
+        generate_location_derivatives(location_id)
+    except Exception:  # noqa: BLE001 - never let a worker thread die silently
+        logger.exception(f"Derivative generation failed for location {location_id}")
+    finally:
+        # Pool threads are long-lived; don't leave their connections open.
+        connections.close_all()
+
+
+def schedule_derivatives(location_id: int) -> None:
+    if getattr(settings, 'IMAGE_DERIVATIVES_INLINE', False):
+        generate_location_derivatives(location_id)
+    else:
+        _get_executor().submit(_run_in_worker, location_id)
@@ -0,0 +1,320 @@
+"""
+Concurrent, mixed-scenario load tests run inside one process.
+
+``run_load_test`` starts one thread per virtual user. Each thread logs in as
+a real user through its own Django test client and repeatedly picks a
+weighted scenario from ``SCENARIOS``: browsing the overview, toggling a
+bookmark, rating, creating a tour, sharing one and chatting. Requests go
+through the full middleware and view stack; each thread has its own database
+connection, so concurrent writes contend for the SQLite lock as they would
+under a threaded server.
+
+The Google Directions API and the LLM are swapped for local stand-ins
+(``stand_ins``) that sleep for a configurable latency and return well-formed
+results, so runs cost nothing and measure this app rather than the network.
+
+The report has per-scenario throughput, latency percentiles and a latency
+histogram, and errors grouped by kind. Exceptions raised inside views are
+classified too; ``database_locked`` counts SQLite "database is locked"
+errors. ``manage.py load_test`` runs it from the command line.
+"""
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+from django.db.models import Q
+from django.urls import reverse
+
+from accounts.models import Friendship
+
+from .ai import ChatResult
+from .benchmarks import benchmark_client, latency_summary
+from .models import Location, Tour
+from .route_utils import encode_polyline
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, math.inf)
+DEFAULT_WEIGHTS = {
+    'browse': 50,
+    'bookmark': 15,
+    'rate': 15,
+    'create_tour': 8,
+    'share': 7,
+    'chat': 5,
+}
+# Error kind of scenario runs that sent no request; not counted as failures.
+SKIPPED = 'skipped'
+# Rough walking speed of the Directions stand-in, in metres per second.
+WALKING_SPEED = 1.4
+
+_request_errors = threading.local()
+
+
+def _remember_exception(sender, request=None, **kwargs):
+    # Sent from the thread handling the request, while the exception is active.
+    _request_errors.exception = sys.exc_info()[1]
+
+
+def classify_error(status_code: Optional[int], exception: Optional[BaseException]) -> Optional[str]:
+    """The kind of a failed request, or None when it succeeded."""
+    if exception is not None:
+        if isinstance(exception, OperationalError) and 'locked' in str(exception):
+            return 'database_locked'
+        return type(exception).__name__
+    if status_code is None or status_code >= 400:
+        return f'http_{status_code}'
+    return None
+
+
+def _distance_meters(origin: Dict[str, Any], destination: Dict[str, Any]) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (
+        float(origin['latitude']), float(origin['longitude']),
+        float(destination['latitude']), float(destination['longitude']),
+    ))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+def stand_in_route_segments(stops: List[Dict[str, Any]], latency_ms: float = 0) -> List[Dict[str, Any]]:
+    """Straight-line walking legs shaped like ``route_utils.calculate_route_segments`` output."""
+    segments = []
+    for index, (origin, destination) in enumerate(zip(stops, stops[1:])):
+        time.sleep(latency_ms / 1000)
+        meters = round(_distance_meters(origin, destination))
+        seconds = round(meters / WALKING_SPEED)
+        segments.append({
+            'segment_index': index,
+            'origin': {'location_id': origin['id'], 'name': origin['name'], 'lat': origin['latitude'], 'lng': origin['longitude']},
+            'destination': {
+                'location_id': destination['id'], 'name': destination['name'],
+                'lat': destination['latitude'], 'lng': destination['longitude'],
+            },
+            'distance': f'{meters} m',
+            'duration': f'{max(1, seconds // 60)} mins',
+            'distance_meters': meters,
+            'duration_seconds': seconds,
+            'polyline': encode_polyline([
+                (float(origin['latitude']), float(origin['longitude'])),
+                (float(destination['latitude']), float(destination['longitude'])),
+            ]),
+            'steps': [],
+        })
+    return segments
+
+
+@contextmanager
+def stand_ins(directions_latency_ms: float = 50, llm_latency_ms: float = 800):
+    """Route Directions and LLM calls to local stand-ins for the duration of the block."""
+    def route_segments(stops):
+        return stand_in_route_segments(stops, directions_latency_ms)
+
+    def landmark_chat(question, *, history, landmark_context, deps=None):
+        time.sleep(llm_latency_ms / 1000)
+        return ChatResult(reply=f'Stand-in answer to: {question[:80]}')
+
+    with mock.patch('campus.route_utils.calculate_route_segments', route_segments), \
+            mock.patch('campus.views.run_landmark_chat', landmark_chat):
+        yield
+
+
+class VirtualUser:
+    """One simulated visitor: a logged-in client plus what it knows about its data."""
+
+    def __init__(self, user: User, location_ids: List[int], slugs: List[str], rng: random.Random):
+        self.user = user
+        # Exceptions are reported through got_request_exception instead, whose
+        # receivers every thread's client shares.
+        self.client = benchmark_client(user, raise_request_exception=False)
+        self.location_ids = location_ids
+        self.slugs = slugs
+        self.rng = rng
+        self.tour_ids = list(Tour.objects.filter(user=user).values_list('id', flat=True)[:50])
+        friendships = Friendship.objects.filter(
+            Q(from_user=user) | Q(to_user=user), status='accepted',
+        ).values_list('from_user_id', 'to_user_id')[:50]
+        self.friend_ids = [from_id if to_id == user.id else to_id for from_id, to_id in friendships]
+        self.samples: List[tuple] = []
+
+    def request(self, scenario: str, method: str, url: str, payload: Optional[dict] = None):
+        kwargs = {}
+        if payload is not None:
+            kwargs = {'data': json.dumps(payload), 'content_type': 'application/json'}
+        _request_errors.exception = None
+        started = time.perf_counter()
+        try:
+            response = getattr(self.client, method)(url, **kwargs)
+            status_code, exception = response.status_code, _request_errors.exception
+        except Exception as exc:  # noqa: BLE001 - a failed request is a result, not a crash
+            response, status_code, exception = None, None, exc
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.samples.append((scenario, elapsed_ms, classify_error(status_code, exception)))
+        return response if response is not None and status_code < 400 else None
+
+
+def browse(vu: VirtualUser) -> None:
+    vu.request('browse', 'get', reverse('campus:overview'))
+    vu.request('browse', 'get', reverse('campus:tour-list'))
+    vu.request('browse', 'get', reverse('campus:location-detail', args=[vu.rng.choice(vu.slugs)]))
+
+
+def bookmark(vu: VirtualUser) -> None:
+    vu.request('bookmark', 'post', reverse('campus:toggle-bookmark', args=[vu.rng.choice(vu.slugs)]))
+
+
+def rate(vu: VirtualUser) -> None:
+    vu.request('rate', 'post', reverse('campus:rate_location', args=[vu.rng.choice(vu.slugs)]), {
+        'score': vu.rng.randint(1, 5),
+        'comment': vu.rng.choice(['', '', 'Load test comment.']),
+    })
+
+
+def create_tour(vu: VirtualUser) -> None:
+    stops = vu.rng.sample(vu.location_ids, min(len(vu.location_ids), vu.rng.randint(2, 6)))
+    response = vu.request('create_tour', 'post', reverse('campus:tour-list'), {
+        'name': f'Load tour {vu.rng.randrange(10 ** 6)}',
+        'description': 'Created by the load test.',
+        'location_ids': stops,
+    })
+    if response is not None:
+        vu.tour_ids.append(response.json()['id'])
+
+
+def share(vu: VirtualUser) -> None:
+    if not vu.tour_ids or not vu.friend_ids:
+        # Nothing to share yet, e.g. every create_tour so far lost the lock.
+        vu.samples.append(('share', None, SKIPPED))
+        return
+    friend_ids = vu.rng.sample(vu.friend_ids, min(len(vu.friend_ids), 3))
+    vu.request('share', 'post', reverse('campus:share_tour', args=[vu.rng.choice(vu.tour_ids)]), {
+        'friend_ids': friend_ids,
+    })
+
+
+def chat(vu: VirtualUser) -> None:
+    vu.request('chat', 'post', reverse('campus:chat'), {
+        'message': 'What should I see near Tech Tower?',
+        'history': [],
+    })
+
+
+SCENARIOS: Dict[str, Callable[[VirtualUser], None]] = {
+    'browse': browse,
+    'bookmark': bookmark,
+    'rate': rate,
+    'create_tour': create_tour,
+    'share': share,
+    'chat': chat,
+}
+
+
+def _histogram(latencies_ms: List[float]) -> Dict[str, int]:
+    counts = Counter(next(bound for bound in HISTOGRAM_BUCKETS_MS if latency <= bound) for latency in latencies_ms)
+    return {f'le_{bound:g}' if bound != math.inf else 'le_inf': counts[bound] for bound in HISTOGRAM_BUCKETS_MS}
+
+
+def summarize(samples: List[tuple], elapsed_seconds: float) -> Dict[str, Any]:
+    """
+    Report for ``(scenario, latency_ms, error)`` samples taken over ``elapsed_seconds``.
+
+    Skipped runs (latency None, error ``SKIPPED``) are counted per scenario but
+    left out of throughput, latency and error rates.
+    """
+    by_scenario = defaultdict(list)
+    for sample in samples:
+        by_scenario[sample[0]].append(sample)
+
+    def section(group):
+        sent = [sample for sample in group if sample[2] != SKIPPED]
+        latencies = [latency for _, latency, _ in sent]
+        errors = Counter(error for _, _, error in sent if error)
+        return {
+            'throughput_rps': round(len(sent) / elapsed_seconds, 2) if elapsed_seconds else None,
+            **latency_summary(latencies),
+            'error_rate': round(sum(errors.values()) / len(sent), 4) if sent else 0,
+            'errors': dict(errors.most_common()),
+            'skipped': len(group) - len(sent),
+            'histogram': _histogram(latencies),
+        }
+
+    report = section(samples)
+    report['elapsed_seconds'] = round(elapsed_seconds, 2)
+    report['database_locked'] = report['errors'].get('database_locked', 0)
+    report['scenarios'] = {name: section(group) for name, group in sorted(by_scenario.items())}
+    return report
+
+
+def run_load_test(
+    concurrency: int = 8,
+    duration: float = 30,
+    iterations: Optional[int] = None,
+    weights: Optional[Dict[str, int]] = None,
+    users: Optional[List[User]] = None,
+    seed: int = 2340,
+    directions_latency_ms: float = 50,
+    llm_latency_ms: float = 800,
+) -> Dict[str, Any]:
+    """
+    Run ``concurrency`` virtual users until ``duration`` seconds pass (or
+    each has run ``iterations`` scenarios) and return the report.
+
+    ``users`` defaults to the first ``concurrency`` active non-staff users.
+    """
+    weights = {name: weight for name, weight in (weights or DEFAULT_WEIGHTS).items() if weight > 0}
+    unknown = set(weights) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if users is None:
+        users = list(User.objects.filter(is_active=True, is_staff=False).order_by('id')[:concurrency])
+    locations = list(Location.objects.order_by('id').values_list('id', 'slug')[:5000])
+    if not users or len(locations) < 2:
+        raise ValueError('A load test needs at least one user and two locations.')
+
+    location_ids = [location_id for location_id, _ in locations]
+    slugs = [slug for _, slug in locations]
+    rng = random.Random(seed)
+    virtual_users = [
+        VirtualUser(users[index % len(users)], location_ids, slugs, random.Random(rng.random()))
+        for index in range(concurrency)
+    ]
+    names, scenario_weights = zip(*weights.items())
+
+    def worker(vu: VirtualUser, deadline: float):
+        try:
+            runs = 0
+            while time.perf_counter() < deadline and (iterations is None or runs < iterations):
+                SCENARIOS[vu.rng.choices(names, scenario_weights)[0]](vu)
+                runs += 1
+        finally:
+            # Each thread opened its own connection.
+            connections.close_all()
+
+    got_request_exception.connect(_remember_exception, dispatch_uid='campus-load-test')
+    try:
+        with stand_ins(directions_latency_ms, llm_latency_ms):
+            started = time.perf_counter()
+            deadline = started + duration if iterations is None else math.inf
+            threads = [
+                threading.Thread(target=worker, args=(vu, deadline), name=f'load-test-{index}')
+                for index, vu in enumerate(virtual_users)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+    finally:
+        got_request_exception.disconnect(dispatch_uid='campus-load-test')
+
+    report = summarize([sample for vu in virtual_users for sample in vu.samples], elapsed)
+    report.update({'concurrency': concurrency, 'weights': weights})
+    return report
@@ -0,0 +1,89 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from campus.benchmarks import benchmark, benchmark_client, compare
+
+# Name -> (URL name, needs a staff user).
+ENDPOINTS = {
+    'campus_overview': ('campus:overview', False),
+    'tour_list': ('campus:tour-list', False),
+    'feedback_dashboard': ('campus:feedback_dashboard', True),
+    'discover_users': ('accounts:discover', False),
+}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Times the main pages in-process and reports p50/p95 latency, query counts and peak memory as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help=f"Only run these endpoints ({', '.join(ENDPOINTS)}).")
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint first.')
+        parser.add_argument('--user', help='Username to request as (default: the first non-staff user).')
+        parser.add_argument('--staff-user', help='Username for staff-only pages (default: the first staff user).')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--compare', help='A previous report to print the changes against.')
+
+    def _user(self, username, **filters):
+        queryset = User.objects.filter(is_active=True, **filters)
+        if username:
+            user = queryset.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'No active user "{username}".')
+            return user
+        return queryset.order_by('id').first()
+
+    def handle(self, *args, **options):
+        unknown = set(options['endpoints']) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}.")
+        user = self._user(options['user']) if options['user'] else self._user(None, is_staff=False)
+        if user is None:
+            raise CommandError('There are no users to request as; run generate_load_data first.')
+        staff = self._user(options['staff_user'], is_staff=True)
+
+        clients = {False: benchmark_client(user), True: benchmark_client(staff) if staff else None}
+        results = {}
+        for name in options['endpoints'] or ENDPOINTS:
+            url_name, needs_staff = ENDPOINTS[name]
+            client = clients[needs_staff]
+            if client is None:
+                self.stderr.write(f'Skipping {name}: no staff user.')
+                continue
+            results[name] = benchmark(client, reverse(url_name), options['iterations'], options['warmup'])
+            self.stderr.write(f"{name}: p50 {results[name]['p50_ms']} ms, {results[name]['queries']} queries")
+
+        report = {
+            'revision': _git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'iterations': options['iterations'],
+            'user': user.username,
+            'endpoints': results,
+        }
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                report['changes'] = compare(json.load(baseline), report)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as destination:
+                destination.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} endpoint results to {options['output']}."))
+        else:
+            self.stdout.write(output)
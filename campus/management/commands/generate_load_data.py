@@ -0,0 +1,222 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import Friendship, UserProfile
+from campus import typeahead
+from campus.models import Location, LocationChange, Rating, SharedTour, Tour, TourStop
+from campus.ratings import rebuild_rating_aggregates, rebuild_rating_rollups
+from campus.tours import STOP_ORDER_GAP
+from campus.versions import bump_catalog_version, bump_official_tours_version
+
+# Bounding box around campus that generated locations are scattered in.
+LATITUDE_RANGE = (33.770000, 33.782000)
+LONGITUDE_RANGE = (-84.406000, -84.388000)
+CATEGORIES = ['Academic', 'Dining', 'Historic', 'Housing', 'Athletics', 'Library', 'Parking', 'Student Life']
+COMMENTS = [
+    'Great spot between classes.',
+    'Hard to find the entrance.',
+    'Crowded at lunch time.',
+    'The tour guide was very knowledgeable.',
+    'Needs more seating.',
+]
+LOAD_PASSWORD = 'load-test-password'
+
+
+class Command(BaseCommand):
+    help = 'Bulk-creates a large synthetic dataset (locations, users, ratings, friendships, tours) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=10_000, help='Locations to create.')
+        parser.add_argument('--users', type=int, default=100_000, help='Users to create, each with a profile.')
+        parser.add_argument('--ratings', type=int, default=1_000_000, help='Ratings to create (one per user and location).')
+        parser.add_argument('--friends', type=int, default=10, help='Friendships to create per user.')
+        parser.add_argument('--tours', type=int, default=20_000, help='Tours to create.')
+        parser.add_argument('--stops', type=int, default=6, help='Stops per tour.')
+        parser.add_argument('--shares', type=int, default=50_000, help='Tours shared between friends.')
+        parser.add_argument('--official-tours', type=int, default=20, help='How many of the tours are official.')
+        parser.add_argument('--days', type=int, default=90, help='Spread rating dates over this many past days.')
+        parser.add_argument('--batch-size', type=int, default=5_000, help='Rows per bulk INSERT.')
+        parser.add_argument('--prefix', default='load', help='Prefix for generated usernames and location names.')
+        parser.add_argument('--seed', type=int, default=2340, help='Random seed, so runs are repeatable.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users prefixed "{prefix}_" already exist; pass another --prefix.')
+
+        locations = self._create_locations(prefix, options['locations'])
+        users = self._create_users(prefix, options['users'])
+        if not locations or not users:
+            raise CommandError('At least one location and one user are needed.')
+
+        friends = min(options['friends'], (len(users) - 1) // 2)
+        self._create_ratings(users, locations, options['ratings'], options['days'])
+        self._create_friendships(users, friends)
+        tours = self._create_tours(users, locations, options['tours'], options['stops'], options['official_tours'])
+        self._create_shares(users, tours, options['shares'], friends)
+
+        # bulk_create sends no signals: rebuild the derived data and invalidate once.
+        rebuild_rating_aggregates()
+        rebuild_rating_rollups()
+        bump_catalog_version()
+        bump_official_tours_version()
+        cache.delete(typeahead.GENERATION_KEY)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(locations)} locations and {len(users)} users with password "{LOAD_PASSWORD}".'
+        ))
+
+    def _bulk_create(self, model, objects):
+        created = []
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                created.extend(self._insert(model, batch))
+                batch = []
+        if batch:
+            created.extend(self._insert(model, batch))
+        return created
+
+    def _insert(self, model, batch):
+        with transaction.atomic():
+            return model.objects.bulk_create(batch)
+
+    def _coordinate(self, bounds):
+        return Decimal(f'{self.rng.uniform(*bounds):.6f}')
+
+    def _create_locations(self, prefix, count):
+        locations = self._bulk_create(Location, (
+            Location(
+                name=f'{prefix.title()} Location {number}',
+                slug=f'{prefix}-location-{number}',
+                description=f'Generated location {number} for load testing.',
+                latitude=self._coordinate(LATITUDE_RANGE),
+                longitude=self._coordinate(LONGITUDE_RANGE),
+                address=f'{number} Load Test Way NW, Atlanta, GA 30332',
+                category=self.rng.choice(CATEGORIES),
+            )
+            for number in range(1, count + 1)
+        ))
+        # The delta-sync API only sees locations through the change log.
+        self._bulk_create(LocationChange, (
+            LocationChange(location_id=location.id, slug=location.slug, action='upsert')
+            for location in locations
+        ))
+        self.stdout.write(f'{len(locations)} locations')
+        return locations
+
+    def _create_users(self, prefix, count):
+        # Hashing is deliberately slow; every generated user shares one hash.
+        password = make_password(LOAD_PASSWORD)
+        users = self._bulk_create(User, (
+            User(
+                username=f'{prefix}_{number}',
+                first_name='Load',
+                last_name=f'User {number}',
+                email=f'{prefix}_{number}@example.com',
+                password=password,
+            )
+            for number in range(1, count + 1)
+        ))
+        self._bulk_create(UserProfile, (
+            UserProfile(user=user, affiliation='Visitor', is_private=self.rng.random() < 0.1)
+            for user in users
+        ))
+        self.stdout.write(f'{len(users)} users')
+        return users
+
+    def _create_ratings(self, users, locations, count, days):
+        count = min(count, len(users) * len(locations))
+        first_id = Rating.objects.aggregate(last=Max('id'))['last'] or 0
+
+        def ratings():
+            # Rating n goes to user n % users; stepping through the locations
+            # from a per-user offset keeps every (user, location) pair unique.
+            for number in range(count):
+                user_index = number % len(users)
+                location_index = (user_index * 7919 + number // len(users)) % len(locations)
+                roll = self.rng.random()
+                yield Rating(
+                    user=users[user_index],
+                    location=locations[location_index],
+                    score=self.rng.choices(range(1, 6), weights=(1, 1, 2, 4, 4))[0],
+                    comment=self.rng.choice(COMMENTS) if roll < 0.3 else '',
+                    status='resolved' if roll < 0.05 else 'reviewed' if roll < 0.15 else 'new',
+                )
+
+        self._bulk_create(Rating, ratings())
+
+        # created_at is auto_now_add, so spread the dates afterwards, one
+        # UPDATE per day over consecutive id ranges.
+        now = timezone.now()
+        per_day = max(1, -(-count // max(days, 1)))
+        for day in range(max(days, 1)):
+            low = first_id + day * per_day
+            Rating.objects.filter(id__gt=low, id__lte=low + per_day).update(
+                created_at=now - datetime.timedelta(days=day, seconds=self.rng.randrange(86400)),
+            )
+        self.stdout.write(f'{count} ratings')
+
+    def _create_friendships(self, users, friends):
+        # User n befriends users n+1..n+friends (wrapping), so no pair repeats in either direction.
+        self._bulk_create(Friendship, (
+            Friendship(
+                from_user=user,
+                to_user=users[(index + offset) % len(users)],
+                status='accepted' if self.rng.random() < 0.9 else 'pending',
+            )
+            for index, user in enumerate(users)
+            for offset in range(1, friends + 1)
+        ))
+        self.stdout.write(f'{len(users) * friends} friendships')
+
+    def _create_tours(self, users, locations, count, stops, official):
+        stops = min(stops, len(locations))
+        tours = self._bulk_create(Tour, (
+            Tour(
+                user=users[self.rng.randrange(len(users))],
+                name=f'Load tour {number}',
+                description='Generated tour for load testing.',
+                is_official=number <= official,
+            )
+            for number in range(1, count + 1)
+        ))
+        self._bulk_create(TourStop, (
+            TourStop(tour=tour, location=location, order=position * STOP_ORDER_GAP)
+            for tour in tours
+            for position, location in enumerate(self.rng.sample(locations, stops), start=1)
+        ))
+        self.stdout.write(f'{len(tours)} tours')
+        return tours
+
+    def _create_shares(self, users, tours, count, friends):
+        if not tours or not friends:
+            return
+        index_of = {user.id: index for index, user in enumerate(users)}
+        per_tour = max(1, -(-count // len(tours)))
+
+        def shares():
+            created = 0
+            for tour in tours:
+                owner = index_of[tour.user_id]
+                # Only the friends the owner asked (see _create_friendships).
+                for offset in self.rng.sample(range(1, friends + 1), min(per_tour, friends)):
+                    if created == count:
+                        return
+                    created += 1
+                    yield SharedTour(tour=tour, shared_by=users[owner], shared_with=users[(owner + offset) % len(users)])
+
+        shared = self._bulk_create(SharedTour, shares())
+        self.stdout.write(f'{len(shared)} shared tours')
@@ -0,0 +1,78 @@
+import json
+import logging
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from campus.loadtest import DEFAULT_WEIGHTS, run_load_test
+
+
+def _weights(value):
+    """Parses 'browse=50,rate=10' into a weights dict."""
+    weights = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        try:
+            weights[name.strip()] = int(weight)
+        except ValueError:
+            raise CommandError(f'Invalid scenario weight "{part}"; expected name=integer.')
+    return weights
+
+
+class Command(BaseCommand):
+    help = 'Runs concurrent mixed-scenario load against the app in-process and reports throughput, latency and errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Virtual users, one thread each.')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run for.')
+        parser.add_argument('--iterations', type=int, help='Scenarios per virtual user, instead of --duration.')
+        parser.add_argument(
+            '--weights',
+            help=f"Scenario weights as name=weight,... (default {','.join(f'{k}={v}' for k, v in DEFAULT_WEIGHTS.items())}).",
+        )
+        parser.add_argument('--users', help='Comma-separated usernames to log in as (default: the first non-staff users).')
+        parser.add_argument('--directions-latency', type=float, default=50, help='Stand-in Directions latency per leg, in ms.')
+        parser.add_argument('--llm-latency', type=float, default=800, help='Stand-in LLM latency per chat message, in ms.')
+        parser.add_argument('--seed', type=int, default=2340, help='Random seed for scenario choice.')
+        parser.add_argument('--log-errors', action='store_true', help='Log tracebacks of failed requests as they happen.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['users']:
+            usernames = [name.strip() for name in options['users'].split(',') if name.strip()]
+            users = list(User.objects.filter(username__in=usernames, is_active=True))
+            if len(users) != len(usernames):
+                raise CommandError('One or more users not found.')
+
+        # Failures are counted in the report; tracebacks for each would drown it.
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = not options['log_errors']
+        try:
+            report = run_load_test(
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                iterations=options['iterations'],
+                weights=_weights(options['weights']) if options['weights'] else None,
+                users=users,
+                seed=options['seed'],
+                directions_latency_ms=options['directions_latency'],
+                llm_latency_ms=options['llm_latency'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            request_logger.disabled = False
+
+        self.stderr.write(
+            f"{report['count']} requests in {report['elapsed_seconds']} s "
+            f"({report['throughput_rps']} req/s), error rate {report['error_rate']}, "
+            f"{report['database_locked']} database locked"
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as destination:
+                destination.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote load test report to {options['output']}."))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from campus.ratings import rebuild_rating_aggregates, rebuild_rating_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized rating totals and daily rollups from the Rating table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'location_ids',
+            nargs='*',
+            type=int,
+            help='Only repair these location ids.',
+        )
+
+    def handle(self, *args, **options):
+        repaired = rebuild_rating_aggregates(options['location_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Repaired rating totals for {repaired} locations.'))
+        if not options['location_ids']:
+            rollups = rebuild_rating_rollups()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rollups} daily rating rollups.'))
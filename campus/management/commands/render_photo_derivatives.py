@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from campus.images import generate_location_derivatives
+from campus.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Renders resized photo derivatives for locations whose photo has none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render every photo, e.g. to backfill placeholders and colours for existing derivatives.',
+        )
+
+    def handle(self, *args, **options):
+        locations = Location.objects.all()
+        if options['force']:
+            # Locations without a photo have nothing to re-render.
+            locations = locations.exclude(photo='').exclude(photo__isnull=True)
+
+        rendered = 0
+        for location_id in locations.values_list('id', flat=True):
+            if generate_location_derivatives(location_id, force=options['force']):
+                rendered += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered photo derivatives for {rendered} locations.'))
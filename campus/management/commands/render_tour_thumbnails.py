@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from campus.models import Tour
+from campus.thumbnails import generate_tour_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Renders route preview thumbnails for tours that are missing one'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-check every tour instead of only those without a thumbnail.',
+        )
+
+    def handle(self, *args, **options):
+        tours = Tour.objects.prefetch_related('stops__location')
+        if not options['all']:
+            tours = tours.filter(thumbnail_digest='')
+
+        rendered = 0
+        for tour in tours:
+            if generate_tour_thumbnail(tour):
+                rendered += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered thumbnails for {rendered} tours.'))
@@ -0,0 +1,61 @@
+import glob
+import json
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from campus.traffic import compare_latency, read_capture, replay
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Command(BaseCommand):
+    help = 'Replays captured traffic against this database and reports latency changes per view'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'captures',
+            nargs='*',
+            help='Capture files to replay (default: TRAFFIC_CAPTURE_FILE and its rotated backups).',
+        )
+        parser.add_argument('--speed', type=float, default=1.0, help='Replay this many times faster; 0 sends requests back to back.')
+        parser.add_argument('--workers', type=int, default=4, help='Requests that may be in flight at once.')
+        parser.add_argument('--read-only', action='store_true', help='Only replay GET, HEAD and OPTIONS requests.')
+        parser.add_argument('--limit', type=int, help='Replay at most this many (oldest first) requests.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0:
+            raise CommandError('--speed cannot be negative.')
+        paths = options['captures'] or sorted(glob.glob(f'{settings.TRAFFIC_CAPTURE_FILE}*'))
+        if not paths:
+            raise CommandError('No capture files found; set TRAFFIC_CAPTURE_RATE to record some.')
+
+        try:
+            records = read_capture(paths)
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not read captures: {e}')
+        if options['read_only']:
+            records = [record for record in records if record['method'] in SAFE_METHODS]
+        if options['limit']:
+            records = records[:options['limit']]
+
+        self.stderr.write(f"Replaying {len(records)} requests from {len(paths)} files at {options['speed']}x...")
+        # Status changes are in the report; don't print a traceback for each.
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = True
+        try:
+            results = replay(records, speed=options['speed'], workers=options['workers'])
+        finally:
+            request_logger.disabled = False
+
+        report = compare_latency(results)
+        report['captures'] = paths
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as destination:
+                destination.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote replay report to {options['output']}."))
+        else:
+            self.stdout.write(output)
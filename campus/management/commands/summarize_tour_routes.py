@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from campus.models import Tour
+
+
+class Command(BaseCommand):
+    help = 'Fills in the route summary of tours whose route was saved without one'
+
+    def handle(self, *args, **options):
+        summarized = 0
+        for tour in Tour.objects.filter(route_summary__isnull=True, route_data__isnull=False).iterator():
+            # save() recomputes route_summary from route_data and invalidates the feeds.
+            tour.save(update_fields=['route_data'])
+            summarized += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Summarized routes for {summarized} tours.'))
@@ -0,0 +1,282 @@
+"""
+In-process metrics, exported in the Prometheus text format.
+
+Recording is meant to be cheap enough to leave on: every thread writes to its
+own counters and histograms (plain dicts reached through a thread-local), so
+recording takes no lock and never contends with other threads. When a thread
+ends, its store is queued for retirement and the next scrape folds it into
+one shared total, so servers that start a thread per connection don't keep a
+store per request. A scrape (``campus:metrics``) sums the retired total and
+the stores of running threads and renders them; the totals are per process,
+like any Prometheus target.
+
+Recorded:
+
+- ``MetricsMiddleware``: requests, latency and SQL queries per URL name.
+- ``external_call``: latency and errors of the Directions API and the LLM.
+- ``cache_lookup``: hits and misses of the catalog, response and document caches.
+- ``register_gauge``: values read at scrape time, e.g. worker queue depths.
+
+The endpoint is open to staff, or to scrapers that send
+``Authorization: Bearer <METRICS_TOKEN>``.
+"""
+import bisect
+import itertools
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple, Union
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+Labels = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXTERNAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+COUNTERS = {
+    'campus_http_requests_total': 'Requests handled, by URL name, method and status.',
+    'campus_db_query_seconds_total': 'Time spent in SQL queries, by URL name.',
+    'campus_external_call_errors_total': 'Failed calls to external services, by service and error.',
+    'campus_cache_lookups_total': 'Cache lookups, by cache and result (hit or miss).',
+    'campus_http_requests_in_progress': 'Requests currently being handled.',
+}
+HISTOGRAMS = {
+    'campus_http_request_duration_seconds': ('Request latency, by URL name and method.', LATENCY_BUCKETS),
+    'campus_db_queries_per_request': ('SQL queries run per request, by URL name.', QUERY_COUNT_BUCKETS),
+    'campus_external_call_duration_seconds': ('Latency of calls to external services, by service.', EXTERNAL_BUCKETS),
+}
+# Counters that go down as well as up are exported as gauges.
+_GAUGE_COUNTERS = {'campus_http_requests_in_progress'}
+
+_gauges: Dict[str, Tuple[str, Callable[[], Union[float, Dict[Labels, float]]]]] = {}
+
+
+class _Store:
+    __slots__ = ('counters', 'histograms', '__weakref__')
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # (name, labels) -> [per-bucket counts (last is +Inf), sum, count]
+        self.histograms: Dict[Tuple[str, Labels], list] = {}
+
+
+Data = Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], list]]
+
+_local = threading.local()
+_store_keys = itertools.count()
+# Data of running threads' stores, by store key. Only the dicts are kept here,
+# so a store is freed (and retired) when its thread ends.
+_live: Dict[int, Data] = {}
+# Stores of ended threads, waiting for collect() to fold them into _retired.
+_retiring: deque = deque()
+_retired: Data = ({}, {})
+# Keys folded into _retired that may still have been listed in _live.
+_retired_keys: set = set()
+_collect_lock = threading.Lock()
+
+
+def _retire(key: int, data: Data) -> None:
+    # Queue before unlisting, so collect() always finds the data somewhere.
+    _retiring.append((key, data))
+    _live.pop(key, None)
+
+
+def _store() -> _Store:
+    try:
+        return _local.store
+    except AttributeError:
+        store = _local.store = _Store()
+        key = next(_store_keys)
+        data = (store.counters, store.histograms)
+        _live[key] = data
+        # The thread-local drops the store when the thread ends.
+        weakref.finalize(store, _retire, key, data)
+        return store
+
+
+def labels(**values) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in values.items()))
+
+
+def inc(name: str, label_values: Labels = (), amount: float = 1) -> None:
+    counters = _store().counters
+    key = (name, label_values)
+    counters[key] = counters.get(key, 0) + amount
+
+
+def observe(name: str, value: float, label_values: Labels = ()) -> None:
+    histograms = _store().histograms
+    key = (name, label_values)
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = [[0] * (len(HISTOGRAMS[name][1]) + 1), 0.0, 0]
+    histogram[0][bisect.bisect_left(HISTOGRAMS[name][1], value)] += 1
+    histogram[1] += value
+    histogram[2] += 1
+
+
+def register_gauge(name: str, help_text: str, read: Callable[[], Union[float, Dict[Labels, float]]]) -> None:
+    """Export ``read()`` (a number, or {labels: number}) as a gauge, read at scrape time."""
+    _gauges[name] = (help_text, read)
+
+
+def cache_lookup(cache_name: str, hit: bool) -> None:
+    inc('campus_cache_lookups_total', labels(cache=cache_name, result='hit' if hit else 'miss'))
+
+
+@contextmanager
+def external_call(service: str):
+    """Time the block as a call to ``service``; an exception counts as an error and is re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        inc('campus_external_call_errors_total', labels(service=service, error=type(e).__name__))
+        raise
+    finally:
+        observe('campus_external_call_duration_seconds', time.perf_counter() - started, labels(service=service))
+
+
+def _merge(into: Data, data: Data) -> None:
+    counters, histograms = into
+    # dict() copies in one step, so a concurrent first write can't break iteration.
+    for key, value in dict(data[0]).items():
+        counters[key] = counters.get(key, 0) + value
+    for key, (buckets, total, count) in dict(data[1]).items():
+        merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+        merged[0] = [left + right for left, right in zip(merged[0], buckets)]
+        merged[1] += total
+        merged[2] += count
+
+
+def collect() -> Data:
+    """Every thread's counters and histograms, summed."""
+    global _retired_keys
+    with _collect_lock:
+        # Snapshot the running stores before draining the queue: a store that
+        # retires in between is then either in the snapshot or in the queue.
+        live = list(_live.items())
+        while _retiring:
+            key, data = _retiring.popleft()
+            _merge(_retired, data)
+            _retired_keys.add(key)
+        _retired_keys &= {key for key, _ in live}
+
+        totals: Data = ({}, {})
+        _merge(totals, _retired)
+        for key, data in live:
+            if key not in _retired_keys:
+                _merge(totals, data)
+    return totals
+
+
+def reset() -> None:
+    """Forget everything recorded so far (for tests)."""
+    with _collect_lock:
+        _retiring.clear()
+        _retired_keys.clear()
+        for counters, histograms in [_retired, *list(_live.values())]:
+            counters.clear()
+            histograms.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(label_values: Labels, extra: Labels = ()) -> str:
+    pairs = label_values + extra
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    counters, histograms = collect()
+    lines = []
+
+    by_name: Dict[str, list] = {}
+    for (name, label_values), value in sorted(counters.items()):
+        by_name.setdefault(name, []).append((label_values, value))
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f"# TYPE {name} {'gauge' if name in _GAUGE_COUNTERS else 'counter'}")
+        for label_values, value in by_name.get(name, []):
+            lines.append(f'{name}{_format_labels(label_values)} {_format_number(value)}')
+
+    by_name = {}
+    for (name, label_values), histogram in sorted(histograms.items()):
+        by_name.setdefault(name, []).append((label_values, histogram))
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for label_values, (buckets, total, count) in by_name.get(name, []):
+            cumulative = 0
+            for bound, bucket in zip((*bounds, '+Inf'), buckets):
+                cumulative += bucket
+                le = bound if bound == '+Inf' else _format_number(bound)
+                lines.append(f'{name}_bucket{_format_labels(label_values, (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(label_values)} {_format_number(round(total, 6))}')
+            lines.append(f'{name}_count{_format_labels(label_values)} {count}')
+
+    for name, (help_text, read) in sorted(_gauges.items()):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        value = read()
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        for label_values, number in values:
+            lines.append(f'{name}{_format_labels(label_values)} {_format_number(number)}')
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryTimer:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        inc('campus_http_requests_in_progress')
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timer):
+                response = self.get_response(request)
+        finally:
+            inc('campus_http_requests_in_progress', amount=-1)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unmatched'
+        inc('campus_http_requests_total', labels(view=view, method=request.method, status=response.status_code))
+        observe('campus_http_request_duration_seconds', elapsed, labels(view=view, method=request.method))
+        observe('campus_db_queries_per_request', timer.count, labels(view=view))
+        inc('campus_db_query_seconds_total', labels(view=view), timer.seconds)
+        return response
@@ -1,8 +1,11 @@
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models import Avg
+from django.urls import reverse
 from django.utils.text import slugify
 
+from .route_utils import summarize_route
+from .storage import content_addressed_storage
+
 
 class Location(models.Model):
     """
@@ -55,10 +58,75 @@ class Location(models.Model):
     )
     photo = models.ImageField(
         upload_to='locations/photos/',
+        storage=content_addressed_storage,
         blank=True,
         null=True,
         help_text="Upload location photo.",
     )
+    photo_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Width of the uploaded photo in pixels.",
+    )
+    photo_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Height of the uploaded photo in pixels.",
+    )
+    photo_derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Resized copies of the photo (see campus.images).",
+    )
+    photo_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        help_text="Tiny inline WebP data URI shown while the photo loads.",
+    )
+    photo_color = models.CharField(
+        max_length=7,
+        blank=True,
+        editable=False,
+        help_text="Dominant colour of the photo as #rrggbb.",
+    )
+    rating_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of ratings (maintained from Rating writes).",
+    )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Sum of all rating scores (maintained from Rating writes).",
+    )
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of 1-star ratings.")
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of 2-star ratings.")
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of 3-star ratings.")
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of 4-star ratings.")
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of 5-star ratings.")
+
+    # Written only by campus.ratings with F() expressions.
+    RATING_AGGREGATE_FIELDS = (
+        'rating_count',
+        'rating_sum',
+        'rating_1_count',
+        'rating_2_count',
+        'rating_3_count',
+        'rating_4_count',
+        'rating_5_count',
+    )
+
+    # Written only by campus.images.
+    PHOTO_DERIVATIVE_FIELDS = (
+        'photo_width',
+        'photo_height',
+        'photo_derivatives',
+        'photo_placeholder',
+        'photo_color',
+    )
 
     class Meta:
         ordering = ['name']
@@ -69,14 +137,67 @@ class Location(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Don't clobber columns updated in place since this instance was loaded.
+            maintained = self.RATING_AGGREGATE_FIELDS + self.PHOTO_DERIVATIVE_FIELDS
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in maintained
+            ]
         super().save(*args, **kwargs)
 
+    def photo_srcset(self, fmt: str) -> str:
+        """``srcset`` value for the photo's ``fmt`` ('webp' or 'jpeg') derivatives, or ''."""
+        variants = (self.photo_derivatives or {}).get('variants', [])
+        return ', '.join(
+            f"{content_addressed_storage.url(variant[fmt])} {variant['width']}w" for variant in variants
+        )
+
     def average_rating(self):
-        avg = self.ratings.aggregate(Avg('score'))['score__avg']
-        return round(avg, 1) if avg else None
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+
+    @property
+    def rating_histogram(self):
+        return {score: getattr(self, f'rating_{score}_count') for score in range(1, 6)}
 
-    def rating_count(self):
-        return self.ratings.count()
+
+class LocationChange(models.Model):
+    """
+    Append-only log of location writes, used by the delta-sync API.
+
+    The auto-incrementing id is the sync sequence number. Deletions are kept as
+    tombstones, so location_id is deliberately not a foreign key.
+    """
+
+    ACTION_CHOICES = [
+        ('upsert', 'Upsert'),
+        ('delete', 'Delete'),
+    ]
+
+    location_id = models.BigIntegerField(
+        db_index=True,
+        help_text="Primary key of the location that changed.",
+    )
+    slug = models.SlugField(
+        help_text="Slug of the location at the time of the change.",
+    )
+    action = models.CharField(
+        max_length=10,
+        choices=ACTION_CHOICES,
+        help_text="Whether the location was created/updated or deleted.",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="When the change was recorded.",
+    )
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self) -> str:
+        return f"#{self.id} {self.action} {self.slug}"
 
 
 class Bookmark(models.Model):
@@ -151,10 +272,21 @@ class Tour(models.Model):
         null=True,
         help_text="Cached route segments from Google Directions API"
     )
+    route_summary = models.JSONField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Total distance/duration and merged polyline of route_data, served in tour listings.",
+    )
     is_official = models.BooleanField(
         default=False,
         help_text="Mark as official tour visible to all users."
     )
+    thumbnail_digest = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Content hash of the pre-rendered route preview image.",
+    )
 
     class Meta:
         ordering = ['-created_at']
@@ -162,6 +294,26 @@ class Tour(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        writes_route = update_fields is None or 'route_data' in update_fields
+        if writes_route and 'route_data' not in self.get_deferred_fields():
+            # Listings defer route_data, so keep its summary in step here.
+            self.route_summary = summarize_route(self.route_data)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'route_summary'}
+        super().save(*args, **kwargs)
+
+    @property
+    def thumbnail_urls(self):
+        """URLs of the rendered route preview keyed by image format, if one exists."""
+        if not self.thumbnail_digest:
+            return None
+        return {
+            fmt: reverse('campus:tour-thumbnail', args=[self.id, self.thumbnail_digest, fmt])
+            for fmt in ('webp', 'png')
+        }
+
 
 class TourStop(models.Model):
     tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='stops')
@@ -243,6 +395,44 @@ class Rating(models.Model):
         return f"{self.user.username} rated {self.location.name}: {self.score}/5"
 
 
+class RatingRollup(models.Model):
+    """
+    Per-location, per-day rating counts, keyed on the day each rating was created.
+
+    Maintained incrementally from Rating writes (see campus.ratings) so the
+    feedback dashboard can chart trends without scanning raw ratings.
+    """
+
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='rating_rollups',
+        help_text="The location these ratings belong to.",
+    )
+    date = models.DateField(
+        help_text="Local date the counted ratings were submitted.",
+    )
+    score_1 = models.PositiveIntegerField(default=0, help_text="Number of 1-star ratings.")
+    score_2 = models.PositiveIntegerField(default=0, help_text="Number of 2-star ratings.")
+    score_3 = models.PositiveIntegerField(default=0, help_text="Number of 3-star ratings.")
+    score_4 = models.PositiveIntegerField(default=0, help_text="Number of 4-star ratings.")
+    score_5 = models.PositiveIntegerField(default=0, help_text="Number of 5-star ratings.")
+    status_new = models.PositiveIntegerField(default=0, help_text="Ratings still awaiting review.")
+    status_reviewed = models.PositiveIntegerField(default=0, help_text="Ratings marked as reviewed.")
+    status_resolved = models.PositiveIntegerField(default=0, help_text="Ratings marked as resolved.")
+
+    class Meta:
+        unique_together = ('location', 'date')
+        ordering = ['-date', 'location']
+
+    def __str__(self) -> str:
+        return f"{self.location.name} on {self.date}: {self.rating_count} ratings"
+
+    @property
+    def rating_count(self) -> int:
+        return self.score_1 + self.score_2 + self.score_3 + self.score_4 + self.score_5
+
+
 class SharedTour(models.Model):
     tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='shares')
     shared_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tours_shared')
@@ -255,3 +445,36 @@ class SharedTour(models.Model):
 
     def __str__(self) -> str:
         return f"{self.shared_by.username} shared {self.tour.name} with {self.shared_with.username}"
+
+
+class RequestProfile(models.Model):
+    """
+    A request a staff member asked to profile (see campus.profiling): the
+    profiler's report, the SQL it ran and its timings.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_profiles',
+        help_text="Staff member who requested the profile.",
+    )
+    method = models.CharField(max_length=10, help_text="HTTP method of the request.")
+    path = models.CharField(max_length=500, help_text="Path and query string of the request.")
+    view_name = models.CharField(max_length=200, blank=True, help_text="URL name of the view that handled it.")
+    status_code = models.PositiveIntegerField(help_text="Response status code.")
+    duration_ms = models.FloatField(help_text="Wall time of the request under the profiler, in milliseconds.")
+    query_count = models.PositiveIntegerField(help_text="Number of SQL queries run.")
+    query_ms = models.FloatField(help_text="Total time spent in SQL queries, in milliseconds.")
+    queries = models.JSONField(default=list, help_text="Each query's SQL and time in milliseconds, in order.")
+    report = models.TextField(help_text="Profiler output: the slowest functions by cumulative time.")
+    stats = models.BinaryField(help_text="Raw cProfile stats, loadable with pstats or snakeviz.")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the request was profiled.")
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self) -> str:
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
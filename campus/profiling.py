@@ -0,0 +1,114 @@
+"""
+Profiling single requests on demand.
+
+A staff member adds ``?__profile=1`` to a URL (or sends ``X-Profile: 1``) and
+``RequestProfilerMiddleware`` runs that one request under ``cProfile`` while
+recording its SQL queries. The result is saved as a ``RequestProfile``: the
+slowest functions by cumulative time, every query with its duration, and the
+raw stats for ``pstats``/snakeviz. The response carries ``X-Profile-Id`` and
+``X-Profile-Url``, which points at the staff viewer (``campus:request-profile``).
+
+Everyone else's requests, and staff requests without the flag, only pay for
+two dict lookups. cProfile allows one active profiler per process, so a
+request that asks while another is being profiled runs normally and gets
+``X-Profile: busy``. Only the newest ``REQUEST_PROFILE_KEEP`` profiles are kept.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import RequestProfile
+
+PROFILE_PARAMETER = '__profile'
+PROFILE_HEADER = 'X-Profile'
+# Functions listed in a profile's report.
+REPORT_LINES = 60
+
+_profiler_lock = threading.Lock()
+
+
+def wants_profile(request) -> bool:
+    flag = request.GET.get(PROFILE_PARAMETER) or request.headers.get(PROFILE_HEADER)
+    if flag not in ('1', 'true'):
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+def _report(profiler: cProfile.Profile) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(REPORT_LINES)
+    return stream.getvalue()
+
+
+def save_profile(request, response, profiler: cProfile.Profile, queries, duration_ms: float) -> RequestProfile:
+    profiler.create_stats()
+    # Read the raw stats first: pstats.Stats() empties the profiler's copy.
+    raw_stats = marshal.dumps(profiler.stats)
+    captured = [
+        {'sql': query['sql'], 'ms': round(float(query['time']) * 1000, 2)}
+        for query in queries.captured_queries
+    ]
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile.objects.create(
+        user=request.user,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view_name=(match.view_name if match else '')[:200],
+        status_code=response.status_code,
+        duration_ms=round(duration_ms, 2),
+        query_count=len(captured),
+        query_ms=round(sum(query['ms'] for query in captured), 2),
+        queries=captured,
+        report=_report(profiler),
+        stats=raw_stats,
+    )
+
+    keep = getattr(settings, 'REQUEST_PROFILE_KEEP', 100)
+    cutoff = RequestProfile.objects.order_by('-id').values_list('id', flat=True)[keep:keep + 1].first()
+    if cutoff is not None:
+        RequestProfile.objects.filter(id__lte=cutoff).delete()
+    return profile
+
+
+class RequestProfilerMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not wants_profile(request):
+            return self.get_response(request)
+        if not _profiler_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response[PROFILE_HEADER] = 'busy'
+            return response
+
+        try:
+            profiler = cProfile.Profile()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+                duration_ms = (time.perf_counter() - started) * 1000
+        finally:
+            _profiler_lock.release()
+
+        profile = save_profile(request, response, profiler, queries, duration_ms)
+        response['X-Profile-Id'] = str(profile.id)
+        response['X-Profile-Url'] = reverse('campus:request-profile', args=[profile.id])
+        return response
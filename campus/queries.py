@@ -0,0 +1,64 @@
+"""
+Per-request SQL inspection for development and tests.
+
+``QueryInspectionMiddleware`` records every query a request runs and reports
+the count in an ``X-Query-Count`` header. It also groups the queries by
+*shape* (the SQL with literals replaced by ``?``). A shape that repeats
+``QUERY_DUPLICATE_THRESHOLD`` times or more is usually an N+1 loop, so
+those are logged and listed in ``X-Query-Duplicates``.
+
+The middleware only runs when ``QUERY_INSPECTION`` is set, which defaults to
+``DEBUG``. ``campus.testing.QueryBudgetMixin`` uses the same helpers to fail
+tests that go over an endpoint's query budget.
+"""
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN \((?:\?, )*\?\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def sql_shape(sql: str) -> str:
+    """``sql`` with its literal values replaced, so the same query with other arguments compares equal."""
+    shape = _STRING_RE.sub('?', sql)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _IN_LIST_RE.sub('IN (...)', shape)
+    return _SPACE_RE.sub(' ', shape).strip()
+
+
+def duplicate_shapes(queries: Iterable[Dict[str, str]], threshold: int = None) -> List[Tuple[str, int]]:
+    """Shapes run at least ``threshold`` times, most repeated first."""
+    if threshold is None:
+        threshold = getattr(settings, 'QUERY_DUPLICATE_THRESHOLD', 5)
+    counts = Counter(sql_shape(query['sql']) for query in queries)
+    return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+class QueryInspectionMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECTION', settings.DEBUG):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_response(request)
+
+        duplicates = duplicate_shapes(queries.captured_queries)
+        response['X-Query-Count'] = str(len(queries))
+        if duplicates:
+            response['X-Query-Duplicates'] = str(len(duplicates))
+            for shape, count in duplicates:
+                logger.warning(f"{request.method} {request.path} ran {count}x: {shape}")
+        return response
@@ -0,0 +1,194 @@
+"""
+Denormalized rating aggregates on Location.
+
+``Location.rating_count``, ``rating_sum`` and the per-score ``rating_N_count``
+columns are adjusted in place with F() expressions whenever a Rating is
+created, re-scored or deleted (see ``campus.signals``), so showing an average
+never needs an aggregate query. ``rebuild_rating_aggregates`` recomputes them
+from scratch for repairs and bulk imports.
+
+``RatingRollup`` rows hold the same counts per location and per day (plus the
+review status breakdown) and back the feedback dashboard's trend queries.
+"""
+import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Location, LocationChange, Rating, RatingRollup
+from .versions import bump_catalog_version
+
+
+def _score_field(score: int) -> str:
+    return f'rating_{score}_count'
+
+
+def apply_rating_change(location_id: int, old_score: Optional[int], new_score: Optional[int]) -> bool:
+    """
+    Move one rating from ``old_score`` to ``new_score`` (None meaning absent).
+
+    Returns False when nothing changed, so callers can skip invalidation.
+    """
+    if old_score == new_score:
+        return False
+
+    updates = {}
+    if old_score is None:
+        updates['rating_count'] = F('rating_count') + 1
+    elif new_score is None:
+        updates['rating_count'] = F('rating_count') - 1
+
+    sum_delta = (new_score or 0) - (old_score or 0)
+    if sum_delta:
+        updates['rating_sum'] = F('rating_sum') + sum_delta
+    if old_score is not None:
+        updates[_score_field(old_score)] = F(_score_field(old_score)) - 1
+    if new_score is not None:
+        updates[_score_field(new_score)] = F(_score_field(new_score)) + 1
+
+    with transaction.atomic():
+        Location.objects.filter(pk=location_id).update(**updates)
+    return True
+
+
+def rebuild_rating_aggregates(location_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute aggregates from the Rating table; returns the number of locations rewritten."""
+    ratings = Rating.objects.all()
+    locations = Location.objects.all()
+    if location_ids is not None:
+        location_ids = list(location_ids)
+        ratings = ratings.filter(location_id__in=location_ids)
+        locations = locations.filter(pk__in=location_ids)
+
+    changed = []
+    with transaction.atomic():
+        locked = list(locations.select_for_update().only('id', 'slug', *Location.RATING_AGGREGATE_FIELDS))
+        totals = {
+            row['location_id']: row
+            for row in ratings.order_by().values('location_id').annotate(
+                total=Count('id'),
+                score_sum=Sum('score'),
+                **{f'score_{score}': Count('id', filter=Q(score=score)) for score in range(1, 6)},
+            )
+        }
+        for location in locked:
+            row = totals.get(location.pk, {})
+            expected = {
+                'rating_count': row.get('total', 0),
+                'rating_sum': row.get('score_sum') or 0,
+                **{_score_field(score): row.get(f'score_{score}', 0) for score in range(1, 6)},
+            }
+            if any(getattr(location, field) != value for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(location, field, value)
+                changed.append(location)
+        Location.objects.bulk_update(changed, Location.RATING_AGGREGATE_FIELDS)
+        # bulk_update() sends no signals, so record the changes here.
+        LocationChange.objects.bulk_create(
+            LocationChange(location_id=location.pk, slug=location.slug, action='upsert')
+            for location in changed
+        )
+    if changed:
+        bump_catalog_version()
+    return len(changed)
+
+
+# (score, status) of a rating, or None when the rating doesn't exist.
+RatingState = Optional[Tuple[int, str]]
+
+
+def apply_rollup_change(location_id: int, created_at: datetime.datetime, old: RatingState, new: RatingState) -> None:
+    """Move one rating between histogram and status buckets of its day's rollup."""
+    if old == new:
+        return
+
+    updates: Dict[str, Any] = {}
+
+    def shift(field, delta):
+        updates[field] = updates.get(field, F(field)) + delta
+
+    if old is not None:
+        shift(f'score_{old[0]}', -1)
+        shift(f'status_{old[1]}', -1)
+    if new is not None:
+        shift(f'score_{new[0]}', 1)
+        shift(f'status_{new[1]}', 1)
+
+    day = timezone.localdate(created_at)
+    with transaction.atomic():
+        if new is not None:
+            RatingRollup.objects.get_or_create(location_id=location_id, date=day)
+        # Deletions only ever touch an existing row; creating one here could
+        # race a cascade that is deleting the location.
+        RatingRollup.objects.filter(location_id=location_id, date=day).update(**updates)
+
+
+def rebuild_rating_rollups() -> int:
+    """Recompute every rollup from the Rating table; returns the number of rows written."""
+    rows = (
+        Rating.objects.order_by()
+        .annotate(date=TruncDate('created_at'))
+        .values('location_id', 'date')
+        .annotate(
+            **{f'score_{score}': Count('id', filter=Q(score=score)) for score in range(1, 6)},
+            **{f'status_{status}': Count('id', filter=Q(status=status)) for status, _ in Rating.STATUS_CHOICES},
+        )
+    )
+    with transaction.atomic():
+        RatingRollup.objects.all().delete()
+        rollups = RatingRollup.objects.bulk_create(RatingRollup(**row) for row in rows)
+    return len(rollups)
+
+
+def _window_totals(start: datetime.date, end: datetime.date) -> Dict[int, Dict[str, int]]:
+    """Score count/sum and unreviewed count per location for rollup dates in [start, end)."""
+    score_sum = sum(score * F(f'score_{score}') for score in range(1, 6))
+    score_count = sum(F(f'score_{score}') for score in range(1, 6))
+    rows = (
+        RatingRollup.objects.filter(date__gte=start, date__lt=end)
+        .order_by()
+        .values('location_id')
+        .annotate(total=Sum(score_count), score_sum=Sum(score_sum), unreviewed=Sum('status_new'))
+    )
+    return {row['location_id']: row for row in rows}
+
+
+def rating_trends(days: int = 7, today: Optional[datetime.date] = None) -> List[Dict[str, Any]]:
+    """
+    Compare each location's average score over the last ``days`` days with the
+    ``days`` before that, most negative change first.
+
+    Only locations rated in both windows are included.
+    """
+    today = today or timezone.localdate()
+    current_start = today - datetime.timedelta(days=days - 1)
+    previous_start = current_start - datetime.timedelta(days=days)
+    end = today + datetime.timedelta(days=1)
+
+    current = _window_totals(current_start, end)
+    previous = _window_totals(previous_start, current_start)
+    locations = Location.objects.filter(pk__in=current.keys() & previous.keys()).values_list('id', 'name', 'slug')
+
+    trends = []
+    for location_id, name, slug in locations:
+        now, before = current[location_id], previous[location_id]
+        if not now['total'] or not before['total']:
+            continue
+        current_average = now['score_sum'] / now['total']
+        previous_average = before['score_sum'] / before['total']
+        trends.append({
+            'location_id': location_id,
+            'name': name,
+            'slug': slug,
+            'current_average': round(current_average, 2),
+            'current_count': now['total'],
+            'previous_average': round(previous_average, 2),
+            'previous_count': before['total'],
+            'change': round(current_average - previous_average, 2),
+            'unreviewed': now['unreviewed'],
+        })
+    trends.sort(key=lambda trend: (trend['change'], trend['slug']))
+    return trends
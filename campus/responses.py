@@ -0,0 +1,140 @@
+"""
+Pre-compressed, versioned JSON responses.
+
+Large API payloads are encoded once per version and stored in the shared cache
+as identity, gzip and (when the ``brotli`` package is installed) brotli bytes.
+Requests are answered straight from the stored variant matching their
+``Accept-Encoding``, so JSON encoding and compression cost is paid once per
+version instead of once per request.
+
+``VersionedDocument`` keeps one such entry under a fixed key together with
+the version tokens it was built from, and reads both in a single cache round
+trip; a per-user document is then one ``get_many`` per request.
+"""
+import gzip
+import json
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .metrics import cache_lookup
+from .versions import get_versions
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Preferred order when the client accepts several encodings equally.
+_ENCODERS = {'gzip': lambda raw: gzip.compress(raw, compresslevel=9, mtime=0)}
+if brotli is not None:
+    _ENCODERS = {'br': lambda raw: brotli.compress(raw, quality=11), **_ENCODERS}
+
+
+def _accepted_encodings(header: str) -> dict:
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(request) -> Optional[str]:
+    """Best stored encoding the client accepts, or None for identity."""
+    accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    best = None
+    best_quality = 0.0
+    for coding in _ENCODERS:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def cached_json_response(
+    request,
+    cache_key: str,
+    build_payload: Callable[[], Union[dict, HttpResponse]],
+    timeout: int = RESPONSE_CACHE_TIMEOUT,
+) -> HttpResponse:
+    """
+    Serve ``build_payload()`` as JSON from the pre-compressed cache.
+
+    ``cache_key`` must change whenever the payload would (i.e. embed the data's
+    version). ``build_payload`` may return an HttpResponse instead of a dict,
+    e.g. for validation errors; those are passed through and never cached.
+    """
+    key = f'campus:response:{cache_key}'
+    variants = cache.get(key)
+    cache_lookup('response', variants is not None)
+    if variants is None:
+        payload = build_payload()
+        if isinstance(payload, HttpResponse):
+            return payload
+        variants = _encode_variants(payload)
+        cache.set(key, variants, timeout)
+    return _variant_response(request, variants)
+
+
+def _encode_variants(payload: dict) -> Dict[str, bytes]:
+    raw = json.dumps(payload, cls=DjangoJSONEncoder).encode('utf-8')
+    variants = {'identity': raw}
+    for coding, encode in _ENCODERS.items():
+        variants[coding] = encode(raw)
+    return variants
+
+
+def _variant_response(request, variants: Dict[str, bytes]) -> HttpResponse:
+    encoding = negotiate_encoding(request)
+    if encoding not in variants:
+        encoding = None
+    response = HttpResponse(variants[encoding or 'identity'], content_type='application/json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+class VersionedDocument:
+    """
+    A cached JSON document stored with the versions it was built from.
+
+    Creating one reads the stored entry and the current ``version_keys`` with
+    one ``get_many``; ``versions`` then holds the current tokens (for ETags
+    and cache keys) and ``response()`` serves the stored variants if they
+    were built from exactly those versions, rebuilding them otherwise.
+    """
+
+    def __init__(self, cache_key: str, version_keys: Sequence[str]):
+        self.key = f'campus:document:{cache_key}'
+        fetched = cache.get_many([self.key, *version_keys])
+        self.versions: List[str] = get_versions(version_keys, fetched)
+        entry = fetched.get(self.key)
+        self.variants = entry['variants'] if entry and entry['versions'] == self.versions else None
+        cache_lookup('document', self.variants is not None)
+
+    def response(
+        self,
+        request,
+        build_payload: Callable[[], dict],
+        timeout: int = RESPONSE_CACHE_TIMEOUT,
+    ) -> HttpResponse:
+        if self.variants is None:
+            self.variants = _encode_variants(build_payload())
+            cache.set(self.key, {'versions': self.versions, 'variants': self.variants}, timeout)
+        return _variant_response(request, self.variants)
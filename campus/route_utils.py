@@ -1,8 +1,11 @@
 import logging
+import re
 import requests
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from django.conf import settings
 
+from .metrics import external_call
+
 logger = logging.getLogger(__name__)
 
 
@@ -40,20 +43,21 @@ def calculate_route_segments(stops: List[Dict[str, Any]]) -> Optional[List[Dict[
 
         try:
             logger.debug(f"Requesting route from {origin_coords} to {destination_coords}")
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            with external_call('directions'):
+                response = requests.get(url, params=params, timeout=10)
+                response.raise_for_status()
+                data = response.json()
 
-            if data.get('status') != 'OK':
-                error_msg = f"Directions API error: {data.get('status')}"
-                if data.get('error_message'):
-                    error_msg += f" - {data.get('error_message')}"
-                logger.error(error_msg)
-                raise RouteCalculationError(error_msg)
+                if data.get('status') != 'OK':
+                    error_msg = f"Directions API error: {data.get('status')}"
+                    if data.get('error_message'):
+                        error_msg += f" - {data.get('error_message')}"
+                    logger.error(error_msg)
+                    raise RouteCalculationError(error_msg)
 
-            if not data.get('routes'):
-                logger.error("No routes returned from Directions API")
-                raise RouteCalculationError("No routes returned from Directions API")
+                if not data.get('routes'):
+                    logger.error("No routes returned from Directions API")
+                    raise RouteCalculationError("No routes returned from Directions API")
 
             route = data['routes'][0]
             leg = route['legs'][0]
@@ -74,6 +78,8 @@ def calculate_route_segments(stops: List[Dict[str, Any]]) -> Optional[List[Dict[
                 },
                 'distance': leg.get('distance', {}).get('text', ''),
                 'duration': leg.get('duration', {}).get('text', ''),
+                'distance_meters': leg.get('distance', {}).get('value'),
+                'duration_seconds': leg.get('duration', {}).get('value'),
                 'polyline': route.get('overview_polyline', {}).get('points', ''),
                 'steps': [
                     {
@@ -96,3 +102,180 @@ def calculate_route_segments(stops: List[Dict[str, Any]]) -> Optional[List[Dict[
 
     logger.info(f"Successfully calculated {len(segments)} route segments")
     return segments
+
+
+def _leg_key(origin: Dict[str, Any], destination: Dict[str, Any]) -> Tuple:
+    return (origin.get('location_id'), origin.get('lat'), origin.get('lng'),
+            destination.get('location_id'), destination.get('lat'), destination.get('lng'))
+
+
+def _stop_point(stop: Dict[str, Any]) -> Dict[str, Any]:
+    return {'location_id': stop['id'], 'name': stop['name'], 'lat': stop['latitude'], 'lng': stop['longitude']}
+
+
+def calculate_changed_route_segments(
+    stops: List[Dict[str, Any]],
+    previous_segments: Optional[List[Dict[str, Any]]] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Route segments for ``stops`` that only ask the Directions API for legs
+    whose endpoints (location and coordinates) don't match a segment in
+    ``previous_segments``; every other leg is reused as-is.
+
+    A leg the API fails on is kept as a ``failed`` placeholder without
+    geometry, so the legs that did route are still reused next time and the
+    failed one is retried. Raises RouteCalculationError only when no leg
+    could be routed or reused.
+    """
+    if not stops or len(stops) < 2:
+        return None
+
+    known = {
+        _leg_key(segment.get('origin') or {}, segment.get('destination') or {}): segment
+        for segment in previous_segments or []
+        if not segment.get('failed')
+    }
+    segments = []
+    changed = 0
+    failures = []
+    for index, (origin, destination) in enumerate(zip(stops, stops[1:])):
+        segment = known.get(_leg_key(_stop_point(origin), _stop_point(destination)))
+        if segment is None:
+            changed += 1
+            try:
+                segment = calculate_route_segments([origin, destination])[0]
+            except RouteCalculationError as e:
+                failures.append(e)
+                segment = _failed_segment(str(e))
+        # Stop names may have changed since the leg was routed.
+        segments.append({
+            **segment,
+            'segment_index': index,
+            'origin': _stop_point(origin),
+            'destination': _stop_point(destination),
+        })
+
+    if len(failures) == len(segments):
+        raise failures[0]
+    logger.info(f"Routed {changed - len(failures)} changed legs, reused {len(segments) - changed}, {len(failures)} failed")
+    return segments
+
+
+def _failed_segment(error: str) -> Dict[str, Any]:
+    return {
+        'failed': True,
+        'error': error,
+        'distance': '',
+        'duration': '',
+        'distance_meters': None,
+        'duration_seconds': None,
+        'polyline': '',
+        'steps': [],
+    }
+
+
+def decode_polyline(points: str) -> List[Tuple[float, float]]:
+    """Decode a Google encoded polyline string into (lat, lng) pairs."""
+    coords = []
+    index = 0
+    lat = 0
+    lng = 0
+
+    while index < len(points):
+        deltas = []
+        for _ in range(2):
+            shift = 0
+            result = 0
+            while True:
+                byte = ord(points[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        coords.append((lat / 1e5, lng / 1e5))
+
+    return coords
+
+
+def encode_polyline(coords: List[Tuple[float, float]]) -> str:
+    """Encode (lat, lng) pairs as a Google encoded polyline string."""
+    chunks = []
+    prev_lat = 0
+    prev_lng = 0
+
+    for lat, lng in coords:
+        lat_e5 = int(round(lat * 1e5))
+        lng_e5 = int(round(lng * 1e5))
+        for delta in (lat_e5 - prev_lat, lng_e5 - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat = lat_e5
+        prev_lng = lng_e5
+
+    return ''.join(chunks)
+
+
+def merge_segment_paths(segments: Optional[List[Dict[str, Any]]]) -> List[Tuple[float, float]]:
+    """Join the decoded polylines of consecutive route segments into one path."""
+    path: List[Tuple[float, float]] = []
+    for segment in segments or []:
+        points = decode_polyline(segment.get('polyline') or '')
+        if path and points and path[-1] == points[0]:
+            points = points[1:]
+        path.extend(points)
+    return path
+
+
+_QUANTITY_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([a-z]+)')
+_METERS_PER_UNIT = {'km': 1000.0, 'm': 1.0, 'mi': 1609.344, 'ft': 0.3048}
+_SECONDS_PER_UNIT = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
+
+
+def _parse_distance(text: str) -> float:
+    """Meters in a Directions API distance text such as '0.3 mi' or '1,200 ft'."""
+    total = 0.0
+    for amount, unit in _QUANTITY_RE.findall((text or '').lower().replace(',', '')):
+        total += float(amount) * _METERS_PER_UNIT.get(unit, 0.0)
+    return total
+
+
+def _parse_duration(text: str) -> int:
+    """Seconds in a Directions API duration text such as '1 hour 5 mins'."""
+    total = 0
+    for amount, unit in _QUANTITY_RE.findall((text or '').lower()):
+        total += float(amount) * _SECONDS_PER_UNIT.get(unit[0], 0)
+    return int(total)
+
+
+def summarize_route(route_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Totals and a single merged polyline for a tour's route, small enough to
+    ship with every tour listing. Segments saved before raw meter/second
+    values were kept fall back to parsing their display text.
+    """
+    segments = (route_data or {}).get('segments') or []
+    if not segments:
+        return None
+
+    distance = 0.0
+    duration = 0
+    for segment in segments:
+        meters = segment.get('distance_meters')
+        seconds = segment.get('duration_seconds')
+        distance += meters if meters is not None else _parse_distance(segment.get('distance'))
+        duration += seconds if seconds is not None else _parse_duration(segment.get('duration'))
+
+    return {
+        'segment_count': len(segments),
+        'failed_segments': sum(1 for segment in segments if segment.get('failed')),
+        'distance_meters': round(distance),
+        'duration_seconds': duration,
+        'polyline': encode_polyline(merge_segment_paths(segments)),
+    }
@@ -0,0 +1,170 @@
+"""
+Full-text search over locations.
+
+On SQLite an FTS5 index (``campus_location_fts``) mirrors the searchable
+Location columns. It is an external-content table kept in sync by triggers on
+``campus_location``, so every write path (ORM saves, queryset updates, raw SQL)
+is covered. The table and triggers are (re)created after ``migrate``.
+
+Other database backends, or SQLite builds without FTS5, fall back to
+``icontains`` matching with a plain name-first ordering.
+"""
+import logging
+import re
+from typing import Any, Dict, List
+
+from django.db import DatabaseError, connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.html import escape
+
+from .models import Location
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'campus_location_fts'
+# Column order matters: it is the order of the bm25() weights below.
+FTS_COLUMNS = ('name', 'category', 'address', 'description', 'historical_info')
+FTS_WEIGHTS = (10.0, 4.0, 2.0, 1.0, 1.0)
+SNIPPET_TOKENS = 16
+
+# snippet() wraps matches in these; they are turned into <mark> after escaping.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _fts_statements() -> List[str]:
+    source = Location._meta.db_table
+    columns = ', '.join(FTS_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in FTS_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in FTS_COLUMNS)
+    delete_old = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='{source}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {source} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {source} BEGIN {delete_old} END",
+        # Only the indexed columns: rating counters are updated far more often.
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {source} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def fts_enabled(using: str = 'default') -> bool:
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def install_search_index(using: str = 'default') -> bool:
+    """Create the FTS5 table and triggers if missing, then rebuild the index."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            for statement in _fts_statements():
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    except DatabaseError as e:
+        # Most likely an SQLite build without FTS5; search falls back to icontains.
+        logger.error(f"Could not create location search index: {e}")
+        return False
+    return True
+
+
+def install_search_index_after_migrate(sender, using='default', **kwargs):
+    install_search_index(using)
+
+
+def _fts_query(text: str) -> str:
+    """Quote each word so user input can't inject FTS syntax; the last word matches as a prefix."""
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return ''
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _render_snippet(raw: str) -> str:
+    return escape(raw).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def _fts_search(query: str, limit: int, using: str) -> List[Dict[str, Any]]:
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = (
+        f"SELECT l.id, l.name, l.slug, l.category, "
+        f"snippet({FTS_TABLE}, -1, %s, %s, '…', {SNIPPET_TOKENS}), "
+        f"bm25({FTS_TABLE}, {weights}) AS rank "
+        f"FROM {FTS_TABLE} JOIN {Location._meta.db_table} l ON l.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s"
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [_MARK_START, _MARK_END, query, limit])
+        rows = cursor.fetchall()
+    return [
+        {
+            'id': location_id,
+            'name': name,
+            'slug': slug,
+            'category': category,
+            'snippet': _render_snippet(snippet),
+            # bm25() is lower-is-better; flip it so clients can sort descending.
+            'score': round(-rank, 4),
+        }
+        for location_id, name, slug, category, snippet, rank in rows
+    ]
+
+
+def _excerpt(text: str, needle: str) -> str:
+    position = text.lower().find(needle.lower())
+    if position < 0:
+        return escape(text[:120])
+    start = max(position - 50, 0)
+    end = min(position + len(needle) + 50, len(text))
+    return (
+        ('…' if start else '')
+        + escape(text[start:position])
+        + '<mark>' + escape(text[position:position + len(needle)]) + '</mark>'
+        + escape(text[position + len(needle):end])
+        + ('…' if end < len(text) else '')
+    )
+
+
+def _fallback_search(text: str, limit: int) -> List[Dict[str, Any]]:
+    text = text.strip()
+    matches = Q()
+    for column in FTS_COLUMNS:
+        matches |= Q(**{f'{column}__icontains': text})
+    locations = (
+        Location.objects.filter(matches)
+        .annotate(name_match=Case(When(name__icontains=text, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        .order_by('-name_match', 'name')
+        .only('id', 'name', 'slug', 'category', 'description')[:limit]
+    )
+    return [
+        {
+            'id': location.id,
+            'name': location.name,
+            'slug': location.slug,
+            'category': location.category,
+            'snippet': _excerpt(location.description, text),
+            'score': None,
+        }
+        for location in locations
+    ]
+
+
+def search_locations(text: str, limit: int = 20, using: str = 'default') -> List[Dict[str, Any]]:
+    """Best-matching locations for ``text``; ``snippet`` is HTML with matches in <mark>."""
+    if fts_enabled(using):
+        query = _fts_query(text)
+        return _fts_search(query, limit, using) if query else []
+    return _fallback_search(text, limit)
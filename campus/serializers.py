@@ -0,0 +1,236 @@
+from typing import Any, Dict, Iterable, Optional, Set
+
+from django.db.models import Exists, OuterRef, Prefetch
+
+from .models import SharedTour, TourBookmark, TourStop
+
+# Fields embedded wherever a location appears inside a tour (stops, pickers).
+LOCATION_SUMMARY_FIELDS = (
+    'id',
+    'name',
+    'slug',
+    'description',
+    'latitude',
+    'longitude',
+    'address',
+    'category',
+)
+
+# Fields returned by the public location API.
+LOCATION_API_FIELDS = (
+    'name',
+    'slug',
+    'description',
+    'historical_info',
+    'latitude',
+    'longitude',
+    'address',
+    'category',
+    'image_url',
+    'photo',
+    'photo_width',
+    'photo_height',
+    'photo_srcset',
+    'photo_placeholder',
+    'photo_color',
+    'average_rating',
+    'rating_count',
+)
+
+# How each location field becomes JSON. The keys are also the column names
+# (see LOCATION_FIELD_COLUMNS for the exceptions), so callers can hand a
+# requested subset straight to .only().
+LOCATION_FIELD_SERIALIZERS = {
+    'id': lambda location: location.id,
+    'name': lambda location: location.name,
+    'slug': lambda location: location.slug,
+    'description': lambda location: location.description,
+    'historical_info': lambda location: location.historical_info,
+    'latitude': lambda location: float(location.latitude),
+    'longitude': lambda location: float(location.longitude),
+    'address': lambda location: location.address,
+    'category': lambda location: location.category,
+    'image_url': lambda location: location.image_url,
+    'photo': lambda location: location.photo.url if location.photo else None,
+    'photo_width': lambda location: location.photo_width,
+    'photo_height': lambda location: location.photo_height,
+    'photo_srcset': lambda location: photo_srcsets(location),
+    'photo_placeholder': lambda location: location.photo_placeholder,
+    'photo_color': lambda location: location.photo_color,
+    'average_rating': lambda location: location.average_rating(),
+    'rating_count': lambda location: location.rating_count,
+}
+
+# Serialized fields computed from other columns.
+LOCATION_FIELD_COLUMNS = {
+    'photo_srcset': ('photo_derivatives',),
+    'average_rating': ('rating_sum', 'rating_count'),
+}
+
+
+def photo_srcsets(location) -> Optional[Dict[str, str]]:
+    """``srcset`` strings for the photo's resized copies, per format, or None before they exist."""
+    if not (location.photo_derivatives or {}).get('variants'):
+        return None
+    return {fmt: location.photo_srcset(fmt) for fmt in ('webp', 'jpeg')}
+
+
+def serialize_location(location) -> Dict[str, Any]:
+    """
+    Full JSON-ready representation of a Location.
+
+    ``photo`` is the storage-relative media URL; API views that need an absolute
+    URL resolve it against the request themselves.
+    """
+    return {
+        'id': location.id,
+        'name': location.name,
+        'slug': location.slug,
+        'description': location.description,
+        'historical_info': location.historical_info,
+        'latitude': float(location.latitude),
+        'longitude': float(location.longitude),
+        'address': location.address,
+        'category': location.category,
+        'image_url': location.image_url,
+        'photo': location.photo.url if location.photo else None,
+        'photo_width': location.photo_width,
+        'photo_height': location.photo_height,
+        'photo_srcset': photo_srcsets(location),
+        'photo_placeholder': location.photo_placeholder,
+        'photo_color': location.photo_color,
+        'average_rating': location.average_rating(),
+        'rating_count': location.rating_count,
+    }
+
+
+def serialize_location_summary(location) -> Dict[str, Any]:
+    return {
+        'id': location.id,
+        'name': location.name,
+        'slug': location.slug,
+        'description': location.description,
+        'latitude': float(location.latitude),
+        'longitude': float(location.longitude),
+        'address': location.address,
+        'category': location.category,
+    }
+
+
+def serialize_location_fields(location, fields: Iterable[str]) -> Dict[str, Any]:
+    """Serialize only ``fields``, so a location loaded with ``.only(*fields)`` never hits the DB again."""
+    return {field: LOCATION_FIELD_SERIALIZERS[field](location) for field in fields}
+
+
+def location_field_columns(fields: Iterable[str]) -> Set[str]:
+    """Model columns needed to serialize ``fields``."""
+    columns = set()
+    for field in fields:
+        columns.update(LOCATION_FIELD_COLUMNS.get(field, (field,)))
+    return columns
+
+
+def pick_fields(row: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Copy the requested keys out of a (shared, read-only) serialized row."""
+    return {field: row[field] for field in fields}
+
+
+def serialize_stop(stop) -> Dict[str, Any]:
+    return {
+        'id': stop.id,
+        'location_id': stop.location.id,
+        'order': stop.order,
+        'location': serialize_location_summary(stop.location),
+    }
+
+
+class TourSerializer:
+    """
+    One JSON shape for every tour listing, loaded with a fixed query plan.
+
+    Run querysets through ``prepare()`` (or ``prepare_shares()`` for SharedTour
+    rows) before serializing: it prefetches stops with their locations, the
+    tour's shares when ``include_shares`` is set, and annotates ``is_bookmarked``
+    for ``user``. Serializing any number of prepared tours then costs the same
+    number of queries: one for the tours plus one per prefetched relation.
+
+    The full ``route_data`` (every step of every segment) is never loaded here;
+    listings carry ``route_summary`` and clients fetch the geometry from
+    ``tour-route`` when a tour is opened.
+    """
+
+    def __init__(self, user=None, include_shares: bool = False):
+        self.user = user
+        self.include_shares = include_shares
+
+    def _stop_queryset(self):
+        location_columns = [f'location__{field}' for field in LOCATION_SUMMARY_FIELDS]
+        return TourStop.objects.select_related('location').only('id', 'order', 'tour', 'location', *location_columns)
+
+    def _share_queryset(self):
+        return SharedTour.objects.select_related('shared_with').only(
+            'id', 'tour', 'shared_with__id', 'shared_with__username',
+        )
+
+    def prefetches(self, prefix: str = '') -> list:
+        plan = [Prefetch(f'{prefix}stops', queryset=self._stop_queryset())]
+        if self.include_shares:
+            plan.append(Prefetch(f'{prefix}shares', queryset=self._share_queryset()))
+        return plan
+
+    def _is_bookmarked(self, tour_ref: str):
+        return Exists(TourBookmark.objects.filter(user=self.user, tour=OuterRef(tour_ref)))
+
+    def prepare(self, queryset):
+        queryset = queryset.defer('route_data').prefetch_related(*self.prefetches())
+        if self.user is not None:
+            queryset = queryset.annotate(is_bookmarked=self._is_bookmarked('pk'))
+        return queryset
+
+    def prepare_shares(self, queryset):
+        """Prepare SharedTour rows whose ``tour`` will be serialized."""
+        queryset = (
+            queryset.select_related('tour', 'shared_by')
+            .defer('tour__route_data')
+            .prefetch_related(*self.prefetches('tour__'))
+        )
+        if self.user is not None:
+            queryset = queryset.annotate(is_bookmarked=self._is_bookmarked('tour'))
+        return queryset
+
+    def serialize(self, tour, **extra) -> Dict[str, Any]:
+        data = {
+            'id': tour.id,
+            'name': tour.name,
+            'description': tour.description,
+            'created_at': tour.created_at.isoformat(),
+            'stops': [serialize_stop(stop) for stop in tour.stops.all()],
+            'route_summary': tour.route_summary,
+            'thumbnail_urls': tour.thumbnail_urls,
+            'is_official': tour.is_official,
+        }
+        if hasattr(tour, 'is_bookmarked'):
+            data['is_bookmarked'] = tour.is_bookmarked
+        if self.include_shares:
+            data['shared_with'] = [
+                {'id': share.shared_with.id, 'username': share.shared_with.username, 'share_id': share.id}
+                for share in tour.shares.all()
+            ]
+        data.update(extra)
+        return data
+
+    def serialize_share(self, share, **extra) -> Dict[str, Any]:
+        """A tour as seen by the user it was shared with."""
+        shared_by = share.shared_by
+        if hasattr(share, 'is_bookmarked'):
+            extra.setdefault('is_bookmarked', share.is_bookmarked)
+        return self.serialize(
+            share.tour,
+            share_id=share.id,
+            tour_id=share.tour_id,
+            shared_by=shared_by.username,
+            shared_by_id=shared_by.id,
+            shared_by_display=shared_by.get_full_name() or shared_by.username,
+            shared_at=share.created_at.isoformat(),
+            **extra,
+        )
@@ -0,0 +1,171 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+
+from . import typeahead
+from .images import needs_derivatives, schedule_derivatives
+from .models import Location, LocationChange, Rating, SharedTour, Tour, TourBookmark, TourStop
+from .ratings import apply_rating_change, apply_rollup_change
+from .tours import stop_signals_muted
+from .versions import (
+    bump_catalog_version,
+    bump_now_and_on_commit,
+    bump_official_tours_version,
+    bump_tour_feed_versions,
+)
+
+
+def _invalidate_catalog():
+    bump_now_and_on_commit(bump_catalog_version)
+
+
+def _refresh_typeahead(kind, item_id):
+    transaction.on_commit(lambda: typeahead.apply_change(kind, item_id))
+
+
+def _invalidate_tour_feeds(tour_id, owner_id, official):
+    """Invalidate every feed that lists the tour: its owner's, its recipients' and the official one."""
+    user_ids = {owner_id}
+    user_ids.update(
+        SharedTour.objects.filter(tour_id=tour_id).values_list('shared_with_id', flat=True)
+    )
+
+    def bump():
+        bump_tour_feed_versions(user_ids)
+        if official:
+            bump_official_tours_version()
+
+    bump_now_and_on_commit(bump)
+
+
+@receiver(post_save, sender=Location)
+def location_saved(sender, instance, **kwargs):
+    LocationChange.objects.create(location_id=instance.pk, slug=instance.slug, action='upsert')
+    _invalidate_catalog()
+    _refresh_typeahead('location', instance.pk)
+    if needs_derivatives(instance):
+        transaction.on_commit(lambda: schedule_derivatives(instance.pk))
+
+
+@receiver(post_delete, sender=Location)
+def location_deleted(sender, instance, **kwargs):
+    LocationChange.objects.create(location_id=instance.pk, slug=instance.slug, action='delete')
+    _invalidate_catalog()
+    _refresh_typeahead('location', instance.pk)
+
+
+@receiver(pre_save, sender=Rating)
+def remember_rating_state(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._old_state = None
+    elif update_fields is not None and not {'score', 'status'} & set(update_fields):
+        instance._old_state = (instance.score, instance.status)
+    else:
+        instance._old_state = Rating.objects.filter(pk=instance.pk).values_list('score', 'status').first()
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def rating_changed(sender, instance, **kwargs):
+    if kwargs['signal'] is post_delete:
+        old, new = (instance.score, instance.status), None
+    else:
+        old, new = getattr(instance, '_old_state', None), (instance.score, instance.status)
+    apply_rollup_change(instance.location_id, instance.created_at, old, new)
+
+    if not apply_rating_change(instance.location_id, old and old[0], new and new[0]):
+        return
+    # Rating averages are part of the serialized location, so synced clients
+    # need to re-fetch it too.
+    if Rating._meta.get_field('location').is_cached(instance):
+        slug = instance.location.slug
+    else:
+        # Only the slug column, rather than loading the whole Location row.
+        slug = Location.objects.filter(pk=instance.location_id).values_list('slug', flat=True).first() or ''
+    LocationChange.objects.create(location_id=instance.location_id, slug=slug, action='upsert')
+    _invalidate_catalog()
+
+
+# Tour fields the typeahead index is built from.
+TYPEAHEAD_TOUR_FIELDS = ('name', 'user_id', 'is_official')
+
+
+@receiver(pre_save, sender=Tour)
+def remember_tour_state(sender, instance, **kwargs):
+    # Un-marking a tour as official must still invalidate the official feed.
+    instance._old_state = instance.pk and Tour.objects.filter(pk=instance.pk).values_list(
+        *TYPEAHEAD_TOUR_FIELDS
+    ).first()
+    instance._was_official = bool(instance._old_state and instance._old_state[2])
+
+
+def _typeahead_fields_changed(instance, update_fields):
+    if update_fields is not None and not {'name', 'user', 'user_id', 'is_official'} & set(update_fields):
+        # Route and thumbnail saves: the indexed fields weren't written.
+        return False
+    old = getattr(instance, '_old_state', None)
+    return old is None or old != tuple(getattr(instance, field) for field in TYPEAHEAD_TOUR_FIELDS)
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+def tour_changed(sender, instance, update_fields=None, **kwargs):
+    official = instance.is_official or getattr(instance, '_was_official', False)
+    _invalidate_tour_feeds(instance.pk, instance.user_id, official)
+    if kwargs['signal'] is post_delete or _typeahead_fields_changed(instance, update_fields):
+        _refresh_typeahead('tour', instance.pk)
+
+
+@receiver(post_save, sender=TourStop)
+@receiver(post_delete, sender=TourStop)
+def tour_stop_changed(sender, instance, **kwargs):
+    if stop_signals_muted():
+        # save_tour() invalidates once for the whole tour.
+        return
+    tour = Tour.objects.filter(pk=instance.tour_id).values('user_id', 'is_official').first()
+    if tour:
+        _invalidate_tour_feeds(instance.tour_id, tour['user_id'], tour['is_official'])
+
+
+@receiver(post_save, sender=SharedTour)
+@receiver(post_delete, sender=SharedTour)
+def shared_tour_changed(sender, instance, **kwargs):
+    bump_now_and_on_commit(lambda: bump_tour_feed_versions([instance.shared_with_id]))
+
+
+@receiver(post_save, sender=TourBookmark)
+@receiver(post_delete, sender=TourBookmark)
+def tour_bookmark_changed(sender, instance, **kwargs):
+    # Feeds carry is_bookmarked, and only the bookmarking user's feed shows it.
+    bump_now_and_on_commit(lambda: bump_tour_feed_versions([instance.user_id]))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Logins only touch last_login, which nothing derived depends on.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    _refresh_typeahead('user', instance.pk)
+    if created:
+        return
+    # Shared tours show the sharer's display name.
+    recipient_ids = list(
+        SharedTour.objects.filter(shared_by=instance).values_list('shared_with_id', flat=True)
+    )
+    if recipient_ids:
+        bump_now_and_on_commit(lambda: bump_tour_feed_versions(recipient_ids))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    _refresh_typeahead('user', instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    # Private profiles are left out of typeahead suggestions.
+    _refresh_typeahead('user', instance.user_id)
@@ -0,0 +1,51 @@
+"""
+Content-addressed media storage.
+
+Files are named after the SHA-256 of their bytes, under the directory the
+field asked for (``locations/photos/ab/ab12….jpg``). Uploading the same bytes
+twice stores them once, and because a name can only ever hold one content its
+URL can be cached forever: ``url()`` points at ``campus.views.media_file``,
+which serves these files as immutable.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from django.utils.deconstruct import deconstructible
+
+CONTENT_ADDRESSED_NAME_RE = re.compile(r'^(?:[\w-]+/)*[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})\.\w+$')
+_HASH_CHUNK_SIZE = 64 * 1024
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names every saved file by its content hash."""
+
+    def save(self, name, content, max_length=None):
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        hasher = hashlib.sha256()
+        for chunk in content.chunks(_HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+        content.seek(0)
+
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        hashed_name = posixpath.join(directory, digest[:2], f'{digest}{extension}')
+        if self.exists(hashed_name):
+            # Identical bytes are already stored under this name.
+            return hashed_name
+        return super().save(hashed_name, content, max_length)
+
+    def url(self, name):
+        if name and CONTENT_ADDRESSED_NAME_RE.match(name):
+            return reverse('campus:media', args=[name])
+        # Files stored before this backend keep their original names and URLs.
+        return super().url(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
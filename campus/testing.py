@@ -0,0 +1,53 @@
+"""
+Test helpers for keeping endpoints' query counts in check.
+
+Mix ``QueryBudgetMixin`` into a TestCase, then:
+
+- ``assertQueryBudget(budget, url)`` fails when the request runs more than
+  ``budget`` queries, or repeats one query shape (see ``campus.queries``).
+- ``assertConstantQueries(url, grow)`` runs the request, calls ``grow()`` to
+  add more data, runs it again and fails unless both counts are equal. This
+  is the N+1 check: a loop that queries per row costs more once there are
+  more rows. A warm-up request runs first, so caches that survive ``grow()``
+  (e.g. the location catalog) are filled for both counted runs.
+
+On failure the message lists the queries that ran.
+"""
+from typing import Callable
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .queries import duplicate_shapes
+
+
+class QueryBudgetMixin:
+    def _run_counted(self, url, method='get', expected_status=200, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertEqual(response.status_code, expected_status, url)
+        return queries.captured_queries, response
+
+    def _describe(self, queries) -> str:
+        return '\n'.join(f"{index}. {query['sql']}" for index, query in enumerate(queries, start=1))
+
+    def assertQueryBudget(self, budget: int, url, method='get', expected_status=200, **kwargs):
+        queries, response = self._run_counted(url, method, expected_status, **kwargs)
+        if len(queries) > budget:
+            self.fail(f"{url} ran {len(queries)} queries (budget {budget}):\n{self._describe(queries)}")
+        duplicates = duplicate_shapes(queries)
+        if duplicates:
+            repeated = '\n'.join(f'{count}x {shape}' for shape, count in duplicates)
+            self.fail(f"{url} repeats queries:\n{repeated}")
+        return response
+
+    def assertConstantQueries(self, url, grow: Callable[[], None], method='get', expected_status=200, **kwargs):
+        self._run_counted(url, method, expected_status, **kwargs)
+        before, _ = self._run_counted(url, method, expected_status, **kwargs)
+        grow()
+        after, response = self._run_counted(url, method, expected_status, **kwargs)
+        if len(after) != len(before):
+            self.fail(
+                f"{url} ran {len(before)} queries, then {len(after)} with more data:\n{self._describe(after)}"
+            )
+        return response
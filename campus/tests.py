@@ -1,14 +1,42 @@
+import gzip
+import json
+import marshal
 import shutil
 import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 
+from accounts.models import Friendship, UserProfile
+
+from . import metrics
 from .admin import LocationAdmin
-from .models import Location
+from .catalog import get_catalog
+from .loadtest import SKIPPED, classify_error, run_load_test, summarize
+from .models import (
+    Bookmark, Location, Rating, RatingRollup, RequestProfile, SharedTour, Tour, TourBookmark, TourStop,
+)
+from .queries import sql_shape
+from .route_utils import RouteCalculationError, calculate_route_segments, encode_polyline
+from .search import fts_enabled
+from .testing import QueryBudgetMixin
+from .thumbnails import generate_tour_thumbnail
+from .traffic import REDACTED, read_capture
+from .typeahead import GENERATION_KEY, suggest
 
 
 class LocationAdminConfigTests(TestCase):
@@ -107,3 +135,1362 @@ class LocationAdminFlowTests(TestCase):
         response = self.client.post(delete_url, {'post': 'yes'}, follow=True)
         self.assertEqual(response.status_code, 200)
         self.assertFalse(Location.objects.filter(pk=location.pk).exists())
+
+
+class TourThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media_dir = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media_dir)
+        cls._media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('walker', password='StrongPass123!')
+        self.tower = Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+        self.library = Location.objects.create(
+            name='Library', description='Books.', latitude='33.774300', longitude='-84.395700',
+        )
+        self.tour = Tour.objects.create(
+            user=self.user,
+            name='Quick Loop',
+            route_data={'segments': [{
+                'polyline': encode_polyline([(33.7725, -84.3947), (33.7735, -84.3950), (33.7743, -84.3957)]),
+            }]},
+        )
+        TourStop.objects.create(tour=self.tour, location=self.tower, order=1)
+        TourStop.objects.create(tour=self.tour, location=self.library, order=2)
+
+    def test_thumbnail_is_content_addressed(self):
+        digest = generate_tour_thumbnail(self.tour)
+        self.assertTrue(digest)
+        self.tour.refresh_from_db()
+        self.assertEqual(self.tour.thumbnail_digest, digest)
+        self.assertEqual(generate_tour_thumbnail(self.tour), digest)
+
+        self.tour.route_data = None
+        self.assertNotEqual(generate_tour_thumbnail(self.tour), digest)
+
+    def test_thumbnail_served_with_immutable_caching(self):
+        generate_tour_thumbnail(self.tour)
+        response = self.client.get(self.tour.thumbnail_urls['png'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'\x89PNG'))
+
+        stale_url = reverse('campus:tour-thumbnail', args=[self.tour.id, '0' * 20, 'png'])
+        self.assertEqual(self.client.get(stale_url).status_code, 404)
+
+
+@override_settings(IMAGE_DERIVATIVES_INLINE=True)
+class PhotoDerivativeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media_dir = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media_dir)
+        cls._media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def photo(self, size=(2000, 1000)):
+        buffer = BytesIO()
+        Image.new('RGB', size, (0, 48, 87)).save(buffer, 'JPEG')
+        return SimpleUploadedFile('tower.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_renders_sized_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.create(
+                name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+                photo=self.photo(),
+            )
+        location.refresh_from_db()
+        self.assertEqual((location.photo_width, location.photo_height), (2000, 1000))
+        variants = {variant['name']: variant for variant in location.photo_derivatives['variants']}
+        self.assertEqual((variants['thumb']['width'], variants['thumb']['height']), (320, 160))
+        self.assertEqual(variants['hero']['width'], 1600)
+
+        row = get_catalog()[0]
+        self.assertRegex(row['photo_srcset']['webp'], r'^/campus/media/locations/derivatives/\S+\.webp 320w, ')
+        self.assertIn('.jpeg 640w', row['photo_srcset']['jpeg'])
+        self.assertRegex(row['photo_color'], r'^#0030(57|58)$')  # JPEG may shift a channel by one
+        self.assertTrue(row['photo_placeholder'].startswith('data:image/webp;base64,'))
+        self.assertLess(len(row['photo_placeholder']), 400)
+        listed = self.client.get(reverse('campus:location-list'), {'fields': 'slug,photo_color'}).json()
+        self.assertEqual(listed['locations'], [{'slug': 'tech-tower', 'photo_color': row['photo_color']}])
+
+        page = self.client.get(reverse('campus:location-detail', args=[location.slug]))
+        self.assertContains(page, 'type="image/webp"')
+        self.assertContains(page, 'width="2000" height="1000"')
+
+    def test_force_backfills_existing_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.create(
+                name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+                photo=self.photo(),
+            )
+        # Rendered before placeholders and colours were stored.
+        Location.objects.filter(pk=location.pk).update(photo_placeholder='', photo_color='')
+
+        call_command('render_photo_derivatives', stdout=StringIO())
+        self.assertEqual(Location.objects.get(pk=location.pk).photo_color, '')
+        call_command('render_photo_derivatives', force=True, stdout=StringIO())
+        location.refresh_from_db()
+        self.assertTrue(location.photo_color)
+        self.assertTrue(location.photo_placeholder)
+
+    def test_photos_are_deduplicated_and_served_immutable(self):
+        first = Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+            photo=self.photo(),
+        )
+        second = Location.objects.create(
+            name='Tech Tower Annex', description='Same photo.', latitude='33.772600', longitude='-84.394800',
+            photo=self.photo(),
+        )
+        self.assertEqual(first.photo.name, second.photo.name)
+        self.assertRegex(first.photo.name, r'^locations/photos/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+
+        response = self.client.get(first.photo.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertTrue(response.has_header('Expires'))
+        self.assertEqual(self.client.get(first.photo.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(reverse('campus:media', args=['../settings.py'])).status_code, 404)
+
+    def test_removing_photo_clears_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.create(
+                name='Library', description='Books.', latitude='33.774300', longitude='-84.395700',
+                photo=self.photo((200, 100)),
+            )
+        location.refresh_from_db()
+        self.assertEqual(location.photo_derivatives['variants'][2]['width'], 200)
+
+        location.photo = None
+        with self.captureOnCommitCallbacks(execute=True):
+            location.save()
+        location.refresh_from_db()
+        self.assertEqual((location.photo_derivatives, location.photo_width), ({}, None))
+        self.assertEqual((location.photo_placeholder, location.photo_color), ('', ''))
+
+
+class LocationCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('rater', password='StrongPass123!')
+        self.location = Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+
+    def test_catalog_follows_location_and_rating_writes(self):
+        self.assertEqual([row['name'] for row in get_catalog()], ['Tech Tower'])
+
+        self.location.name = 'Lettie Pate Whitehead Evans Building'
+        self.location.save()
+        Rating.objects.create(user=self.user, location=self.location, score=4)
+        row = get_catalog()[0]
+        self.assertEqual(row['name'], 'Lettie Pate Whitehead Evans Building')
+        self.assertEqual((row['average_rating'], row['rating_count']), (4.0, 1))
+
+        self.location.delete()
+        self.assertEqual(get_catalog(), [])
+
+    def test_location_list_reuses_cached_catalog(self):
+        url = reverse('campus:location-list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['locations'][0]['slug'], 'tech-tower')
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.alice = User.objects.create_user('alice', password='StrongPass123!')
+        self.bob = User.objects.create_user('bob', password='StrongPass123!')
+        self.location = Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+
+    def assertTotals(self, count, total, histogram):
+        location = Location.objects.get(pk=self.location.pk)
+        self.assertEqual((location.rating_count, location.rating_sum), (count, total))
+        self.assertEqual(location.rating_histogram, histogram)
+
+    def test_totals_follow_rating_writes(self):
+        stale = Location.objects.get(pk=self.location.pk)
+        rating = Rating.objects.create(user=self.alice, location=self.location, score=5)
+        Rating.objects.create(user=self.bob, location=self.location, score=2)
+        self.assertTotals(2, 7, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        rating.score = 3
+        rating.save()
+        rating.status = 'reviewed'
+        rating.save()
+        self.assertTotals(2, 5, {1: 0, 2: 1, 3: 1, 4: 0, 5: 0})
+
+        # Saving a location loaded before the ratings must not reset them.
+        stale.description = 'Home of the T.'
+        stale.save()
+        rating.delete()
+        self.assertTotals(1, 2, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+        self.assertEqual(Location.objects.get(pk=self.location.pk).average_rating(), 2.0)
+
+    def test_rate_location_reports_updated_totals(self):
+        self.client.login(username='alice', password='StrongPass123!')
+        url = reverse('campus:rate_location', args=[self.location.slug])
+        self.client.post(url, data=json.dumps({'score': 4}), content_type='application/json')
+        response = self.client.post(url, data=json.dumps({'score': 2}), content_type='application/json')
+        self.assertEqual((response.json()['average_rating'], response.json()['rating_count']), (2.0, 1))
+
+        listed = self.client.get(reverse('campus:location-list'), {'fields': 'slug,average_rating'}).json()
+        self.assertEqual(listed['locations'], [{'slug': 'tech-tower', 'average_rating': 2.0}])
+
+    def test_repair_command_rebuilds_totals(self):
+        Rating.objects.create(user=self.alice, location=self.location, score=4)
+        Location.objects.filter(pk=self.location.pk).update(rating_count=9, rating_sum=0, rating_4_count=0)
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.assertTotals(1, 4, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+        self.assertEqual(get_catalog()[0]['rating_count'], 1)
+
+
+class RatingRollupTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'AdminPass123!')
+        self.user = User.objects.create_user('rater', password='StrongPass123!')
+        self.tower = Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+        self.library = Location.objects.create(
+            name='Library', description='Books.', latitude='33.774300', longitude='-84.395700',
+        )
+
+    def test_rollup_follows_rating_and_respond_writes(self):
+        rating = Rating.objects.create(user=self.user, location=self.tower, score=5)
+        self.client.login(username='admin', password='AdminPass123!')
+        self.client.post(
+            reverse('campus:respond_to_feedback', args=[rating.id]),
+            data=json.dumps({'status': 'reviewed'}),
+            content_type='application/json',
+        )
+        rating.refresh_from_db()
+        rating.score = 2
+        rating.save()
+
+        rollup = RatingRollup.objects.get(location=self.tower)
+        self.assertEqual((rollup.score_2, rollup.score_5, rollup.rating_count), (1, 0, 1))
+        self.assertEqual((rollup.status_new, rollup.status_reviewed), (0, 1))
+
+        rating.delete()
+        self.assertEqual(RatingRollup.objects.get(location=self.tower).rating_count, 0)
+
+        Rating.objects.create(user=self.user, location=self.tower, score=4)
+        self.tower.delete()
+        self.assertFalse(RatingRollup.objects.exists())
+
+    def test_trends_rank_declining_locations_first(self):
+        today = timezone.localdate()
+        last_week = today - timedelta(days=7)
+        RatingRollup.objects.create(location=self.tower, date=last_week, score_5=2, status_resolved=2)
+        RatingRollup.objects.create(location=self.tower, date=today, score_2=1, score_3=1, status_new=2)
+        RatingRollup.objects.create(location=self.library, date=last_week, score_3=1, status_new=1)
+        RatingRollup.objects.create(location=self.library, date=today, score_4=1, status_new=1)
+
+        self.client.login(username='admin', password='AdminPass123!')
+        trends = self.client.get(reverse('campus:feedback_trends')).json()['locations']
+        self.assertEqual([trend['slug'] for trend in trends], ['tech-tower', 'library'])
+        self.assertEqual((trends[0]['previous_average'], trends[0]['current_average']), (5.0, 2.5))
+        self.assertEqual(trends[0]['unreviewed'], 2)
+
+        response = self.client.get(reverse('campus:feedback_dashboard'))
+        self.assertEqual([trend['slug'] for trend in response.context['declining_locations']], ['tech-tower'])
+
+
+class LocationSearchTests(TestCase):
+    def setUp(self):
+        Location.objects.create(
+            name='Clough Commons', category='Academic', latitude='33.774900', longitude='-84.396500',
+            description='Study rooms and a <rooftop> garden next to the library.',
+        )
+        Location.objects.create(
+            name='Library', category='Academic', latitude='33.774300', longitude='-84.395700',
+            description='Books, archives and quiet floors.',
+        )
+        self.url = reverse('campus:location-search')
+
+    def search(self, query):
+        return self.client.get(self.url, {'q': query}).json()['results']
+
+    def test_ranked_results_with_escaped_snippets(self):
+        results = self.search('librar')
+        self.assertEqual([result['slug'] for result in results], ['library', 'clough-commons'])
+        self.assertIn('&lt;rooftop&gt;', results[1]['snippet'])
+        self.assertIn('<mark>library</mark>', results[1]['snippet'])
+        self.assertEqual(self.search('"OR NEAR('), [])
+
+    def test_index_follows_queryset_writes(self):
+        self.assertTrue(fts_enabled())
+        Location.objects.filter(slug='library').update(description='Home of the makerspace.')
+        self.assertEqual([result['slug'] for result in self.search('makerspace')], ['library'])
+        Location.objects.filter(slug='library').delete()
+        self.assertEqual(self.search('makerspace'), [])
+
+    def test_falls_back_to_icontains_without_fts(self):
+        with mock.patch('campus.search.fts_enabled', return_value=False):
+            results = self.search('rooftop')
+        self.assertEqual([result['slug'] for result in results], ['clough-commons'])
+        self.assertIn('<mark>rooftop</mark>', results[0]['snippet'])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class TypeaheadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user('tourguide', password='StrongPass123!', first_name='Tessa')
+        self.other = User.objects.create_user('techfan', password='StrongPass123!')
+        Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+        Location.objects.create(
+            name='Café Tech', description='Coffee.', latitude='33.774300', longitude='-84.395700',
+        )
+        Tour.objects.create(user=self.owner, name='Tech Highlights')
+        Tour.objects.create(user=self.other, name='Tech Secrets')
+        self.url = reverse('campus:typeahead')
+
+    def labels(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        return [(item['type'], item['label']) for item in response.json()['suggestions']]
+
+    def test_mixed_ranked_suggestions(self):
+        self.client.login(username='tourguide', password='StrongPass123!')
+        self.assertEqual(self.labels('tech'), [
+            ('location', 'Tech Tower'),
+            ('tour', 'Tech Highlights'),
+            ('user', 'techfan'),
+            ('location', 'Café Tech'),
+        ])
+        self.assertEqual(self.labels('cafe'), [('location', 'Café Tech')])
+        self.assertEqual(self.labels('t', types='user'), [('user', 'techfan')])
+
+    def test_anonymous_requests_get_no_user_suggestions(self):
+        Tour.objects.create(user=self.owner, name='Tech Official', is_official=True)
+        self.assertEqual(self.labels('tech'), [
+            ('location', 'Tech Tower'),
+            ('tour', 'Tech Official'),
+            ('location', 'Café Tech'),
+        ])
+        self.assertEqual(self.labels('t', types='user'), [])
+
+    def test_index_is_patched_after_commit(self):
+        self.labels('tech')
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(
+                name='Technology Square', description='Shops.', latitude='33.776900', longitude='-84.389400',
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProfile.objects.create(user=self.other, is_private=True)
+        with self.assertNumQueries(0):
+            labels = self.labels('tech')
+        self.assertIn(('location', 'Technology Square'), labels)
+        with self.assertNumQueries(0):
+            suggested = [(item['type'], item['label']) for item in suggest('tech', self.owner)]
+        self.assertNotIn(('user', 'techfan'), suggested)
+
+    def test_only_indexed_tour_fields_refresh_the_index(self):
+        self.labels('tech')
+        generation = cache.get(GENERATION_KEY)
+        tour = Tour.objects.get(name='Tech Highlights')
+        with self.captureOnCommitCallbacks(execute=True):
+            tour.route_data = {'segments': []}
+            tour.save(update_fields=['route_data'])
+            tour.description = 'Still the same name.'
+            tour.save()
+        self.assertEqual(cache.get(GENERATION_KEY), generation)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tour.name = 'Tech Favorites'
+            tour.save()
+        self.assertEqual(cache.get(GENERATION_KEY), generation + 1)
+        self.client.login(username='tourguide', password='StrongPass123!')
+        self.assertIn(('tour', 'Tech Favorites'), self.labels('tech'))
+
+
+class TourSerializerQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', password='StrongPass123!')
+        self.friend = User.objects.create_user('friend', password='StrongPass123!')
+        self.curator = User.objects.create_user('curator', password='StrongPass123!')
+        self.locations = [
+            Location.objects.create(
+                name=f'Stop {index}', description='A stop.', latitude='33.772500', longitude='-84.394700',
+            )
+            for index in range(3)
+        ]
+        self.client.login(username='owner', password='StrongPass123!')
+
+    def add_tours(self, count):
+        for index in range(count):
+            owned = Tour.objects.create(user=self.owner, name=f'Owned {index}')
+            received = Tour.objects.create(user=self.friend, name=f'Received {index}')
+            official = Tour.objects.create(user=self.curator, name=f'Official {index}', is_official=True)
+            for tour in (owned, received, official):
+                for order, location in enumerate(self.locations, start=1):
+                    TourStop.objects.create(tour=tour, location=location, order=order)
+            SharedTour.objects.create(tour=received, shared_by=self.friend, shared_with=self.owner)
+            SharedTour.objects.create(tour=owned, shared_by=self.owner, shared_with=self.friend)
+            TourBookmark.objects.create(user=self.owner, tour=owned)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_listings_use_a_fixed_number_of_queries(self):
+        urls = [
+            reverse('campus:overview'), reverse('accounts:profile'),
+            reverse('accounts:user_profile', args=['friend']),
+            reverse('campus:tour-list'), reverse('campus:shared_tours_list'), reverse('campus:tour-manage'),
+        ]
+        # The profile pages create a missing UserProfile on first view.
+        for user in (self.owner, self.friend):
+            UserProfile.objects.create(user=user)
+        self.add_tours(1)
+        baseline = {url: self.count_queries(url)[0] for url in urls}
+        self.add_tours(4)
+        for url in urls:
+            count, response = self.count_queries(url)
+            self.assertEqual(count, baseline[url], url)
+
+        tours = self.client.get(reverse('campus:tour-list')).json()['tours']
+        self.assertEqual(len(tours), 15)
+        self.assertEqual([stop['order'] for stop in tours[0]['stops']], [1, 2, 3])
+        self.assertEqual(
+            {tour['tour_type'] for tour in tours if tour['name'].startswith('Official')}, {'official'}
+        )
+        managed = response.context['tours_payload'][0]
+        self.assertTrue(managed['is_bookmarked'])
+        self.assertEqual(managed['shared_with'][0]['username'], 'friend')
+
+
+class TourRouteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', password='StrongPass123!')
+        self.friend = User.objects.create_user('friend', password='StrongPass123!')
+        self.stranger = User.objects.create_user('stranger', password='StrongPass123!')
+        self.tour = Tour.objects.create(
+            user=self.owner,
+            name='Two Legs',
+            route_data={'segments': [
+                {
+                    'distance': '0.2 mi', 'duration': '4 mins',
+                    'distance_meters': 320, 'duration_seconds': 240,
+                    'polyline': encode_polyline([(33.7725, -84.3947), (33.7735, -84.3950)]),
+                    'steps': [{'instruction': 'Head north', 'polyline': ''}],
+                },
+                {
+                    # Saved before raw values were kept: totals come from the text.
+                    'distance': '1,000 ft', 'duration': '1 hour 5 mins',
+                    'polyline': encode_polyline([(33.7735, -84.3950), (33.7743, -84.3957)]),
+                },
+            ]},
+        )
+        SharedTour.objects.create(tour=self.tour, shared_by=self.owner, shared_with=self.friend)
+
+    def test_summary_is_kept_with_route_data(self):
+        summary = self.tour.route_summary
+        self.assertEqual(summary['segment_count'], 2)
+        self.assertEqual(summary['distance_meters'], 625)
+        self.assertEqual(summary['duration_seconds'], 240 + 3900)
+        self.assertEqual(
+            summary['polyline'],
+            encode_polyline([(33.7725, -84.3947), (33.7735, -84.3950), (33.7743, -84.3957)]),
+        )
+
+        self.tour.route_data = None
+        self.tour.save(update_fields=['route_data'])
+        self.tour.refresh_from_db()
+        self.assertIsNone(self.tour.route_summary)
+
+    def test_listings_defer_route_data(self):
+        self.client.login(username='owner', password='StrongPass123!')
+        with CaptureQueriesContext(connection) as queries:
+            tours = self.client.get(reverse('campus:tour-list')).json()['tours']
+        self.assertNotIn('route_data', tours[0])
+        self.assertEqual(tours[0]['route_summary']['segment_count'], 2)
+        self.assertFalse(any('"route_data"' in query['sql'] for query in queries))
+
+    def test_pages_listing_tours_defer_route_data(self):
+        friend = Client()
+        friend.login(username='friend', password='StrongPass123!')
+        self.client.login(username='owner', password='StrongPass123!')
+        for client, url in (
+            (self.client, reverse('campus:overview')),
+            (self.client, reverse('accounts:profile')),
+            (friend, reverse('campus:overview')),
+            (friend, reverse('accounts:user_profile', args=['owner'])),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            self.assertContains(response, 'Two Legs')
+            self.assertFalse(any('"route_data"' in query['sql'] for query in queries), url)
+
+    def test_route_endpoint_checks_access(self):
+        url = reverse('campus:tour-route', args=[self.tour.id])
+        self.client.login(username='friend', password='StrongPass123!')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['route_data'], self.tour.route_data)
+
+        self.client.login(username='stranger', password='StrongPass123!')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.tour.is_official = True
+        self.tour.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+def fake_route_segments(stops):
+    def point(stop):
+        return {'location_id': stop['id'], 'name': stop['name'], 'lat': stop['latitude'], 'lng': stop['longitude']}
+
+    return [
+        {
+            'segment_index': index,
+            'origin': point(origin),
+            'destination': point(destination),
+            'distance': '0.1 mi', 'duration': '2 mins', 'distance_meters': 160, 'duration_seconds': 120,
+            'polyline': encode_polyline([
+                (origin['latitude'], origin['longitude']), (destination['latitude'], destination['longitude']),
+            ]),
+        }
+        for index, (origin, destination) in enumerate(zip(stops, stops[1:]))
+    ]
+
+
+@mock.patch('campus.route_utils.calculate_route_segments', side_effect=fake_route_segments)
+@mock.patch('campus.tours.generate_tour_thumbnail')
+class TourWriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('planner', password='StrongPass123!')
+        self.locations = [
+            Location.objects.create(
+                name=f'Spot {index}', description='A spot.',
+                latitude=f'33.77{index:04d}', longitude='-84.394700',
+            )
+            for index in range(30)
+        ]
+        self.client.login(username='planner', password='StrongPass123!')
+
+    def create(self, locations):
+        return self.client.post(
+            reverse('campus:tour-list'),
+            data=json.dumps({'name': 'Walk', 'location_ids': [location.id for location in locations]}),
+            content_type='application/json',
+        )
+
+    def test_create_uses_constant_queries(self, thumbnail, route):
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.create(self.locations[:3]).status_code, 201)
+        with CaptureQueriesContext(connection) as large:
+            response = self.create(self.locations)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(large), len(small))
+
+        data = response.json()
+        self.assertEqual([stop['location_id'] for stop in data['stops']], [location.id for location in self.locations])
+        self.assertEqual(data['route_summary']['segment_count'], 29)
+        self.assertFalse(data['is_bookmarked'])
+        tour = Tour.objects.get(pk=data['id'])
+        self.assertEqual(list(tour.stops.values_list('order', flat=True)), [1024 * n for n in range(1, 31)])
+
+    def test_update_replaces_stops_and_invalidates_feed(self, thumbnail, route):
+        tour_id = self.create(self.locations[:3]).json()['id']
+        TourBookmark.objects.create(user=self.user, tour_id=tour_id)
+        etag = self.client.get(reverse('campus:tour-list'))['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                reverse('campus:tour-detail', args=[tour_id]),
+                data=json.dumps({'name': 'Reversed', 'location_ids': [self.locations[1].id, self.locations[0].id]}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(queries), 20)
+        self.assertEqual([stop['location_id'] for stop in response.json()['stops']], [self.locations[1].id, self.locations[0].id])
+        self.assertTrue(response.json()['is_bookmarked'])
+
+        listing = self.client.get(reverse('campus:tour-list'))
+        self.assertNotEqual(listing['ETag'], etag)
+        self.assertEqual(listing.json()['tours'][0]['name'], 'Reversed')
+        self.assertEqual(TourStop.objects.filter(tour_id=tour_id).count(), 2)
+
+    def patch(self, tour_id, *operations):
+        return self.client.patch(
+            reverse('campus:tour-detail', args=[tour_id]),
+            data=json.dumps({'operations': list(operations)}),
+            content_type='application/json',
+        )
+
+    def test_patch_moves_one_row_and_routes_changed_legs(self, thumbnail, route):
+        a, b, c, d = self.locations[:4]
+        tour_id = self.create([a, b, c, d]).json()['id']
+        self.assertEqual(route.call_count, 3)
+
+        route.reset_mock()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(tour_id, {'op': 'move', 'location_id': d.id, 'position': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([stop['location_id'] for stop in response.json()['stops']], [a.id, d.id, b.id, c.id])
+        # a->b and c->d are gone, b->c is reused; a->d and d->b are new.
+        self.assertEqual(route.call_count, 2)
+        stop_updates = [q for q in queries if q['sql'].startswith('UPDATE "campus_tourstop"')]
+        self.assertEqual(len(stop_updates), 1)
+        self.assertTrue(response.json()['route_summary']['polyline'])
+
+        response = self.patch(
+            tour_id,
+            {'op': 'remove', 'location_id': b.id},
+            {'op': 'insert', 'location_id': self.locations[5].id, 'position': 0},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(TourStop.objects.filter(tour_id=tour_id).values_list('location_id', flat=True)),
+            [self.locations[5].id, a.id, d.id, c.id],
+        )
+
+    def test_failed_leg_keeps_the_routed_legs(self, thumbnail, route):
+        a, b, c, d = self.locations[:4]
+        tour_id = self.create([a, b, c]).json()['id']
+
+        route.reset_mock()
+        route.side_effect = RouteCalculationError('Directions API error: OVER_QUERY_LIMIT')
+        response = self.patch(tour_id, {'op': 'insert', 'location_id': d.id})
+        self.assertEqual(response.status_code, 200)
+        segments = Tour.objects.get(pk=tour_id).route_data['segments']
+        self.assertEqual([segment.get('failed', False) for segment in segments], [False, False, True])
+        self.assertEqual(response.json()['route_summary']['failed_segments'], 1)
+
+        # Only the failed leg is asked for again.
+        route.reset_mock()
+        route.side_effect = fake_route_segments
+        self.patch(tour_id, {'op': 'move', 'location_id': d.id, 'position': 3})
+        self.assertEqual(route.call_count, 1)
+        summary = Tour.objects.get(pk=tour_id).route_summary
+        self.assertEqual((summary['segment_count'], summary['failed_segments']), (3, 0))
+
+    def test_patch_renumbers_when_gap_runs_out(self, thumbnail, route):
+        a, b, c = self.locations[:3]
+        tour = Tour.objects.create(user=self.user, name='Legacy')
+        for order, location in enumerate((a, b, c), start=1):
+            TourStop.objects.create(tour=tour, location=location, order=order)
+
+        response = self.patch(tour.id, {'op': 'move', 'location_id': c.id, 'position': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(TourStop.objects.filter(tour=tour).values_list('location_id', 'order')),
+            [(a.id, 1024), (c.id, 2048), (b.id, 3072)],
+        )
+
+    def test_patch_rejects_bad_operations(self, thumbnail, route):
+        a, b = self.locations[:2]
+        tour_id = self.create([a, b]).json()['id']
+        for operation in (
+            {'op': 'insert', 'location_id': a.id},
+            {'op': 'move', 'location_id': self.locations[9].id, 'position': 0},
+            {'op': 'move', 'location_id': a.id, 'position': 5},
+            {'op': 'swap', 'location_id': a.id},
+        ):
+            self.assertEqual(self.patch(tour_id, operation).status_code, 400, operation)
+        self.assertEqual(
+            self.patch(tour_id, {'op': 'remove', 'location_id': a.id}, {'op': 'remove', 'location_id': b.id}).status_code,
+            400,
+        )
+        self.assertEqual(TourStop.objects.filter(tour_id=tour_id).count(), 2)
+
+    def test_clone_copies_stops_and_route_without_routing(self, thumbnail, route):
+        a, b, c = self.locations[:3]
+        curator = get_user_model().objects.create_user('curator', password='StrongPass123!')
+        stranger = get_user_model().objects.create_user('stranger', password='StrongPass123!')
+        source = Tour.objects.create(
+            user=curator, name='Highlights', is_official=True, thumbnail_digest='a' * 20,
+            route_data={'segments': fake_route_segments([
+                {'id': loc.id, 'name': loc.name, 'latitude': float(loc.latitude), 'longitude': float(loc.longitude)}
+                for loc in (a, b, c)
+            ])},
+        )
+        for order, location in enumerate((a, b, c), start=1):
+            TourStop.objects.create(tour=source, location=location, order=order * 1024)
+
+        response = self.client.post(reverse('campus:tour-clone', args=[source.id]), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['name'], 'Highlights (copy)')
+        self.assertFalse(data['is_official'])
+        self.assertEqual([stop['location_id'] for stop in data['stops']], [a.id, b.id, c.id])
+        self.assertEqual(data['route_summary']['segment_count'], 2)
+        clone = Tour.objects.get(pk=data['id'])
+        self.assertEqual((clone.user, clone.route_data, clone.thumbnail_digest), (self.user, source.route_data, 'a' * 20))
+        route.assert_not_called()
+
+        # Only the legs the new owner changes are routed.
+        self.patch(clone.id, {'op': 'remove', 'location_id': c.id})
+        route.assert_not_called()
+        self.patch(clone.id, {'op': 'insert', 'location_id': c.id, 'position': 1})
+        self.assertEqual(route.call_count, 2)
+
+        source.is_official = False
+        source.save()
+        self.client.login(username='stranger', password='StrongPass123!')
+        self.assertEqual(
+            self.client.post(reverse('campus:tour-clone', args=[source.id]), content_type='application/json').status_code,
+            403,
+        )
+        SharedTour.objects.create(tour=source, shared_by=curator, shared_with=stranger)
+        response = self.client.post(
+            reverse('campus:tour-clone', args=[source.id]),
+            data=json.dumps({'name': 'Mine now'}), content_type='application/json',
+        )
+        self.assertEqual(response.json()['name'], 'Mine now')
+
+    def test_invalid_ids_write_nothing(self, thumbnail, route):
+        for location_ids in ([self.locations[0].id, self.locations[0].id], [self.locations[0].id, 999999], ['x'], []):
+            response = self.client.post(
+                reverse('campus:tour-list'),
+                data=json.dumps({'name': 'Walk', 'location_ids': location_ids}),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 400, location_ids)
+        self.assertFalse(Tour.objects.exists())
+
+
+class TourFeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', password='StrongPass123!')
+        self.friend = User.objects.create_user('friend', password='StrongPass123!')
+        self.location = Location.objects.create(
+            name='Quad', description='Green.', latitude='33.772500', longitude='-84.394700',
+        )
+        self.tour = Tour.objects.create(user=self.friend, name='Friend Tour')
+        TourStop.objects.create(tour=self.tour, location=self.location, order=1024)
+        SharedTour.objects.create(tour=self.tour, shared_by=self.friend, shared_with=self.owner)
+        self.client.login(username='owner', password='StrongPass123!')
+
+    def test_steady_state_read_is_one_cache_round_trip(self):
+        url = reverse('campus:tour-list')
+        self.client.get(url)
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many, \
+                mock.patch.object(cache, 'get', wraps=cache.get) as get, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_many.call_count, 1)
+        # LocMemCache implements get_many() as one get() per key; nothing else reads the cache.
+        self.assertEqual(get.call_count, len(get_many.call_args.args[0]))
+        self.assertFalse([q for q in queries if 'campus_' in q['sql']])
+
+    def test_bookmarks_invalidate_only_their_users_feeds(self):
+        url = reverse('campus:tour-list')
+        shared_url = reverse('campus:shared_tours_list')
+        etag = self.client.get(url)['ETag']
+        shared_etag = self.client.get(shared_url)['ETag']
+        self.client.login(username='friend', password='StrongPass123!')
+        friend_etag = self.client.get(url)['ETag']
+
+        TourBookmark.objects.create(user=self.owner, tour=self.tour)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=friend_etag).status_code, 304)
+
+        self.client.login(username='owner', password='StrongPass123!')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['tours'][0]['is_bookmarked'])
+        response = self.client.get(shared_url, HTTP_IF_NONE_MATCH=shared_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['tours'][0]['is_bookmarked'])
+
+        TourBookmark.objects.filter(user=self.owner).delete()
+        self.assertFalse(self.client.get(url).json()['tours'][0]['is_bookmarked'])
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.viewer = User.objects.create_user('viewer', password='StrongPass123!')
+        self.location = Location.objects.create(
+            name='Quad', description='Green.', latitude='33.772500', longitude='-84.394700',
+        )
+        self.client.login(username='viewer', password='StrongPass123!')
+        self.users = 0
+
+    def add_users(self, count, private_every=3):
+        User = get_user_model()
+        for _ in range(count):
+            self.users += 1
+            user = User.objects.create_user(f'walker{self.users}', first_name='Walker')
+            UserProfile.objects.create(user=user, is_private=self.users % private_every == 0)
+            Bookmark.objects.create(user=user, location=self.location)
+            Tour.objects.create(user=user, name=f'Tour {self.users}')
+            Friendship.objects.create(from_user=self.viewer, to_user=user, status='accepted')
+
+    def test_discover_users_is_not_n_plus_one(self):
+        url = reverse('accounts:discover')
+        self.add_users(3)
+        response = self.assertConstantQueries(url, lambda: self.add_users(9))
+        self.assertEqual(response.context['total_count'], 8)
+        self.assertEqual({data['tour_count'] for data in response.context['user_data']}, {1})
+
+        # Users who never saved a profile are public; theirs is created in one query.
+        get_user_model().objects.create_user('newcomer')
+        self.assertQueryBudget(6, url)
+        self.assertTrue(UserProfile.objects.filter(user__username='newcomer', is_private=False).exists())
+
+        response = self.assertQueryBudget(6, url, data={'search': 'walker1'})
+        self.assertEqual(
+            sorted(data['user'].username for data in response.context['user_data']),
+            ['walker1', 'walker10', 'walker11'],
+        )
+
+    def test_share_tour_checks_all_friends_at_once(self):
+        self.add_users(10, private_every=100)
+        tour = Tour.objects.create(user=self.viewer, name='Mine')
+        friends = list(Friendship.objects.values_list('to_user_id', flat=True))
+        SharedTour.objects.create(tour=tour, shared_by=self.viewer, shared_with_id=friends[0])
+        stranger = get_user_model().objects.create_user('stranger')
+
+        response = self.assertQueryBudget(
+            10,
+            reverse('campus:share_tour', args=[tour.id]),
+            method='post',
+            data=json.dumps({'friend_ids': friends + [stranger.id, 'x']}),
+            content_type='application/json',
+        )
+        data = response.json()
+        self.assertEqual(data['shared_count'], 9)
+        self.assertEqual(data['already_shared'], [friends[0]])
+        self.assertEqual(data['not_friends'], [stranger.id])
+        self.assertEqual(SharedTour.objects.filter(tour=tour).count(), 10)
+
+        self.client.force_login(get_user_model().objects.get(username='walker5'))
+        self.assertEqual(self.client.get(reverse('campus:shared_tours_list')).json()['tours'][0]['name'], 'Mine')
+
+    def test_tour_manage_is_not_n_plus_one(self):
+        def add_shared_tours():
+            for index in range(5):
+                tour = Tour.objects.create(user=self.viewer, name=f'Mine {index}')
+                TourStop.objects.create(tour=tour, location=self.location, order=1024)
+                for friend in get_user_model().objects.exclude(pk=self.viewer.pk)[:2]:
+                    SharedTour.objects.create(tour=tour, shared_by=self.viewer, shared_with=friend)
+
+        self.add_users(2)
+        add_shared_tours()
+        self.assertConstantQueries(reverse('campus:tour-manage'), add_shared_tours)
+
+    @override_settings(QUERY_DUPLICATE_THRESHOLD=2)
+    def test_middleware_reports_counts_and_repeated_shapes(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM \"t\" WHERE \"id\" IN (1, 2) AND \"name\" = 'it''s' LIMIT 21"),
+            'SELECT * FROM "t" WHERE "id" IN (...) AND "name" = ? LIMIT ?',
+        )
+        response = self.client.get(reverse('campus:tour-manage'))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+
+        with self.assertLogs('campus.queries', 'WARNING'):
+            response = self.client.post(
+                reverse('campus:tour-list'),
+                data=json.dumps({'name': 'One', 'location_ids': [self.location.id]}),
+                content_type='application/json',
+            )
+        self.assertIn('X-Query-Duplicates', response)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', password='StrongPass123!')
+        self.friend = User.objects.create_user('friend', password='StrongPass123!')
+        self.location = Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+
+    def test_location_list_revalidates_without_queries(self):
+        url = reverse('campus:location-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.location.description = 'Home of the T.'
+        self.location.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_tour_feeds_change_when_a_tour_is_shared(self):
+        url = reverse('campus:tour-list')
+        shared_url = reverse('campus:shared_tours_list')
+        self.client.login(username='friend', password='StrongPass123!')
+        etag = self.client.get(url)['ETag']
+        shared_etag = self.client.get(shared_url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        tour = Tour.objects.create(user=self.owner, name='Owner Tour')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        SharedTour.objects.create(tour=tour, shared_by=self.owner, shared_with=self.friend)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(shared_url, HTTP_IF_NONE_MATCH=shared_etag).status_code, 200)
+
+    def test_share_view_bumps_feeds_again_after_commit(self):
+        Friendship.objects.create(from_user=self.owner, to_user=self.friend, status='accepted')
+        tour = Tour.objects.create(user=self.owner, name='Owner Tour')
+        shared_url = reverse('campus:shared_tours_list')
+        self.client.login(username='owner', password='StrongPass123!')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                reverse('campus:share_tour', args=[tour.id]),
+                data=json.dumps({'friend_ids': [self.friend.id]}),
+                content_type='application/json',
+            )
+            # A feed rebuilt before the share commits must not keep validating.
+            self.client.login(username='friend', password='StrongPass123!')
+            etag = self.client.get(shared_url)['ETag']
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(shared_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class LocationListQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for index, (name, category) in enumerate([
+            ('Bobby Dodd Stadium', 'Athletics'),
+            ('Kendeda Building', 'Sustainability'),
+            ('Library', 'Academic'),
+            ('Student Center', 'Student Life'),
+            ('Tech Tower', 'Academic'),
+        ]):
+            Location.objects.create(
+                name=name, category=category, description='Long text ' * 50, historical_info='More text ' * 50,
+                latitude=f'33.77{index}000', longitude='-84.394700',
+            )
+        self.url = reverse('campus:location-list')
+
+    def test_sparse_fields_and_category_filter(self):
+        response = self.client.get(self.url, {'fields': 'name,slug,latitude,longitude', 'category': 'academic'})
+        self.assertEqual(response.json()['locations'], [
+            {'name': 'Library', 'slug': 'library', 'latitude': 33.772, 'longitude': -84.3947},
+            {'name': 'Tech Tower', 'slug': 'tech-tower', 'latitude': 33.774, 'longitude': -84.3947},
+        ])
+        self.assertEqual(self.client.get(self.url, {'fields': 'name,password'}).status_code, 400)
+
+    def test_cursor_pagination_walks_every_location_once(self):
+        names = []
+        params = {'fields': 'name', 'limit': 2}
+        while True:
+            with self.assertNumQueries(1):
+                payload = self.client.get(self.url, params).json()
+            names.extend(row['name'] for row in payload['locations'])
+            if not payload['next_cursor']:
+                break
+            params['cursor'] = payload['next_cursor']
+        self.assertEqual(names, sorted(Location.objects.values_list('name', flat=True)))
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_only_canonical_requests_are_cached(self):
+        def stored_responses():
+            return [key for key in cache._cache if 'campus:response:' in key]
+
+        first_page = self.client.get(self.url, {'limit': 2})
+        self.client.get(self.url, {'limit': 2, 'cursor': first_page.json()['next_cursor']})
+        self.client.get(self.url, {'fields': 'slug,name'})
+        self.client.get(self.url, {'category': 'no-such-category'})
+        self.assertEqual(len(stored_responses()), 0)
+
+        self.client.get(self.url)
+        self.client.get(self.url, {'category': 'Academic'})
+        self.client.get(self.url, {'category': 'academic'})
+        self.assertEqual(len(stored_responses()), 2)
+
+    def test_errors_carry_no_validators(self):
+        for params in ({'fields': 'name,password'}, {'limit': 'zero'}, {'cursor': 'not-a-cursor'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.has_header('ETag'), params)
+            self.assertFalse(response.has_header('Last-Modified'), params)
+
+
+class LocationChangesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('campus:location-changes')
+        self.tower = Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+        self.library = Location.objects.create(
+            name='Library', description='Books.', latitude='33.774300', longitude='-84.395700',
+        )
+
+    def test_snapshot_then_deltas(self):
+        snapshot = self.client.get(self.url).json()
+        self.assertEqual({row['slug'] for row in snapshot['upserts']}, {'tech-tower', 'library'})
+
+        self.tower.description = 'Home of the T.'
+        self.tower.save()
+        self.tower.save()
+        library_id = self.library.id
+        self.library.delete()
+        Location.objects.create(
+            name='Kendeda Building', description='Living building.', latitude='33.778900', longitude='-84.399100',
+        )
+
+        delta = self.client.get(self.url, {'since': snapshot['next']}).json()
+        self.assertEqual(
+            sorted((row['slug'], row['description']) for row in delta['upserts']),
+            [('kendeda-building', 'Living building.'), ('tech-tower', 'Home of the T.')],
+        )
+        self.assertEqual(delta['deletions'], [{'id': library_id, 'slug': 'library'}])
+
+        empty = self.client.get(self.url, {'since': delta['next']}).json()
+        self.assertEqual((empty['upserts'], empty['deletions'], empty['next']), ([], [], delta['next']))
+
+    def test_rating_by_id_reports_location_slug(self):
+        since = self.client.get(self.url).json()['next']
+        user = get_user_model().objects.create_user('alice', password='StrongPass123!')
+        Rating.objects.create(user=user, location_id=self.tower.id, score=4)
+
+        delta = self.client.get(self.url, {'since': since}).json()
+        self.assertEqual([row['slug'] for row in delta['upserts']], ['tech-tower'])
+
+
+class CompressedResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Location.objects.create(
+            name='Tech Tower', description='Admin building. ' * 40, latitude='33.772500', longitude='-84.394700',
+        )
+        self.url = reverse('campus:location-list')
+
+    def test_gzip_variant_matches_identity_body(self):
+        plain = self.client.get(self.url)
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertLess(len(compressed.content), len(plain.content))
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+
+    def test_refused_encodings_fall_back_to_identity(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, br;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class LoadDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_generates_consistent_dataset_and_benchmarks_it(self):
+        call_command(
+            'generate_load_data', locations=12, users=9, ratings=40, friends=2, tours=5, stops=3,
+            shares=6, official_tours=1, days=4, batch_size=7, stdout=StringIO(),
+        )
+        self.assertEqual(Location.objects.count(), 12)
+        self.assertEqual(get_user_model().objects.count(), 9)
+        self.assertEqual(UserProfile.objects.count(), 9)
+        self.assertEqual(Rating.objects.count(), 40)
+        self.assertEqual(Friendship.objects.count(), 18)
+        self.assertEqual(TourStop.objects.count(), 15)
+        self.assertEqual(SharedTour.objects.count(), 6)
+        self.assertEqual(Tour.objects.filter(is_official=True).count(), 1)
+        self.assertEqual(sum(Location.objects.values_list('rating_count', flat=True)), 40)
+        self.assertGreater(RatingRollup.objects.values('date').distinct().count(), 1)
+        # Shares only go to the owner's friends.
+        for share in SharedTour.objects.all():
+            self.assertTrue(Friendship.objects.filter(from_user=share.shared_by, to_user=share.shared_with).exists())
+
+        admin_user = get_user_model().objects.create_user('admin', password='pw12345678!', is_staff=True)
+        output = StringIO()
+        call_command('benchmark_endpoints', iterations=3, warmup=1, stdout=output, stderr=StringIO())
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['user'], 'load_1')
+        self.assertEqual(set(report['endpoints']), {'campus_overview', 'tour_list', 'feedback_dashboard', 'discover_users'})
+        for result in report['endpoints'].values():
+            self.assertEqual(result['status'], [200])
+            self.assertEqual(result['count'], 3)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertGreater(result['queries'], 0)
+
+        report_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, report_dir, ignore_errors=True)
+        report_path = f'{report_dir}/baseline.json'
+        with open(report_path, 'w') as baseline:
+            json.dump(report, baseline)
+        output = StringIO()
+        call_command(
+            'benchmark_endpoints', 'tour_list', iterations=2, compare=report_path,
+            staff_user=admin_user.username, stdout=output, stderr=StringIO(),
+        )
+        changes = json.loads(output.getvalue())['changes']
+        self.assertEqual([change['endpoint'] for change in changes], ['tour_list'])
+        self.assertIn('p50_ms', changes[0])
+
+
+class LoadTestHarnessTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media_dir = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media_dir)
+        cls._media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.alice = User.objects.create_user('alice', password='pw12345678!')
+        self.bob = User.objects.create_user('bob', password='pw12345678!')
+        Friendship.objects.create(from_user=self.alice, to_user=self.bob, status='accepted')
+        for index in range(4):
+            Location.objects.create(
+                name=f'Stop {index}', description='A stop.', latitude=f'33.77{index}000', longitude='-84.394000',
+            )
+        # Something to share even if every create_tour loses the SQLite lock.
+        for user in (self.alice, self.bob):
+            Tour.objects.create(user=user, name=f'{user.username} walk')
+
+    def test_runs_every_scenario_against_stand_ins(self):
+        report = run_load_test(
+            concurrency=2, iterations=12, seed=7, directions_latency_ms=0, llm_latency_ms=0,
+            weights={'browse': 1, 'bookmark': 1, 'rate': 1, 'create_tour': 1, 'share': 1, 'chat': 1},
+        )
+        self.assertEqual(set(report['scenarios']), {'browse', 'bookmark', 'rate', 'create_tour', 'share', 'chat'})
+        self.assertEqual(sum(report['histogram'].values()), report['count'])
+        # Concurrent SQLite writers may be refused the lock; nothing else may fail.
+        self.assertLessEqual(set(report['errors']), {'database_locked'})
+        self.assertEqual(report['scenarios']['share']['skipped'], 0)
+        self.assertTrue(Tour.objects.filter(route_summary__isnull=False).exists())
+
+    def test_classifies_lock_errors(self):
+        self.assertEqual(classify_error(500, OperationalError('database is locked')), 'database_locked')
+        self.assertEqual(classify_error(500, ValueError('boom')), 'ValueError')
+        self.assertEqual(classify_error(404, None), 'http_404')
+        self.assertIsNone(classify_error(200, None))
+
+    def test_skipped_runs_are_not_requests(self):
+        report = summarize([('share', None, SKIPPED), ('share', 20.0, None), ('share', 30.0, 'http_500')], 1.0)
+        share = report['scenarios']['share']
+        self.assertEqual((share['skipped'], share['count'], share['error_rate']), (1, 2, 0.5))
+        self.assertEqual(share['errors'], {'http_500': 1})
+
+
+class TrafficCaptureTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.capture_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.capture_dir, ignore_errors=True)
+        self.user = get_user_model().objects.create_user('alice', password='pw12345678!')
+        self.tower = Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+
+    def test_captures_sanitized_requests_and_replays_them(self):
+        capture = self.capture_dir / 'capture.jsonl'
+        with override_settings(TRAFFIC_CAPTURE_RATE=1.0, TRAFFIC_CAPTURE_FILE=capture):
+            client = Client()
+            client.post(
+                reverse('accounts:login'),
+                'username=alice&password=pw12345678%21',
+                content_type='application/x-www-form-urlencoded',
+            )
+            client.get(reverse('campus:overview'), {'category': 'Historic'})
+            client.post(
+                reverse('campus:rate_location', args=['tech-tower']),
+                json.dumps({'score': 4, 'comment': 'Nice.'}),
+                content_type='application/json',
+            )
+
+        records = read_capture([capture])
+        self.assertEqual([record['view'] for record in records], ['accounts:login', 'campus:overview', 'campus:rate_location'])
+        login, overview, rating = records
+        self.assertEqual(login['body']['data'], {'username': 'alice', 'password': REDACTED})
+        self.assertNotIn('pw12345678', capture.read_text())
+        self.assertEqual((overview['query'], overview['user_id'], overview['status']), ('category=Historic', self.user.id, 200))
+        self.assertEqual(rating['body']['data'], {'score': 4, 'comment': 'Nice.'})
+
+        output = StringIO()
+        call_command('replay_traffic', str(capture), speed=0, read_only=True, stdout=output, stderr=StringIO())
+        report = json.loads(output.getvalue())
+        self.assertEqual(list(report['views']), ['campus:overview'])
+        self.assertEqual(report['views']['campus:overview']['status_mismatches'], 0)
+        self.assertIn('delta_p50_ms', report)
+
+        output = StringIO()
+        call_command('replay_traffic', str(capture), speed=0, workers=1, stdout=output, stderr=StringIO())
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['count'], 3)
+        self.assertEqual(Rating.objects.get(user=self.user).score, 4)
+
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.staff = User.objects.create_user('admin', password='pw12345678!', is_staff=True)
+        self.visitor = User.objects.create_user('visitor', password='pw12345678!')
+        Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+
+    def test_staff_can_profile_a_request_and_browse_it(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('campus:overview'), {'__profile': '1'})
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get(id=response['X-Profile-Id'])
+        self.assertEqual(response['X-Profile-Url'], reverse('campus:request-profile', args=[profile.id]))
+        self.assertEqual((profile.user, profile.view_name, profile.status_code), (self.staff, 'campus:overview', 200))
+        self.assertEqual(profile.query_count, len(profile.queries))
+        self.assertGreater(profile.query_count, 0)
+        self.assertIn('campus_overview', profile.report)
+        self.assertTrue(any('campus_overview' in function for _, _, function in marshal.loads(bytes(profile.stats))))
+
+        listing = self.client.get(reverse('campus:request-profiles'))
+        self.assertContains(listing, reverse('campus:request-profile', args=[profile.id]))
+        detail = self.client.get(response['X-Profile-Url'])
+        self.assertContains(detail, 'campus_overview')
+        stats = self.client.get(reverse('campus:request-profile-stats', args=[profile.id]))
+        self.assertEqual(stats.content, bytes(profile.stats))
+
+    def test_header_triggers_profile_and_old_profiles_are_pruned(self):
+        self.client.force_login(self.staff)
+        with override_settings(REQUEST_PROFILE_KEEP=2):
+            ids = [
+                self.client.get(reverse('campus:location-list'), HTTP_X_PROFILE='1')['X-Profile-Id']
+                for _ in range(3)
+            ]
+        self.assertEqual(sorted(RequestProfile.objects.values_list('id', flat=True)), sorted(map(int, ids[1:])))
+
+    def test_only_staff_can_profile_or_view_profiles(self):
+        self.client.force_login(self.visitor)
+        response = self.client.get(reverse('campus:overview'), {'__profile': '1'})
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertFalse(RequestProfile.objects.exists())
+        self.assertEqual(self.client.get(reverse('campus:request-profiles')).status_code, 302)
+
+
+@override_settings(METRICS_TOKEN='scrape-secret', GOOGLE_MAP_API_KEY='test-key')
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.staff = get_user_model().objects.create_user('admin', password='pw12345678!', is_staff=True)
+        Location.objects.create(
+            name='Tech Tower', description='Admin building.', latitude='33.772500', longitude='-84.394700',
+        )
+
+    def scrape(self):
+        response = self.client.get(reverse('campus:metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_records_requests_queries_and_cache_lookups_per_view(self):
+        self.client.get(reverse('campus:location-list'))
+        self.client.get(reverse('campus:location-list'))
+        text = self.scrape()
+
+        self.assertIn(
+            'campus_http_requests_total{method="GET",status="200",view="campus:location-list"} 2', text,
+        )
+        self.assertIn(
+            'campus_http_request_duration_seconds_bucket{method="GET",view="campus:location-list",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn('campus_db_queries_per_request_count{view="campus:location-list"} 2', text)
+        self.assertIn('campus_db_query_seconds_total{view="campus:location-list"}', text)
+        self.assertIn('campus_cache_lookups_total{cache="response",result="hit"} 1', text)
+        self.assertIn('campus_cache_lookups_total{cache="response",result="miss"} 1', text)
+        self.assertIn('campus_image_derivative_queue_depth 0', text)
+        self.assertIn('campus_http_requests_in_progress 1', text)
+
+    def test_times_external_calls_and_counts_errors(self):
+        stops = [
+            {'id': 1, 'name': 'A', 'latitude': 33.77, 'longitude': -84.39},
+            {'id': 2, 'name': 'B', 'latitude': 33.78, 'longitude': -84.40},
+        ]
+        with mock.patch('campus.route_utils.requests.get') as get:
+            get.return_value.json.return_value = {'status': 'OVER_QUERY_LIMIT'}
+            with self.assertRaises(RouteCalculationError):
+                calculate_route_segments(stops)
+        text = self.scrape()
+        self.assertIn('campus_external_call_duration_seconds_count{service="directions"} 1', text)
+        self.assertIn(
+            'campus_external_call_errors_total{error="RouteCalculationError",service="directions"} 1', text,
+        )
+
+    def test_counters_from_many_threads_add_up(self):
+        def record():
+            for _ in range(1000):
+                metrics.inc('campus_cache_lookups_total', metrics.labels(cache='test', result='hit'))
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counters, _ = metrics.collect()
+        self.assertEqual(counters[('campus_cache_lookups_total', metrics.labels(cache='test', result='hit'))], 4000)
+
+    def test_ended_threads_stores_are_folded_into_the_total(self):
+        key = ('campus_cache_lookups_total', metrics.labels(cache='test', result='miss'))
+        live_before = len(metrics._live)
+        for _ in range(50):
+            thread = threading.Thread(target=metrics.inc, args=key)
+            thread.start()
+            thread.join()
+        self.assertEqual(metrics.collect()[0][key], 50)
+        self.assertEqual(len(metrics._live), live_before)
+        self.assertEqual(metrics.collect()[0][key], 50)
+
+    def test_requires_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse('campus:metrics')).status_code, 403)
+        wrong = self.client.get(reverse('campus:metrics'), HTTP_AUTHORIZATION='Bearer nope')
+        self.assertEqual(wrong.status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('campus:metrics')).status_code, 200)
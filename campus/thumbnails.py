@@ -0,0 +1,162 @@
+import hashlib
+import io
+import json
+import logging
+import math
+from typing import List, Optional, Tuple
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageDraw, ImageFont
+
+from .route_utils import merge_segment_paths
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 180)
+THUMBNAIL_FORMATS = ('webp', 'png')
+THUMBNAIL_DIR = 'tours/thumbnails'
+
+# Drawn at 2x and downsampled so lines and markers come out anti-aliased.
+_SUPERSAMPLE = 2
+_PADDING = 18
+_BACKGROUND = (241, 245, 249)
+_ROUTE_COLOR = (0, 102, 204)
+_MARKER_COLOR = (0, 48, 87)
+_MARKER_OUTLINE = (255, 255, 255)
+
+
+def _project(lat: float, lng: float) -> Tuple[float, float]:
+    """Web Mercator projection onto a unit square (y grows southwards)."""
+    lat = max(min(lat, 85.0511), -85.0511)
+    siny = math.sin(math.radians(lat))
+    x = (lng + 180.0) / 360.0
+    y = 0.5 - math.log((1 + siny) / (1 - siny)) / (4 * math.pi)
+    return x, y
+
+
+def _stop_points(tour, locations=None) -> List[Tuple[float, float]]:
+    if locations is None:
+        locations = [stop.location for stop in tour.stops.all()]
+    return [(float(location.latitude), float(location.longitude)) for location in locations]
+
+
+def thumbnail_digest(route_path, stop_points) -> str:
+    """Content hash of everything that ends up on the rendered image."""
+    payload = json.dumps(
+        {
+            'size': THUMBNAIL_SIZE,
+            'route': [[round(lat, 5), round(lng, 5)] for lat, lng in route_path],
+            'stops': [[round(lat, 6), round(lng, 6)] for lat, lng in stop_points],
+        },
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def thumbnail_path(digest: str, fmt: str) -> str:
+    return f"{THUMBNAIL_DIR}/{digest}.{fmt}"
+
+
+def render_route_image(route_path, stop_points, size=THUMBNAIL_SIZE) -> Image.Image:
+    """Draw a route polyline and numbered stop markers onto a blank canvas."""
+    width, height = size[0] * _SUPERSAMPLE, size[1] * _SUPERSAMPLE
+    padding = _PADDING * _SUPERSAMPLE
+    image = Image.new('RGB', (width, height), _BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    projected_route = [_project(lat, lng) for lat, lng in route_path]
+    projected_stops = [_project(lat, lng) for lat, lng in stop_points]
+    everything = projected_route + projected_stops
+    if not everything:
+        return image.resize(size, Image.LANCZOS)
+
+    min_x = min(x for x, _ in everything)
+    max_x = max(x for x, _ in everything)
+    min_y = min(y for _, y in everything)
+    max_y = max(y for _, y in everything)
+    span_x = max_x - min_x
+    span_y = max_y - min_y
+
+    # Keep the aspect ratio so the campus doesn't get stretched.
+    usable_w = width - 2 * padding
+    usable_h = height - 2 * padding
+    if span_x or span_y:
+        scale = min(
+            usable_w / span_x if span_x else float('inf'),
+            usable_h / span_y if span_y else float('inf'),
+        )
+    else:
+        scale = 0
+    offset_x = (width - span_x * scale) / 2
+    offset_y = (height - span_y * scale) / 2
+
+    def to_canvas(point):
+        x, y = point
+        return (offset_x + (x - min_x) * scale, offset_y + (y - min_y) * scale)
+
+    if len(projected_route) >= 2:
+        draw.line(
+            [to_canvas(point) for point in projected_route],
+            fill=_ROUTE_COLOR,
+            width=4 * _SUPERSAMPLE,
+            joint='curve',
+        )
+
+    radius = 8 * _SUPERSAMPLE
+    font = ImageFont.load_default(size=9 * _SUPERSAMPLE)
+    for number, point in enumerate(projected_stops, start=1):
+        cx, cy = to_canvas(point)
+        draw.ellipse(
+            (cx - radius, cy - radius, cx + radius, cy + radius),
+            fill=_MARKER_COLOR,
+            outline=_MARKER_OUTLINE,
+            width=2 * _SUPERSAMPLE,
+        )
+        draw.text((cx, cy), str(number), fill=_MARKER_OUTLINE, font=font, anchor='mm')
+
+    return image.resize(size, Image.LANCZOS)
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, format='WEBP', quality=80, method=6)
+    else:
+        image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def generate_tour_thumbnail(tour, locations=None) -> Optional[str]:
+    """
+    Render the tour's route preview and record its content digest on the tour.
+
+    ``locations`` are the tour's stop locations in order, when the caller
+    already has them; otherwise the stops are loaded. Files are written under
+    a name derived from the drawn content, so unchanged routes are never
+    re-rendered and every URL can be cached forever.
+    """
+    route_path = merge_segment_paths((tour.route_data or {}).get('segments'))
+    stop_points = _stop_points(tour, locations)
+    if not route_path and not stop_points:
+        return None
+
+    digest = thumbnail_digest(route_path, stop_points)
+    try:
+        missing = [
+            fmt for fmt in THUMBNAIL_FORMATS
+            if not default_storage.exists(thumbnail_path(digest, fmt))
+        ]
+        if missing:
+            image = render_route_image(route_path, stop_points)
+            for fmt in missing:
+                default_storage.save(thumbnail_path(digest, fmt), ContentFile(_encode(image, fmt)))
+    except OSError as e:
+        logger.error(f"Failed to write thumbnail for tour {tour.id} ({tour.name}): {str(e)}")
+        return None
+
+    if tour.thumbnail_digest != digest:
+        tour.thumbnail_digest = digest
+        # Only write the digest column; the caller may hold a stale copy of the rest.
+        tour.save(update_fields=['thumbnail_digest'])
+    return digest
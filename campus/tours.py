@@ -0,0 +1,289 @@
+"""
+Writing tours and their stops.
+
+``save_tour`` is the single write path for a tour built from an ordered list
+of location ids (the tour API and the assistant's ``create_tour`` tool). It
+validates every id with one query, replaces the stops with one
+``bulk_create`` inside a transaction and draws the thumbnail from the
+locations it already loaded. Callers that serialize the result re-read it
+through ``TourSerializer.prepare``.
+
+``edit_tour_stops`` applies single-stop ``move``/``insert``/``remove``
+operations instead. Stops are numbered ``STOP_ORDER_GAP`` apart, so a moved or
+inserted stop takes an order between its new neighbours and usually only that
+one row is written; the tour is renumbered only when a gap runs out.
+
+Both reuse the tour's routed legs wherever origin and destination are
+unchanged, so the Directions API is only asked for legs that changed.
+``clone_tour`` relies on that: a copy starts with the source's route and
+thumbnail, and only the legs its new owner later edits are ever routed.
+
+Neither ``bulk_create``/``bulk_update`` nor the muted deletes send per-stop
+invalidation; the Tour row is saved afterwards, and its own signal
+invalidates the feeds and the typeahead index (see ``campus.signals``).
+"""
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import transaction
+
+from .models import Location, Tour, TourStop
+from .route_utils import calculate_changed_route_segments, RouteCalculationError
+from .serializers import LOCATION_SUMMARY_FIELDS
+from .thumbnails import generate_tour_thumbnail
+
+logger = logging.getLogger(__name__)
+
+# Distance between the orders of consecutive stops when a tour is (re)numbered.
+STOP_ORDER_GAP = 1024
+STOP_OPERATIONS = ('move', 'insert', 'remove')
+
+_stop_signals_muted = contextvars.ContextVar('campus_tour_stop_signals_muted', default=False)
+
+
+class TourWriteError(Exception):
+    pass
+
+
+def stop_signals_muted() -> bool:
+    """True while this module deletes stops and will invalidate through the Tour row instead."""
+    return _stop_signals_muted.get()
+
+
+@contextmanager
+def _mute_stop_signals():
+    token = _stop_signals_muted.set(True)
+    try:
+        yield
+    finally:
+        _stop_signals_muted.reset(token)
+
+
+def resolve_locations(location_ids) -> List[Location]:
+    """The locations for ``location_ids`` in the given order, loaded with one query."""
+    if not isinstance(location_ids, list):
+        raise TourWriteError('location_ids must be an array.')
+    if not location_ids:
+        raise TourWriteError('At least one location is required.')
+
+    try:
+        ids = [int(location_id) for location_id in location_ids]
+    except (TypeError, ValueError):
+        raise TourWriteError('One or more locations not found.')
+
+    by_id = Location.objects.only(*LOCATION_SUMMARY_FIELDS).in_bulk(ids)
+    # A location can only appear once in a tour.
+    if len(set(ids)) != len(ids) or len(by_id) != len(ids):
+        raise TourWriteError('One or more locations not found.')
+    return [by_id[location_id] for location_id in ids]
+
+
+def _route_data(tour: Tour, locations: Iterable[Location]) -> Optional[dict]:
+    """Route for ``locations`` in order, reusing the legs of the tour's current route."""
+    stops_data = [
+        {
+            'id': location.id,
+            'name': location.name,
+            'latitude': float(location.latitude),
+            'longitude': float(location.longitude),
+        }
+        for location in locations
+    ]
+    if len(stops_data) < 2:
+        return None
+
+    try:
+        previous_segments = (tour.route_data or {}).get('segments')
+        route_segments = calculate_changed_route_segments(stops_data, previous_segments)
+        logger.info(f"Successfully calculated route for tour {tour.id} ({tour.name}) with {len(route_segments) if route_segments else 0} segments")
+    except RouteCalculationError as e:
+        logger.error(f"Failed to calculate route for tour {tour.id} ({tour.name}): {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error calculating route for tour {tour.id} ({tour.name}): {str(e)}")
+        return None
+    return {'segments': route_segments} if route_segments else None
+
+
+def save_tour(user, name: str, description: str, location_ids, tour: Optional[Tour] = None) -> Tour:
+    """
+    Create a tour for ``user`` (or overwrite ``tour``) with stops in the order
+    of ``location_ids``, then compute its route and thumbnail.
+
+    Raises TourWriteError, before writing anything, when the ids are invalid.
+    Legs the Directions API fails on are stored as ``failed`` placeholders
+    next to the legs that did route (see ``calculate_changed_route_segments``);
+    a route that can't be calculated at all is stored as missing rather than
+    left describing the previous stops.
+    """
+    locations = resolve_locations(location_ids)
+
+    with transaction.atomic():
+        if tour is None:
+            tour = Tour.objects.create(user=user, name=name, description=description)
+        else:
+            with _mute_stop_signals():
+                TourStop.objects.filter(tour=tour).delete()
+            tour.name = name
+            tour.description = description
+            tour.save(update_fields=['name', 'description'])
+
+        TourStop.objects.bulk_create(
+            TourStop(tour=tour, location=location, order=position * STOP_ORDER_GAP)
+            for position, location in enumerate(locations, start=1)
+        )
+    _update_route(tour, locations)
+    return tour
+
+
+def _update_route(tour: Tour, locations: List[Location], stops_changed: bool = False) -> None:
+    # The Directions API is slow; callers don't hold their transaction open for it.
+    route_data = _route_data(tour, locations)
+    if stops_changed or route_data != tour.route_data:
+        tour.route_data = route_data
+        # Saving the row is also what invalidates the feeds listing the tour.
+        tour.save(update_fields=['route_data'])
+    generate_tour_thumbnail(tour, locations)
+
+
+def _parse_operations(operations) -> List[Dict[str, Any]]:
+    if not isinstance(operations, list) or not operations:
+        raise TourWriteError('operations must be a non-empty array.')
+
+    parsed = []
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('op') not in STOP_OPERATIONS:
+            raise TourWriteError(f"Each operation needs an op of {', '.join(STOP_OPERATIONS)}.")
+        try:
+            location_id = int(operation.get('location_id'))
+            position = operation.get('position')
+            position = None if position is None else int(position)
+        except (TypeError, ValueError):
+            raise TourWriteError('location_id and position must be integers.')
+        if operation['op'] == 'move' and position is None:
+            raise TourWriteError('A move needs a position.')
+        parsed.append({'op': operation['op'], 'location_id': location_id, 'position': position})
+    return parsed
+
+
+def _place(sequence: List[TourStop], stop: TourStop, position: Optional[int]) -> None:
+    if position is None:
+        position = len(sequence)
+    if not 0 <= position <= len(sequence):
+        raise TourWriteError(f'Position {position} is out of range.')
+    sequence.insert(position, stop)
+
+
+def _assign_orders(sequence: List[TourStop], placed: set) -> List[TourStop]:
+    """
+    Give every stop in ``placed`` an order between its unplaced neighbours.
+
+    Returns the existing stops whose order changed: normally just the moved
+    ones, or every stop when there was no room and the tour was renumbered.
+    """
+    position = 0
+    while position < len(sequence):
+        if id(sequence[position]) not in placed:
+            position += 1
+            continue
+        end = position
+        while end < len(sequence) and id(sequence[end]) in placed:
+            end += 1
+        low = sequence[position - 1].order if position else 0
+        high = sequence[end].order if end < len(sequence) else low + (end - position + 1) * STOP_ORDER_GAP
+        count = end - position
+        if high - low <= count:
+            for index, stop in enumerate(sequence, start=1):
+                stop.order = index * STOP_ORDER_GAP
+            return [stop for stop in sequence if stop.pk is not None]
+        for offset, stop in enumerate(sequence[position:end], start=1):
+            stop.order = low + (high - low) * offset // (count + 1)
+        position = end
+    return [stop for stop in sequence if stop.pk is not None and id(stop) in placed]
+
+
+def edit_tour_stops(tour: Tour, operations) -> Tour:
+    """
+    Apply ``operations`` to the tour's stops, in order, as one change.
+
+    Each operation is ``{'op': 'move'|'insert'|'remove', 'location_id': ...,
+    'position': ...}``, where ``position`` is a 0-based index into the stop
+    list as it stands after the previous operations (an insert without one
+    appends). Raises TourWriteError, before writing anything, when an
+    operation doesn't apply.
+    """
+    operations = _parse_operations(operations)
+    inserted_ids = [operation['location_id'] for operation in operations if operation['op'] == 'insert']
+    new_locations = Location.objects.only(*LOCATION_SUMMARY_FIELDS).in_bulk(inserted_ids)
+
+    location_columns = [f'location__{field}' for field in LOCATION_SUMMARY_FIELDS]
+    with transaction.atomic():
+        sequence = list(
+            TourStop.objects.select_for_update(of=('self',))
+            .filter(tour=tour)
+            .select_related('location')
+            .only('id', 'order', 'tour', 'location', *location_columns)
+        )
+        placed = set()
+        removed = []
+        for operation in operations:
+            location_id = operation['location_id']
+            current = next((stop for stop in sequence if stop.location_id == location_id), None)
+            if operation['op'] == 'insert':
+                if current is not None:
+                    raise TourWriteError(f'Location {location_id} is already in this tour.')
+                if location_id not in new_locations:
+                    raise TourWriteError(f'Location {location_id} not found.')
+                stop = TourStop(tour=tour, location=new_locations[location_id])
+                _place(sequence, stop, operation['position'])
+                placed.add(id(stop))
+                continue
+
+            if current is None:
+                raise TourWriteError(f'Location {location_id} is not in this tour.')
+            sequence.remove(current)
+            if operation['op'] == 'move':
+                _place(sequence, current, operation['position'])
+                placed.add(id(current))
+            else:
+                placed.discard(id(current))
+                if current.pk is not None:
+                    removed.append(current)
+
+        if not sequence:
+            raise TourWriteError('At least one location is required.')
+
+        reordered = _assign_orders(sequence, placed)
+        if removed:
+            with _mute_stop_signals():
+                TourStop.objects.filter(pk__in=[stop.pk for stop in removed]).delete()
+        TourStop.objects.bulk_create([stop for stop in sequence if stop.pk is None])
+        TourStop.objects.bulk_update(reordered, ['order'])
+
+    _update_route(tour, [stop.location for stop in sequence], stops_changed=True)
+    return tour
+
+
+def clone_tour(source: Tour, user, name: Optional[str] = None) -> Tour:
+    """Copy ``source`` (stops, route and thumbnail) into a new tour owned by ``user``."""
+    name = (name or f'{source.name} (copy)')[:Tour._meta.get_field('name').max_length]
+    location_columns = [f'location__{field}' for field in LOCATION_SUMMARY_FIELDS]
+    stops = TourStop.objects.filter(tour=source).select_related('location').only(
+        'order', 'location', *location_columns
+    )
+
+    with transaction.atomic():
+        tour = Tour.objects.create(
+            user=user,
+            name=name,
+            description=source.description,
+            route_data=source.route_data,
+            # The preview is content-addressed, so the copy can point at the same files.
+            thumbnail_digest=source.thumbnail_digest,
+        )
+        TourStop.objects.bulk_create(
+            TourStop(tour=tour, location=stop.location, order=stop.order) for stop in stops
+        )
+    return tour
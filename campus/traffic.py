@@ -0,0 +1,261 @@
+"""
+Sampling real requests, and replaying them to compare performance.
+
+``TrafficCaptureMiddleware`` writes a ``TRAFFIC_CAPTURE_RATE`` fraction of
+requests to a JSON-lines log (``TRAFFIC_CAPTURE_FILE``), rotated by size like
+any ``RotatingFileHandler`` log. Each line holds the time, method, path,
+query string, the view that handled it, the user id, the status and how long
+it took. JSON and form bodies are kept with sensitive fields
+(``SENSITIVE_FIELDS``) replaced by ``REDACTED``; other bodies, such as file
+uploads, are left out.
+
+``replay`` sends captured requests back through the app in-process, as the
+user who made them, at the original pace or faster, and ``compare_latency``
+sets the replayed timings against the captured ones per view. ``manage.py
+replay_traffic`` runs both against whatever database the settings point at,
+so point it at a staging copy: replayed writes are real writes.
+"""
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .benchmarks import benchmark_client, latency_summary
+
+SENSITIVE_FIELDS = re.compile(r'pass|token|secret|key|csrf|session|auth', re.IGNORECASE)
+REDACTED = '[redacted]'
+CAPTURED_CONTENT_TYPES = ('application/json', 'application/x-www-form-urlencoded')
+
+_capture_logger = logging.getLogger('campus.traffic.capture')
+_capture_logger.propagate = False
+_handler_lock = threading.Lock()
+
+
+def _capture_handler() -> logging.Handler:
+    path = settings.TRAFFIC_CAPTURE_FILE
+    with _handler_lock:
+        for handler in list(_capture_logger.handlers):
+            if handler.baseFilename == str(path):
+                return handler
+            # TRAFFIC_CAPTURE_FILE changed (e.g. in tests): write to the new file.
+            _capture_logger.removeHandler(handler)
+            handler.close()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=settings.TRAFFIC_CAPTURE_MAX_BYTES,
+            backupCount=settings.TRAFFIC_CAPTURE_BACKUPS,
+            encoding='utf-8',
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _capture_logger.addHandler(handler)
+        _capture_logger.setLevel(logging.INFO)
+        return handler
+
+
+def sanitize(value: Any) -> Any:
+    """``value`` with every sensitive-looking key's value redacted, recursively."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if SENSITIVE_FIELDS.search(str(key)) else sanitize(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [sanitize(item) for item in value]
+    return value
+
+
+def sanitize_query(query_string: str) -> str:
+    pairs = parse_qsl(query_string, keep_blank_values=True)
+    return urlencode([(key, REDACTED if SENSITIVE_FIELDS.search(key) else item) for key, item in pairs])
+
+
+def _captured_body(request) -> Optional[Dict[str, Any]]:
+    content_type = request.content_type or ''
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if not length:
+        return None
+    if content_type not in CAPTURED_CONTENT_TYPES or length > settings.TRAFFIC_CAPTURE_MAX_BODY:
+        return {'omitted': True, 'content_type': content_type, 'length': length}
+    try:
+        if content_type == 'application/json':
+            return {'content_type': content_type, 'data': sanitize(json.loads(request.body))}
+        return {'content_type': content_type, 'data': sanitize(dict(parse_qsl(request.body.decode())))}
+    except (ValueError, UnicodeDecodeError):
+        return {'omitted': True, 'content_type': content_type, 'length': length}
+
+
+class TrafficCaptureMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'TRAFFIC_CAPTURE_RATE', 0):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.rate = settings.TRAFFIC_CAPTURE_RATE
+        self.excluded = tuple(getattr(settings, 'TRAFFIC_CAPTURE_EXCLUDE', ()))
+        _capture_handler()
+
+    def __call__(self, request):
+        if random.random() >= self.rate or request.path.startswith(self.excluded):
+            return self.get_response(request)
+
+        # Read the body before the view does; afterwards it may be consumed.
+        body = _captured_body(request)
+        started_at = time.time()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        user = getattr(request, 'user', None)
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'ts': round(started_at, 6),
+            'method': request.method,
+            'path': request.path,
+            'query': sanitize_query(request.META.get('QUERY_STRING', '')),
+            'view': match.view_name if match else None,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+        }
+        if body is not None:
+            record['body'] = body
+        _capture_logger.info(json.dumps(record, separators=(',', ':'), default=str))
+        return response
+
+
+def read_capture(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Captured records from ``paths`` (rotated files in any order), oldest first."""
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8') as capture:
+            for line in capture:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    records.sort(key=lambda record: record['ts'])
+    return records
+
+
+class _Replayer:
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self, user_id):
+        # Test clients keep cookies, so each thread gets its own per user.
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if user_id not in clients:
+            user = User.objects.filter(pk=user_id).first() if user_id else None
+            clients[user_id] = benchmark_client(user, raise_request_exception=False)
+        return clients[user_id]
+
+    def send(self, record: Dict[str, Any], lag_ms: float) -> Dict[str, Any]:
+        client = self._client(record.get('user_id'))
+        url = record['path'] + (f"?{record['query']}" if record.get('query') else '')
+        kwargs = {}
+        body = record.get('body') or {}
+        if 'data' in body:
+            data = body['data']
+            kwargs = {
+                'data': json.dumps(data) if body['content_type'] == 'application/json' else urlencode(data),
+                'content_type': body['content_type'],
+            }
+        started = time.perf_counter()
+        response = client.generic(record['method'], url, **kwargs)
+        return {
+            'view': record.get('view') or record['path'],
+            'captured_ms': record['duration_ms'],
+            'replayed_ms': (time.perf_counter() - started) * 1000,
+            'captured_status': record['status'],
+            'status': response.status_code,
+            'lag_ms': lag_ms,
+        }
+
+
+def replay(records: List[Dict[str, Any]], speed: float = 1.0, workers: int = 4) -> List[Dict[str, Any]]:
+    """
+    Send ``records`` again, keeping their relative timing divided by ``speed``
+    (0 sends them back to back). ``workers`` threads allow the overlap the
+    original traffic had; a request that starts late records its lag.
+    """
+    if not records:
+        return []
+    replayer = _Replayer()
+    pending: queue.Queue = queue.Queue()
+    results: List[Dict[str, Any]] = []
+
+    def worker():
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                record, due = item
+                results.append(replayer.send(record, max(0.0, (time.perf_counter() - due) * 1000)))
+        finally:
+            # Each thread opened its own connection.
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, name=f'traffic-replay-{index}') for index in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+
+    first = records[0]['ts']
+    started = time.perf_counter()
+    for record in records:
+        due = started + ((record['ts'] - first) / speed if speed else 0)
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put((record, due))
+    for _ in threads:
+        pending.put(None)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def compare_latency(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Captured vs replayed latency, overall and per view."""
+    def section(group):
+        captured = latency_summary([result['captured_ms'] for result in group])
+        replayed = latency_summary([result['replayed_ms'] for result in group])
+        summary = {
+            'count': len(group),
+            'captured_p50_ms': captured['p50_ms'],
+            'captured_p95_ms': captured['p95_ms'],
+            'replayed_p50_ms': replayed['p50_ms'],
+            'replayed_p95_ms': replayed['p95_ms'],
+            'status_mismatches': sum(1 for result in group if result['status'] != result['captured_status']),
+        }
+        for metric in ('p50_ms', 'p95_ms'):
+            before, after = captured[metric], replayed[metric]
+            summary[f'delta_{metric}'] = round(after - before, 2)
+            if before:
+                summary[f'delta_{metric}_pct'] = round((after - before) * 100 / before, 1)
+        return summary
+
+    if not results:
+        return {'count': 0, 'views': {}}
+    by_view = defaultdict(list)
+    for result in results:
+        by_view[result['view']].append(result)
+    report = section(results)
+    report['max_lag_ms'] = round(max(result['lag_ms'] for result in results), 2)
+    report['views'] = {view: section(group) for view, group in sorted(by_view.items())}
+    return report
+
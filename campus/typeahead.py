@@ -0,0 +1,260 @@
+"""
+In-process prefix index for typeahead suggestions.
+
+Locations, tours and public user profiles are flattened into one sorted list
+of ``(key, kind, id)`` tuples, where the keys are normalized names, every
+word-start suffix of those names, slugs and usernames. A prefix lookup is a
+``bisect`` into that list followed by a short forward scan, so it never
+touches the database.
+
+Each process keeps its own copy. A generation counter in the shared cache
+says which state the copies reflect: a process that applies a change bumps it
+and, when nobody else changed anything in between, patches its own copy in
+place instead of rebuilding; every other process sees a newer generation and
+rebuilds on its next lookup. Rebuilds load the new copy without holding the
+lock lookups use, and lookups that arrive meanwhile answer from the old copy.
+Changes are applied after commit (see ``campus.signals``), and only for saves
+that touch an indexed field.
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+
+from .models import Location, Tour
+
+GENERATION_KEY = 'campus:typeahead:generation'
+KIND_ORDER = {'location': 0, 'tour': 1, 'user': 2}
+# Upper bound on entries examined per lookup, so one-letter queries stay cheap.
+MAX_SCAN = 2000
+# Kept on index items for filtering and ranking, never returned to clients.
+_INTERNAL_FIELDS = ('owner_id', 'is_official', 'normalized_label')
+
+_WORD_RE = re.compile(r'[^\w]+', re.UNICODE)
+
+Entry = Tuple[str, str, int]
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation to single spaces."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _WORD_RE.sub(' ', stripped.casefold()).strip()
+
+
+def _phrase_keys(text: str) -> List[str]:
+    words = normalize(text).split()
+    return [' '.join(words[start:]) for start in range(len(words))]
+
+
+class _Index:
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.entries: List[Entry] = []
+        self.items: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self.keys: Dict[Tuple[str, int], List[str]] = {}
+
+    def add(self, kind: str, item_id: int, item: Dict[str, Any], keys: Iterable[str]) -> List[str]:
+        item['normalized_label'] = normalize(item['label'])
+        unique_keys = sorted({key for key in keys if key})
+        self.items[(kind, item_id)] = item
+        self.keys[(kind, item_id)] = unique_keys
+        return unique_keys
+
+    def put(self, kind: str, item_id: int, item: Dict[str, Any], keys: Iterable[str]) -> None:
+        self.remove(kind, item_id)
+        for key in self.add(kind, item_id, item, keys):
+            bisect.insort(self.entries, (key, kind, item_id))
+
+    def remove(self, kind: str, item_id: int) -> None:
+        self.items.pop((kind, item_id), None)
+        for key in self.keys.pop((kind, item_id), ()):
+            position = bisect.bisect_left(self.entries, (key, kind, item_id))
+            if position < len(self.entries) and self.entries[position] == (key, kind, item_id):
+                del self.entries[position]
+
+
+def _location_item(location_id, name, slug, category):
+    item = {
+        'type': 'location',
+        'id': location_id,
+        'label': name,
+        'detail': category or '',
+        'url': reverse('campus:location-detail', args=[slug]),
+    }
+    return item, _phrase_keys(name) + [normalize(slug)]
+
+
+def _tour_item(tour_id, name, owner_id, is_official):
+    item = {
+        'type': 'tour',
+        'id': tour_id,
+        'label': name,
+        'detail': 'Official tour' if is_official else '',
+        'url': None,
+        'owner_id': owner_id,
+        'is_official': is_official,
+    }
+    return item, _phrase_keys(name)
+
+
+def _user_item(user_id, username, first_name, last_name):
+    full_name = f'{first_name} {last_name}'.strip()
+    item = {
+        'type': 'user',
+        'id': user_id,
+        'label': full_name or username,
+        'detail': f'@{username}',
+        'url': reverse('accounts:user_profile', args=[username]),
+    }
+    return item, _phrase_keys(full_name) + [normalize(username)]
+
+
+def _public_users():
+    return User.objects.filter(is_active=True).exclude(profile__is_private=True)
+
+
+_LOADERS = {
+    'location': (
+        lambda: Location.objects.all(),
+        ('id', 'name', 'slug', 'category'),
+        _location_item,
+    ),
+    'tour': (
+        lambda: Tour.objects.all(),
+        ('id', 'name', 'user_id', 'is_official'),
+        _tour_item,
+    ),
+    'user': (
+        _public_users,
+        ('id', 'username', 'first_name', 'last_name'),
+        _user_item,
+    ),
+}
+
+# _lock guards reading and patching the current index; _build_lock lets one
+# thread at a time load a replacement without holding up lookups.
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_index: Optional[_Index] = None
+
+
+def _current_generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock so a restarted cache never repeats an old value.
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _build(generation: int) -> _Index:
+    index = _Index(generation)
+    for kind, (queryset, columns, make_item) in _LOADERS.items():
+        for row in queryset().order_by().values_list(*columns):
+            index.add(kind, row[0], *make_item(*row))
+    index.entries = sorted(
+        (key, kind, item_id) for (kind, item_id), keys in index.keys.items() for key in keys
+    )
+    return index
+
+
+def _get_index() -> _Index:
+    global _index
+    generation = _current_generation()
+    index = _index
+    if index is not None and index.generation == generation:
+        return index
+    if index is not None and not _build_lock.acquire(blocking=False):
+        # Another thread is already rebuilding; answer from the previous copy.
+        return index
+    if index is None:
+        _build_lock.acquire()
+    try:
+        index = _index
+        if index is not None and index.generation == generation:
+            return index
+        # The generation was read before loading, so a concurrent change forces another rebuild.
+        fresh = _build(generation)
+        with _lock:
+            _index = fresh
+        return fresh
+    finally:
+        _build_lock.release()
+
+
+def apply_change(kind: str, item_id: int) -> None:
+    """Re-read one item after it was saved or deleted and publish the change."""
+    global _index
+    with _lock:
+        previous = _current_generation()
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            # The key was evicted in between; everyone rebuilds.
+            _index = None
+            return
+        if _index is None or _index.generation != previous or generation != previous + 1:
+            # This copy was already stale, or another process changed something
+            # concurrently: rebuild lazily rather than patch.
+            _index = None
+            return
+
+        queryset, columns, make_item = _LOADERS[kind]
+        row = queryset().filter(pk=item_id).values_list(*columns).first()
+        if row is None:
+            _index.remove(kind, item_id)
+        else:
+            item, keys = make_item(*row)
+            _index.put(kind, item_id, item, keys)
+        _index.generation = generation
+
+
+def suggest(query: str, user=None, limit: int = 8, kinds: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Top ``limit`` suggestions whose name, slug or username starts with ``query``.
+
+    Tours are only suggested when official or owned by ``user``, and users
+    only to logged-in users, as every people page requires login. Whole-name
+    prefix matches rank before mid-name word matches, then shorter labels first.
+    """
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    kinds = set(kinds) if kinds else set(KIND_ORDER)
+    user_id = user.id if user is not None and user.is_authenticated else None
+    if user_id is None:
+        kinds.discard('user')
+
+    index = _get_index()
+    with _lock:
+        entries = index.entries
+        position = bisect.bisect_left(entries, (prefix,))
+        best: Dict[Tuple[str, int], Tuple] = {}
+        end = min(position + MAX_SCAN, len(entries))
+        while position < end and entries[position][0].startswith(prefix):
+            key, kind, item_id = entries[position]
+            position += 1
+            if kind not in kinds:
+                continue
+            item = index.items[(kind, item_id)]
+            if kind == 'tour' and not (item['is_official'] or item['owner_id'] == user_id):
+                continue
+            if kind == 'user' and item_id == user_id:
+                continue
+            whole_name = item['normalized_label'].startswith(prefix)
+            rank = (0 if whole_name else 1, KIND_ORDER[kind], len(item['label']), item['label'])
+            if (kind, item_id) not in best or rank < best[(kind, item_id)][0]:
+                best[(kind, item_id)] = (rank, item)
+
+    ranked = sorted(best.values(), key=lambda pair: pair[0])[:limit]
+    return [
+        {field: value for field, value in item.items() if field not in _INTERNAL_FIELDS}
+        for _, item in ranked
+    ]
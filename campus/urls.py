@@ -7,7 +7,11 @@ urlpatterns = [
     # Existing endpoints
     path('', views.campus_overview, name='overview'),
     path('api/locations/', views.location_list, name='location-list'),
+    path('api/locations/changes/', views.location_changes, name='location-changes'),
+    path('api/locations/search/', views.location_search, name='location-search'),
+    path('api/typeahead/', views.typeahead_suggestions, name='typeahead'),
     path('api/chat/', views.chat_with_assistant, name='chat'),
+    path('media/<path:path>', views.media_file, name='media'),
 
     # ---------------------------------------------------------------------
     # Location detail page (User Story #9)
@@ -37,8 +41,17 @@ urlpatterns = [
     # Admin Feedback endpoints (User Story #13)
     # ---------------------------------------------------------------------
     path('feedback/', views.feedback_dashboard, name='feedback_dashboard'),
+    path('feedback/trends/', views.feedback_trends, name='feedback_trends'),
     path('feedback/<int:rating_id>/respond/', views.respond_to_feedback, name='respond_to_feedback'),
 
+    # ---------------------------------------------------------------------
+    # Admin request profiles and metrics (see campus.profiling, campus.metrics)
+    # ---------------------------------------------------------------------
+    path('profiles/', views.request_profiles, name='request-profiles'),
+    path('profiles/<int:profile_id>/', views.request_profile, name='request-profile'),
+    path('profiles/<int:profile_id>/stats.prof', views.request_profile_stats, name='request-profile-stats'),
+    path('metrics/', views.metrics_endpoint, name='metrics'),
+
     # ---------------------------------------------------------------------
     # Tour endpoints (User Story #7)
     # ---------------------------------------------------------------------
@@ -47,6 +60,9 @@ urlpatterns = [
     path('tours/<int:tour_id>/edit/', views.tour_create, name='tour-edit'),
     path('api/tours/', views.tour_list, name='tour-list'),
     path('api/tours/<int:tour_id>/', views.tour_detail, name='tour-detail'),
+    path('api/tours/<int:tour_id>/clone/', views.tour_clone, name='tour-clone'),
+    path('api/tours/<int:tour_id>/route/', views.tour_route, name='tour-route'),
+    path('api/tours/<int:tour_id>/thumbnail/<slug:digest>.<str:fmt>', views.tour_thumbnail, name='tour-thumbnail'),
     
     # ---------------------------------------------------------------------
     # Tour sharing endpoints (User Story #11)
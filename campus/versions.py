@@ -0,0 +1,101 @@
+"""
+Change-version tokens kept in the shared cache.
+
+A version is an opaque hex timestamp that is replaced whenever the data it
+guards changes. Views derive ETags, Last-Modified dates and cache keys from
+these tokens, so they can answer "has anything changed?" without querying.
+"""
+import datetime
+import hashlib
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = 'campus:version:catalog'
+OFFICIAL_TOURS_VERSION_KEY = 'campus:version:official-tours'
+
+
+def _tour_feed_key(user_id) -> str:
+    return f'campus:version:tour-feed:{user_id}'
+
+
+def _new_version() -> str:
+    return f"{time.time_ns():x}"
+
+
+def get_version(key: str) -> str:
+    version = cache.get(key)
+    if version is None:
+        # add() so concurrent first readers agree on a single token.
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(keys: Sequence[str], fetched: Optional[Dict] = None) -> List[str]:
+    """Versions for ``keys`` in order; ``fetched`` may hold values already read with get_many()."""
+    if fetched is None:
+        fetched = cache.get_many(keys)
+    return [fetched[key] if fetched.get(key) is not None else get_version(key) for key in keys]
+
+
+def bump_version(key: str) -> str:
+    version = _new_version()
+    cache.set(key, version, None)
+    return version
+
+
+def bump_now_and_on_commit(bump) -> None:
+    """Call ``bump`` now and again once the surrounding transaction commits."""
+    bump()
+    # Bump again once the write is visible, in case another worker rebuilt a
+    # cached payload from pre-commit data in between.
+    transaction.on_commit(bump)
+
+
+def version_datetime(*versions: str) -> datetime.datetime:
+    """When the most recent of the given versions was minted."""
+    latest = max(int(version, 16) for version in versions)
+    return datetime.datetime.fromtimestamp(latest / 1e9, tz=datetime.timezone.utc)
+
+
+def combine_versions(*parts) -> str:
+    """Fold several version tokens (and any other discriminators) into one ETag value."""
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def catalog_version() -> str:
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> str:
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def official_tours_version() -> str:
+    return get_version(OFFICIAL_TOURS_VERSION_KEY)
+
+
+def bump_official_tours_version() -> str:
+    return bump_version(OFFICIAL_TOURS_VERSION_KEY)
+
+
+def tour_feed_version_keys(user_id, include_official: bool = True) -> List[str]:
+    """Keys of every version a user's tour feed is built from."""
+    keys = [_tour_feed_key(user_id), CATALOG_VERSION_KEY]
+    if include_official:
+        keys.append(OFFICIAL_TOURS_VERSION_KEY)
+    return keys
+
+
+def tour_feed_version(user_id) -> str:
+    """Changes whenever a tour the user owns or has been shared changes, or they (un)bookmark a tour."""
+    return get_version(_tour_feed_key(user_id))
+
+
+def bump_tour_feed_versions(user_ids: Iterable) -> None:
+    version = _new_version()
+    cache.set_many({_tour_feed_key(user_id): version for user_id in set(user_ids)}, None)
@@ -1,3 +1,5 @@
+import base64
+import hmac
 import json
 import logging
 from json import JSONDecodeError
@@ -5,19 +7,48 @@ from typing import List
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 from django.core.paginator import Paginator
 from datetime import datetime
+from django.utils.cache import patch_cache_control, patch_response_headers
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.views.decorators.http import condition, require_GET, require_POST, require_http_methods
 from django.db.models import Q
 
 from .ai import CampusAiError, ChatMessage, ChatResult, get_landmark_context, run_landmark_chat, TourAgentDeps
-from .models import Location, Bookmark, Tour, TourStop, TourBookmark, SharedTour, Rating
+from .models import Location, LocationChange, Bookmark, Tour, TourBookmark, SharedTour, Rating, RequestProfile
 from .forms import LocationForm
-from .route_utils import calculate_route_segments, RouteCalculationError
+from .catalog import get_catalog, get_catalog_by_id, get_catalog_json
+from .queries import duplicate_shapes
+from .ratings import rating_trends
+from .responses import VersionedDocument, cached_json_response, negotiate_encoding
+from .search import search_locations
+from .storage import CONTENT_ADDRESSED_NAME_RE, content_addressed_storage
+from .serializers import (
+    LOCATION_API_FIELDS,
+    LOCATION_FIELD_SERIALIZERS,
+    LOCATION_SUMMARY_FIELDS,
+    location_field_columns,
+    pick_fields,
+    serialize_location_fields,
+    serialize_stop,
+    TourSerializer,
+)
+from . import metrics, typeahead
+from .thumbnails import THUMBNAIL_FORMATS, generate_tour_thumbnail, thumbnail_path
+from .tours import TourWriteError, clone_tour, edit_tour_stops, save_tour
+from .versions import (
+    bump_now_and_on_commit,
+    bump_tour_feed_versions,
+    catalog_version,
+    combine_versions,
+    tour_feed_version,
+    tour_feed_version_keys,
+    version_datetime,
+)
 from accounts.models import Friendship
 
 logger = logging.getLogger(__name__)
@@ -28,50 +59,32 @@ logger = logging.getLogger(__name__)
 # -------------------------------------------------------------------------
 def campus_overview(request):
     """Renders interactive campus map with all known locations."""
-    locations = Location.objects.all()
-
     bookmarked_slugs = set()
     if request.user.is_authenticated:
         bookmarked_slugs = set(
             Bookmark.objects.filter(user=request.user).values_list('location__slug', flat=True)
         )
 
-    locations_list = list(locations)
-    locations_list.sort(key=lambda loc: (loc.slug not in bookmarked_slugs, loc.name))
-
-    locations_payload = [
-        {
-            'name': location.name,
-            'slug': location.slug,
-            'description': location.description,
-            'historical_info': location.historical_info,
-            'latitude': float(location.latitude),
-            'longitude': float(location.longitude),
-            'address': location.address,
-            'category': location.category,
-            'image_url': location.image_url,
-            'photo': location.photo.url if location.photo else None,
-            'is_bookmarked': location.slug in bookmarked_slugs,
-        }
-        for location in locations_list
-    ]
+    locations_list = sorted(
+        get_catalog(),
+        key=lambda row: (row['slug'] not in bookmarked_slugs, row['name']),
+    )
 
     tours = []
     shared_tours = []
     official_tours = []
     bookmarked_tour_ids = set()
 
-    official_tours = Tour.objects.filter(is_official=True).prefetch_related('stops__location')
+    serializer = TourSerializer()
+    official_tours = serializer.prepare(Tour.objects.filter(is_official=True))
 
     if request.user.is_authenticated:
-        tours = Tour.objects.filter(user=request.user).prefetch_related('stops__location')
+        tours = serializer.prepare(Tour.objects.filter(user=request.user))
         bookmarked_tour_ids = set(
             TourBookmark.objects.filter(user=request.user).values_list('tour__id', flat=True)
         )
 
-        shared_tour_records = SharedTour.objects.filter(
-            shared_with=request.user
-        ).select_related('tour', 'shared_by').prefetch_related('tour__stops__location')
+        shared_tour_records = serializer.prepare_shares(SharedTour.objects.filter(shared_with=request.user))
         shared_tours = [
             {
                 'tour': record.tour,
@@ -85,7 +98,7 @@ def campus_overview(request):
 
     context = {
         'locations': locations_list,
-        'locations_payload': locations_payload,
+        'locations_json': get_catalog_json(),
         'bookmarked_slugs': list(bookmarked_slugs),
         'tours': tours,
         'shared_tours': shared_tours,
@@ -105,23 +118,7 @@ def tour_create(request, tour_id=None):
 
     if tour_id:
         tour = get_object_or_404(Tour, id=tour_id, user=request.user)
-        stops = []
-        for stop in tour.stops.all():
-            stops.append({
-                'id': stop.id,
-                'location_id': stop.location.id,
-                'order': stop.order,
-                'location': {
-                    'id': stop.location.id,
-                    'name': stop.location.name,
-                    'slug': stop.location.slug,
-                    'description': stop.location.description,
-                    'latitude': float(stop.location.latitude),
-                    'longitude': float(stop.location.longitude),
-                    'address': stop.location.address,
-                    'category': stop.location.category,
-                }
-            })
+        stops = [serialize_stop(stop) for stop in tour.stops.all()]
         tour_payload = {
             'id': tour.id,
             'name': tour.name,
@@ -129,28 +126,13 @@ def tour_create(request, tour_id=None):
             'stops': stops,
         }
 
-    locations = Location.objects.all()
-    bookmarked_slugs = set(
+    bookmarked_slugs = list(
         Bookmark.objects.filter(user=request.user).values_list('location__slug', flat=True)
     )
 
-    locations_payload = [
-        {
-            'id': location.id,
-            'name': location.name,
-            'slug': location.slug,
-            'description': location.description,
-            'latitude': float(location.latitude),
-            'longitude': float(location.longitude),
-            'address': location.address,
-            'category': location.category,
-            'is_bookmarked': location.slug in bookmarked_slugs,
-        }
-        for location in locations
-    ]
     context = {
-        'locations': locations,
-        'locations_payload': locations_payload,
+        'locations_json': get_catalog_json(),
+        'bookmarked_slugs': bookmarked_slugs,
         'tour': tour,
         'tour_payload': tour_payload,
         'is_edit': tour_id is not None,
@@ -161,62 +143,21 @@ def tour_create(request, tour_id=None):
 @login_required
 def tour_manage(request):
     """Render the tour management page where users can view and edit their tours."""
-    tours = Tour.objects.filter(user=request.user).prefetch_related('stops__location')
+    serializer = TourSerializer(request.user, include_shares=True)
+    tours = list(serializer.prepare(Tour.objects.filter(user=request.user)))
+    tours_payload = [serializer.serialize(tour) for tour in tours]
+    bookmarked_tour_ids = {tour.id for tour in tours if tour.is_bookmarked}
     locations = Location.objects.all()
     bookmarked_slugs = set(
         Bookmark.objects.filter(user=request.user).values_list('location__slug', flat=True)
     )
-    bookmarked_tour_ids = set(
-        TourBookmark.objects.filter(user=request.user).values_list('tour__id', flat=True)
-    )
-
-    tours_payload = []
-    for tour in tours:
-        stops = []
-        for stop in tour.stops.all():
-            stops.append({
-                'id': stop.id,
-                'location_id': stop.location.id,
-                'order': stop.order,
-                'location': {
-                    'id': stop.location.id,
-                    'name': stop.location.name,
-                    'slug': stop.location.slug,
-                    'description': stop.location.description,
-                    'latitude': float(stop.location.latitude),
-                    'longitude': float(stop.location.longitude),
-                    'address': stop.location.address,
-                    'category': stop.location.category,
-                }
-            })
-        
-        # Get shares for this tour
-        shares = SharedTour.objects.filter(tour=tour).select_related('shared_with')
-        shared_with = [{'id': s.shared_with.id, 'username': s.shared_with.username, 'share_id': s.id} for s in shares]
-        
-        tours_payload.append({
-            'id': tour.id,
-            'name': tour.name,
-            'description': tour.description,
-            'created_at': tour.created_at.isoformat(),
-            'stops': stops,
-            'is_bookmarked': tour.id in bookmarked_tour_ids,
-            'shared_with': shared_with,
-        })
 
     locations_payload = [
         {
-            'id': location.id,
-            'name': location.name,
-            'slug': location.slug,
-            'description': location.description,
-            'latitude': float(location.latitude),
-            'longitude': float(location.longitude),
-            'address': location.address,
-            'category': location.category,
-            'is_bookmarked': location.slug in bookmarked_slugs,
+            **pick_fields(row, LOCATION_SUMMARY_FIELDS + ('photo_placeholder', 'photo_color')),
+            'is_bookmarked': row['slug'] in bookmarked_slugs,
         }
-        for location in locations
+        for row in get_catalog()
     ]
 
     # Get user's friends for sharing
@@ -252,43 +193,9 @@ def tour_manage(request):
     friends.sort(key=lambda x: x['username'])
 
     # Get tours shared with the user
-    shared_with_user = SharedTour.objects.filter(
-        shared_with=request.user
-    ).select_related('tour', 'shared_by', 'tour__user').prefetch_related('tour__stops__location')
-    
-    shared_tours_payload = []
-    for share in shared_with_user:
-        tour = share.tour
-        stops = []
-        for stop in tour.stops.all():
-            stops.append({
-                'id': stop.id,
-                'location_id': stop.location.id,
-                'order': stop.order,
-                'location': {
-                    'id': stop.location.id,
-                    'name': stop.location.name,
-                    'slug': stop.location.slug,
-                    'description': stop.location.description,
-                    'latitude': float(stop.location.latitude),
-                    'longitude': float(stop.location.longitude),
-                    'address': stop.location.address,
-                    'category': stop.location.category,
-                }
-            })
-        
-        shared_tours_payload.append({
-            'share_id': share.id,
-            'tour_id': tour.id,
-            'name': tour.name,
-            'description': tour.description,
-            'created_at': tour.created_at.isoformat(),
-            'shared_by': share.shared_by.username,
-            'shared_by_display': share.shared_by.get_full_name() or share.shared_by.username,
-            'shared_at': share.created_at.isoformat(),
-            'stops': stops,
-            'route_data': tour.route_data,
-        })
+    shared_serializer = TourSerializer()
+    shared_with_user = shared_serializer.prepare_shares(SharedTour.objects.filter(shared_with=request.user))
+    shared_tours_payload = [shared_serializer.serialize_share(share) for share in shared_with_user]
 
     context = {
         'tours': tours,
@@ -302,29 +209,297 @@ def tour_manage(request):
     return render(request, 'campus/tour_manage.html', context)
 
 
+LOCATION_PAGE_SIZE = 100
+LOCATION_PAGE_SIZE_MAX = 500
+
+
+def _encode_location_cursor(location):
+    raw = json.dumps([location.name, location.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_location_cursor(cursor):
+    """Return the (name, id) keyset position a cursor points after."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, location_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor.')
+    if not isinstance(name, str) or not isinstance(location_id, int):
+        raise ValueError('Invalid cursor.')
+    return name, location_id
+
+
+def _parse_location_query(request):
+    """
+    Validated, normalized location_list options, or a 400 JsonResponse.
+
+    Runs before any validator or cache lookup, so error responses carry
+    neither. Equivalent query strings normalize to the same options.
+    """
+    fields = None
+    if 'fields' in request.GET:
+        requested = {field.strip() for field in request.GET['fields'].split(',') if field.strip()}
+        unknown = sorted(requested - set(LOCATION_FIELD_SERIALIZERS))
+        if not requested or unknown:
+            return JsonResponse({
+                'error': 'Unknown or missing fields.',
+                'unknown_fields': unknown,
+                'allowed_fields': list(LOCATION_FIELD_SERIALIZERS),
+            }, status=400)
+        if requested != set(LOCATION_API_FIELDS):
+            fields = [field for field in LOCATION_FIELD_SERIALIZERS if field in requested]
+
+    categories = sorted({
+        value.strip().lower() for value in request.GET.get('category', '').split(',') if value.strip()
+    })
+
+    limit = None
+    cursor = None
+    if 'limit' in request.GET or 'cursor' in request.GET:
+        try:
+            limit = int(request.GET.get('limit', LOCATION_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return JsonResponse({'error': 'limit must be a positive integer.'}, status=400)
+        limit = min(limit, LOCATION_PAGE_SIZE_MAX)
+        if request.GET.get('cursor'):
+            try:
+                cursor = _decode_location_cursor(request.GET['cursor'])
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+    return {'fields': fields, 'categories': categories, 'limit': limit, 'cursor': cursor}
+
+
+def _location_list_cacheable(query):
+    # Only canonical requests are stored: every field, the first page at the
+    # default size, and categories that exist. Cursors and field subsets would
+    # otherwise fill the cache and evict the version tokens.
+    if query['fields'] is not None or query['cursor'] is not None:
+        return False
+    if query['limit'] not in (None, LOCATION_PAGE_SIZE):
+        return False
+    known = {row['category'].lower() for row in get_catalog() if row['category']}
+    return set(query['categories']) <= known
+
+
+def _location_list_key(request, query):
+    # Photo URLs are absolute, so the host is part of the representation.
+    return combine_versions(
+        'locations', catalog_version(), query['fields'], query['categories'], query['limit'],
+        query['cursor'], request.build_absolute_uri('/'),
+    )
+
+
+def _location_list_etag(request, query):
+    encoding = negotiate_encoding(request) if _location_list_cacheable(query) else None
+    return f"{_location_list_key(request, query)}-{encoding or 'identity'}"
+
+
+def _location_list_last_modified(request, query):
+    return version_datetime(catalog_version())
+
+
+def _location_list_payload(request, query):
+    fields = query['fields']
+    if fields is None and not query['categories'] and query['limit'] is None:
+        data = []
+        for row in get_catalog():
+            location = pick_fields(row, LOCATION_API_FIELDS)
+            if location['photo']:
+                location['photo'] = request.build_absolute_uri(location['photo'])
+            data.append(location)
+        return {'locations': data}
+
+    fields = fields or list(LOCATION_API_FIELDS)
+    # name and id are always loaded: they drive the ordering and the cursor.
+    locations = Location.objects.only('id', 'name', *location_field_columns(fields)).order_by('name', 'id')
+
+    if query['categories']:
+        category_filter = Q()
+        for category in query['categories']:
+            category_filter |= Q(category__iexact=category)
+        locations = locations.filter(category_filter)
+
+    limit = query['limit']
+    has_more = False
+    if limit is not None:
+        if query['cursor']:
+            after_name, after_id = query['cursor']
+            locations = locations.filter(Q(name__gt=after_name) | Q(name=after_name, id__gt=after_id))
+        page = list(locations[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+    else:
+        page = list(locations)
+
+    data = []
+    for location in page:
+        row = serialize_location_fields(location, fields)
+        if row.get('photo'):
+            row['photo'] = request.build_absolute_uri(row['photo'])
+        data.append(row)
+
+    payload = {'locations': data}
+    if limit is not None:
+        payload['next_cursor'] = _encode_location_cursor(page[-1]) if has_more else None
+    return payload
+
+
+@condition(etag_func=_location_list_etag, last_modified_func=_location_list_last_modified)
+def _serve_location_list(request, query):
+    if not _location_list_cacheable(query):
+        return JsonResponse(_location_list_payload(request, query))
+    return cached_json_response(
+        request, _location_list_key(request, query), lambda: _location_list_payload(request, query)
+    )
+
+
 @require_GET
 def location_list(request):
-    """Returns JSON with all campus locations (for front-end map JS)."""
-    locations = Location.objects.all()
-    data = []
-    for location in locations:
-        data.append(
-            {
-                'name': location.name,
-                'slug': location.slug,
-                'description': location.description,
-                'historical_info': location.historical_info,
-                'latitude': float(location.latitude),
-                'longitude': float(location.longitude),
-                'address': location.address,
-                'category': location.category,
-                'image_url': location.image_url,
-                'photo': request.build_absolute_uri(location.photo.url)
-                if location.photo
-                else None,
-            }
-        )
-    return JsonResponse({'locations': data})
+    """
+    Returns JSON with campus locations (for front-end map JS).
+
+    Without query parameters every location is returned from the cached catalog.
+    Optional parameters narrow the query in SQL instead:
+
+    - ``fields=name,slug,latitude,longitude``: only return these keys
+    - ``category=Food,Academic``: only return locations in these categories
+    - ``limit=N`` and ``cursor=...``: page through results in name order;
+      the response's ``next_cursor`` fetches the following page
+    """
+    query = _parse_location_query(request)
+    if isinstance(query, JsonResponse):
+        return query
+    return _serve_location_list(request, query)
+
+
+LOCATION_SEARCH_LIMIT = 20
+LOCATION_SEARCH_LIMIT_MAX = 100
+
+
+@require_GET
+def location_search(request):
+    """
+    Relevance-ranked full-text search over locations.
+
+    ``q`` is the query text; ``limit`` caps the number of results. Each result
+    carries an HTML ``snippet`` with the matched words wrapped in <mark>.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'q is required.'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', LOCATION_SEARCH_LIMIT))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be a positive integer.'}, status=400)
+
+    results = search_locations(query, min(limit, LOCATION_SEARCH_LIMIT_MAX))
+    return JsonResponse({'query': query, 'results': results})
+
+
+TYPEAHEAD_LIMIT = 8
+TYPEAHEAD_LIMIT_MAX = 20
+
+
+@require_GET
+def typeahead_suggestions(request):
+    """
+    Prefix suggestions across locations, tours and, for logged-in users, public users.
+
+    ``q`` is the typed prefix, ``types`` an optional comma-separated subset of
+    location,tour,user and ``limit`` the number of suggestions.
+    """
+    query = request.GET.get('q', '')
+    kinds = [kind.strip() for kind in request.GET.get('types', '').split(',') if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in typeahead.KIND_ORDER]
+    if unknown:
+        return JsonResponse({'error': f"Unknown types: {', '.join(unknown)}."}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', TYPEAHEAD_LIMIT))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be a positive integer.'}, status=400)
+
+    suggestions = typeahead.suggest(query, request.user, min(limit, TYPEAHEAD_LIMIT_MAX), kinds)
+    return JsonResponse({'query': query, 'suggestions': suggestions})
+
+
+LOCATION_CHANGES_BATCH = 1000
+
+
+@require_GET
+def location_changes(request):
+    """
+    Delta sync for offline clients: locations upserted or deleted since ``since``.
+
+    ``since`` is the ``next`` watermark from the previous response. Omitting it
+    (or passing 0) returns the whole catalog as upserts, which is how a client
+    takes its first snapshot. Each location appears at most once per response,
+    with its latest state.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return JsonResponse({'error': 'since must be an integer sequence number.'}, status=400)
+    if since < 0:
+        return JsonResponse({'error': 'since must be an integer sequence number.'}, status=400)
+
+    # Pin the watermark before reading anything else so that changes landing
+    # mid-request are picked up by the next sync rather than skipped.
+    latest = LocationChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    rows_by_id = get_catalog_by_id()
+
+    def upsert_row(row):
+        location = {'id': row['id'], **pick_fields(row, LOCATION_API_FIELDS)}
+        if location['photo']:
+            location['photo'] = request.build_absolute_uri(location['photo'])
+        return location
+
+    if since == 0:
+        return JsonResponse({
+            'since': 0,
+            'next': latest,
+            'has_more': False,
+            'upserts': [upsert_row(row) for row in rows_by_id.values()],
+            'deletions': [],
+        })
+
+    changes = list(
+        LocationChange.objects
+        .filter(id__gt=since, id__lte=latest)
+        .order_by('id')
+        .values('id', 'location_id', 'slug', 'action')[:LOCATION_CHANGES_BATCH]
+    )
+    has_more = len(changes) == LOCATION_CHANGES_BATCH
+    watermark = changes[-1]['id'] if has_more else max(latest, since)
+
+    final_state = {}
+    for change in changes:
+        final_state[change['location_id']] = change
+
+    upserts = []
+    deletions = []
+    for location_id, change in final_state.items():
+        if change['action'] == 'delete':
+            deletions.append({'id': location_id, 'slug': change['slug']})
+        elif location_id in rows_by_id:
+            upserts.append(upsert_row(rows_by_id[location_id]))
+
+    return JsonResponse({
+        'since': since,
+        'next': watermark,
+        'has_more': has_more,
+        'upserts': upserts,
+        'deletions': deletions,
+    })
 
 
 @csrf_exempt
@@ -445,7 +620,9 @@ def location_detail(request, slug):
         'is_bookmarked': is_bookmarked,
         'user_rating': user_rating,
         'average_rating': location.average_rating(),
-        'rating_count': location.rating_count(),
+        'rating_count': location.rating_count,
+        'photo_srcset_webp': location.photo_srcset('webp'),
+        'photo_srcset_jpeg': location.photo_srcset('jpeg'),
         'google_maps_api_key': settings.GOOGLE_MAP_API_KEY,
     }
     return render(request, 'campus/location_detail.html', context)
@@ -482,11 +659,14 @@ def rate_location(request, slug):
         }
     )
 
+    # The aggregates were updated in the database by the Rating signals.
+    location.refresh_from_db(fields=['rating_count', 'rating_sum'])
+
     return JsonResponse({
         'success': True,
         'created': created,
         'average_rating': location.average_rating(),
-        'rating_count': location.rating_count(),
+        'rating_count': location.rating_count,
         'user_rating': {
             'score': rating.score,
             'comment': rating.comment,
@@ -539,112 +719,73 @@ def toggle_tour_bookmark(request, tour_id):
 # -------------------------------------------------------------------------
 #  TOUR VIEWS (User Story #7)
 # -------------------------------------------------------------------------
+def _tour_feed_document(request, include_official=True):
+    """The user's cached feed document and current versions, read once per request."""
+    attribute = '_tour_feed_document' if include_official else '_shared_tours_document'
+    document = getattr(request, attribute, None)
+    if document is None:
+        name = 'tours' if include_official else 'shared-tours'
+        document = VersionedDocument(
+            f'{name}:{request.user.id}', tour_feed_version_keys(request.user.id, include_official)
+        )
+        setattr(request, attribute, document)
+    return document
+
+
+def _tour_list_etag(request):
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    versions = _tour_feed_document(request).versions
+    return f"{combine_versions('tours', request.user.id, *versions)}-{negotiate_encoding(request) or 'identity'}"
+
+
+def _tour_list_last_modified(request):
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return version_datetime(*_tour_feed_document(request).versions)
+
+
+def _shared_tours_etag(request):
+    versions = _tour_feed_document(request, include_official=False).versions
+    return f"{combine_versions('shared-tours', request.user.id, *versions)}-{negotiate_encoding(request) or 'identity'}"
+
+
+def _shared_tours_last_modified(request):
+    return version_datetime(*_tour_feed_document(request, include_official=False).versions)
+
+
+def _tour_feed_payload(request):
+    """The user's owned tours, then tours shared with them, then official tours."""
+    serializer = TourSerializer(request.user)
+    owned_tours = serializer.prepare(Tour.objects.filter(user=request.user))
+    shared_records = serializer.prepare_shares(SharedTour.objects.filter(shared_with=request.user))
+    official_tours = serializer.prepare(Tour.objects.filter(is_official=True).exclude(user=request.user))
+
+    data = [serializer.serialize(tour, tour_type='owned') for tour in owned_tours]
+    data.extend(serializer.serialize_share(record, tour_type='shared') for record in shared_records)
+    data.extend(serializer.serialize(tour, tour_type='official') for tour in official_tours)
+    return {'tours': data}
+
+
+def _saved_tour_response(request, tour, status=200, is_bookmarked=None):
+    """
+    Serialize a tour just written, re-read through TourSerializer's query plan.
+
+    New tours pass ``is_bookmarked=False``; otherwise it is looked up for the user.
+    """
+    serializer = TourSerializer(request.user if is_bookmarked is None else None)
+    tour = serializer.prepare(Tour.objects.filter(pk=tour.pk)).get()
+    extra = {} if is_bookmarked is None else {'is_bookmarked': is_bookmarked}
+    return JsonResponse(serializer.serialize(tour, **extra), status=status)
+
+
 @csrf_exempt
 @login_required
+@condition(etag_func=_tour_list_etag, last_modified_func=_tour_list_last_modified)
 def tour_list(request):
     """List all tours for the authenticated user with their stops (GET) or create a new tour (POST)."""
     if request.method == 'GET':
-        owned_tours = Tour.objects.filter(user=request.user).prefetch_related('stops__location')
-        shared_records = SharedTour.objects.filter(
-            shared_with=request.user
-        ).select_related('tour', 'shared_by').prefetch_related('tour__stops__location')
-        official_tours = Tour.objects.filter(is_official=True).prefetch_related('stops__location')
-
-        data = []
-        for tour in owned_tours:
-            stops = []
-            for stop in tour.stops.all():
-                stops.append({
-                    'id': stop.id,
-                    'location_id': stop.location.id,
-                    'order': stop.order,
-                    'location': {
-                        'id': stop.location.id,
-                        'name': stop.location.name,
-                        'slug': stop.location.slug,
-                        'description': stop.location.description,
-                        'latitude': float(stop.location.latitude),
-                        'longitude': float(stop.location.longitude),
-                        'address': stop.location.address,
-                        'category': stop.location.category,
-                    }
-                })
-            data.append({
-                'id': tour.id,
-                'name': tour.name,
-                'description': tour.description,
-                'created_at': tour.created_at.isoformat(),
-                'stops': stops,
-                'route_data': tour.route_data,
-                'tour_type': 'owned',
-                'is_official': tour.is_official,
-            })
-
-        for record in shared_records:
-            tour = record.tour
-            stops = []
-            for stop in tour.stops.all():
-                stops.append({
-                    'id': stop.id,
-                    'location_id': stop.location.id,
-                    'order': stop.order,
-                    'location': {
-                        'id': stop.location.id,
-                        'name': stop.location.name,
-                        'slug': stop.location.slug,
-                        'description': stop.location.description,
-                        'latitude': float(stop.location.latitude),
-                        'longitude': float(stop.location.longitude),
-                        'address': stop.location.address,
-                        'category': stop.location.category,
-                    }
-                })
-            data.append({
-                'id': tour.id,
-                'name': tour.name,
-                'description': tour.description,
-                'created_at': tour.created_at.isoformat(),
-                'stops': stops,
-                'route_data': tour.route_data,
-                'tour_type': 'shared',
-                'shared_by': record.shared_by.username,
-                'shared_by_display': record.shared_by.get_full_name() or record.shared_by.username,
-                'share_id': record.id,
-                'is_official': tour.is_official,
-            })
-
-        for tour in official_tours:
-            if tour.user == request.user:
-                continue
-            stops = []
-            for stop in tour.stops.all():
-                stops.append({
-                    'id': stop.id,
-                    'location_id': stop.location.id,
-                    'order': stop.order,
-                    'location': {
-                        'id': stop.location.id,
-                        'name': stop.location.name,
-                        'slug': stop.location.slug,
-                        'description': stop.location.description,
-                        'latitude': float(stop.location.latitude),
-                        'longitude': float(stop.location.longitude),
-                        'address': stop.location.address,
-                        'category': stop.location.category,
-                    }
-                })
-            data.append({
-                'id': tour.id,
-                'name': tour.name,
-                'description': tour.description,
-                'created_at': tour.created_at.isoformat(),
-                'stops': stops,
-                'route_data': tour.route_data,
-                'tour_type': 'official',
-                'is_official': True,
-            })
-
-        return JsonResponse({'tours': data})
+        return _tour_feed_document(request).response(request, lambda: _tour_feed_payload(request))
     elif request.method == 'POST':
         """Create a new tour for the authenticated user."""
         try:
@@ -657,83 +798,13 @@ def tour_list(request):
             return JsonResponse({'error': 'Tour name is required.'}, status=400)
 
         description = (payload.get('description') or '').strip()
-        location_ids = payload.get('location_ids', [])
-
-        if not isinstance(location_ids, list):
-            return JsonResponse({'error': 'location_ids must be an array.'}, status=400)
-
-        if not location_ids:
-            return JsonResponse({'error': 'At least one location is required.'}, status=400)
-
-        # Validate that all locations exist
-        locations = Location.objects.filter(id__in=location_ids)
-        if locations.count() != len(location_ids):
-            return JsonResponse({'error': 'One or more locations not found.'}, status=400)
-
-        # Create tour
-        tour = Tour.objects.create(
-            user=request.user,
-            name=name,
-            description=description,
-        )
-
-        # Create tour stops in order
-        for order, location_id in enumerate(location_ids, start=1):
-            location = locations.get(id=location_id)
-            TourStop.objects.create(
-                tour=tour,
-                location=location,
-                order=order,
-            )
-
-        # Calculate and save route segments
-        stops_data = []
-        for stop in tour.stops.all():
-            stops_data.append({
-                'id': stop.location.id,
-                'name': stop.location.name,
-                'latitude': float(stop.location.latitude),
-                'longitude': float(stop.location.longitude),
-            })
-
-        if len(stops_data) >= 2:
-            try:
-                route_segments = calculate_route_segments(stops_data)
-                tour.route_data = {'segments': route_segments} if route_segments else None
-                tour.save()
-                logger.info(f"Successfully calculated route for tour {tour.id} ({tour.name}) with {len(route_segments) if route_segments else 0} segments")
-            except RouteCalculationError as e:
-                logger.error(f"Failed to calculate route for tour {tour.id} ({tour.name}): {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error calculating route for tour {tour.id} ({tour.name}): {str(e)}")
+        try:
+            tour = save_tour(request.user, name, description, payload.get('location_ids', []))
+        except TourWriteError as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
         # Return created tour with stops
-        stops = []
-        for stop in tour.stops.all():
-            stops.append({
-                'id': stop.id,
-                'location_id': stop.location.id,
-                'order': stop.order,
-                'location': {
-                    'id': stop.location.id,
-                    'name': stop.location.name,
-                    'slug': stop.location.slug,
-                    'description': stop.location.description,
-                    'latitude': float(stop.location.latitude),
-                    'longitude': float(stop.location.longitude),
-                    'address': stop.location.address,
-                    'category': stop.location.category,
-                }
-            })
-
-        return JsonResponse({
-            'id': tour.id,
-            'name': tour.name,
-            'description': tour.description,
-            'created_at': tour.created_at.isoformat(),
-            'stops': stops,
-            'route_data': tour.route_data,
-        }, status=201)
+        return _saved_tour_response(request, tour, status=201, is_bookmarked=False)
     else:
         return JsonResponse({'error': 'Method not allowed.'}, status=405)
 
@@ -741,11 +812,11 @@ def tour_list(request):
 @csrf_exempt
 @login_required
 def tour_detail(request, tour_id):
-    """Update (PUT) or delete (DELETE) a tour."""
+    """Update (PUT), edit single stops of (PATCH) or delete (DELETE) a tour."""
     tour = get_object_or_404(Tour, id=tour_id)
 
     # Check ownership
-    if tour.user != request.user:
+    if tour.user_id != request.user.id:
         return JsonResponse({'error': 'You do not have permission to modify this tour.'}, status=403)
 
     if request.method == 'PUT':
@@ -760,87 +831,26 @@ def tour_detail(request, tour_id):
             return JsonResponse({'error': 'Tour name is required.'}, status=400)
 
         description = (payload.get('description') or '').strip()
-        location_ids = payload.get('location_ids', [])
-
-        if not isinstance(location_ids, list):
-            return JsonResponse({'error': 'location_ids must be an array.'}, status=400)
-
-        if not location_ids:
-            return JsonResponse({'error': 'At least one location is required.'}, status=400)
-
-        # Validate that all locations exist
-        locations = Location.objects.filter(id__in=location_ids)
-        if locations.count() != len(location_ids):
-            return JsonResponse({'error': 'One or more locations not found.'}, status=400)
-
-        # Update tour basic info
-        tour.name = name
-        tour.description = description
-        tour.save()
-
-        # Delete existing stops
-        tour.stops.all().delete()
-
-        # Create new stops in order
-        for order, location_id in enumerate(location_ids, start=1):
-            location = locations.get(id=location_id)
-            TourStop.objects.create(
-                tour=tour,
-                location=location,
-                order=order,
-            )
-
-        # Recalculate and save route segments
-        stops_data = []
-        for stop in tour.stops.all():
-            stops_data.append({
-                'id': stop.location.id,
-                'name': stop.location.name,
-                'latitude': float(stop.location.latitude),
-                'longitude': float(stop.location.longitude),
-            })
-
-        if len(stops_data) >= 2:
-            try:
-                route_segments = calculate_route_segments(stops_data)
-                tour.route_data = {'segments': route_segments} if route_segments else None
-                tour.save()
-                logger.info(f"Successfully calculated route for tour {tour.id} ({tour.name}) with {len(route_segments) if route_segments else 0} segments")
-            except RouteCalculationError as e:
-                logger.error(f"Failed to calculate route for tour {tour.id} ({tour.name}): {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error calculating route for tour {tour.id} ({tour.name}): {str(e)}")
+        try:
+            save_tour(request.user, name, description, payload.get('location_ids', []), tour=tour)
+        except TourWriteError as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
         # Return updated tour with stops
-        stops = []
-        for stop in tour.stops.all():
-            stops.append({
-                'id': stop.id,
-                'location_id': stop.location.id,
-                'order': stop.order,
-                'location': {
-                    'id': stop.location.id,
-                    'name': stop.location.name,
-                    'slug': stop.location.slug,
-                    'description': stop.location.description,
-                    'latitude': float(stop.location.latitude),
-                    'longitude': float(stop.location.longitude),
-                    'address': stop.location.address,
-                    'category': stop.location.category,
-                }
-            })
+        return _saved_tour_response(request, tour)
+    elif request.method == 'PATCH':
+        """Move, insert or remove individual stops without rewriting the others."""
+        try:
+            payload = json.loads(request.body)
+        except JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON payload.'}, status=400)
 
-        is_bookmarked = TourBookmark.objects.filter(user=request.user, tour=tour).exists()
+        try:
+            edit_tour_stops(tour, payload.get('operations'))
+        except TourWriteError as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
-        return JsonResponse({
-            'id': tour.id,
-            'name': tour.name,
-            'description': tour.description,
-            'created_at': tour.created_at.isoformat(),
-            'stops': stops,
-            'route_data': tour.route_data,
-            'is_bookmarked': is_bookmarked,
-        })
+        return _saved_tour_response(request, tour)
     elif request.method == 'DELETE':
         """Delete a tour."""
         tour.delete()
@@ -849,6 +859,95 @@ def tour_detail(request, tour_id):
         return JsonResponse({'error': 'Method not allowed.'}, status=405)
 
 
+def _can_view_tour(user, tour):
+    if tour.user_id == user.id or tour.is_official:
+        return True
+    return SharedTour.objects.filter(tour_id=tour.id, shared_with=user).exists()
+
+
+@csrf_exempt
+@login_required
+@require_POST
+def tour_clone(request, tour_id):
+    """Copy a tour the user can see (their own, shared with them or official) into their own tours."""
+    source = get_object_or_404(Tour, id=tour_id)
+    if not _can_view_tour(request.user, source):
+        return JsonResponse({'error': 'You do not have permission to copy this tour.'}, status=403)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+    except JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON payload.'}, status=400)
+
+    name = (payload.get('name') or '').strip()
+    tour = clone_tour(source, request.user, name=name or None)
+    return _saved_tour_response(request, tour, status=201, is_bookmarked=False)
+
+
+@login_required
+@require_GET
+def tour_route(request, tour_id):
+    """Full route geometry of one tour, fetched when the tour is opened rather than with every listing."""
+    tour = get_object_or_404(Tour.objects.only('id', 'user_id', 'is_official'), id=tour_id)
+    if not _can_view_tour(request.user, tour):
+        return JsonResponse({'error': 'You do not have permission to view this tour.'}, status=403)
+
+    def build_payload():
+        route = Tour.objects.filter(pk=tour.pk).values('route_data', 'route_summary').get()
+        return {'tour_id': tour.id, **route}
+
+    # Any write to the tour bumps its owner's feed version.
+    cache_key = combine_versions('tour-route', tour.id, tour_feed_version(tour.user_id))
+    return cached_json_response(request, cache_key, build_payload)
+
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def _cache_forever(response):
+    """Mark a response whose URL embeds a content hash as cacheable without revalidation."""
+    patch_response_headers(response, cache_timeout=IMMUTABLE_MAX_AGE)
+    patch_cache_control(response, public=True, immutable=True)
+    return response
+
+
+@require_GET
+def tour_thumbnail(request, tour_id, digest, fmt):
+    """Serve a pre-rendered route preview; the digest in the URL makes it immutable."""
+    if fmt not in THUMBNAIL_FORMATS:
+        raise Http404('Unsupported thumbnail format.')
+
+    tour = get_object_or_404(Tour.objects.only('id', 'thumbnail_digest'), id=tour_id)
+    if tour.thumbnail_digest != digest:
+        raise Http404('Thumbnail is out of date.')
+
+    path = thumbnail_path(digest, fmt)
+    if not default_storage.exists(path):
+        # Media was wiped or moved; the content hash lets us rebuild the same file.
+        tour = Tour.objects.prefetch_related('stops__location').get(id=tour_id)
+        if generate_tour_thumbnail(tour) != digest:
+            raise Http404('Thumbnail is out of date.')
+
+    response = FileResponse(default_storage.open(path, 'rb'), content_type=f'image/{fmt}')
+    return _cache_forever(response)
+
+
+def _media_etag(request, path):
+    match = CONTENT_ADDRESSED_NAME_RE.match(path)
+    return match.group('digest') if match else None
+
+
+@require_GET
+@condition(etag_func=_media_etag)
+def media_file(request, path):
+    """Serve a file from the content-addressed storage; its name is its hash, so it never changes."""
+    if not CONTENT_ADDRESSED_NAME_RE.match(path) or not content_addressed_storage.exists(path):
+        raise Http404('No such file.')
+
+    response = FileResponse(content_addressed_storage.open(path, 'rb'))
+    return _cache_forever(response)
+
+
 # -------------------------------------------------------------------------
 #  TOUR SHARING VIEWS (User Story #11)
 # -------------------------------------------------------------------------
@@ -859,7 +958,7 @@ def share_tour(request, tour_id):
     tour = get_object_or_404(Tour, id=tour_id)
     
     # Validate tour ownership
-    if tour.user != request.user:
+    if tour.user_id != request.user.id:
         return JsonResponse({'error': 'You can only share your own tours.'}, status=403)
     
     try:
@@ -871,39 +970,43 @@ def share_tour(request, tour_id):
     if not isinstance(friend_ids, list) or not friend_ids:
         return JsonResponse({'error': 'friend_ids must be a non-empty array.'}, status=400)
     
-    shared_count = 0
-    already_shared = []
-    not_friends = []
-    
+    requested_ids = []
     for friend_id in friend_ids:
         try:
-            friend_id = int(friend_id)
+            requested_ids.append(int(friend_id))
         except (ValueError, TypeError):
             continue
-        
-        # Check if users are friends
-        is_friend = Friendship.objects.filter(
-            Q(from_user=request.user, to_user_id=friend_id, status='accepted') |
-            Q(from_user_id=friend_id, to_user=request.user, status='accepted')
-        ).exists()
-        
-        if not is_friend:
+
+    # Friendships and existing shares for every requested id, one query each
+    friendships = Friendship.objects.filter(
+        Q(from_user=request.user, to_user_id__in=requested_ids) |
+        Q(from_user_id__in=requested_ids, to_user=request.user),
+        status='accepted',
+    ).values_list('from_user_id', 'to_user_id')
+    friend_set = {from_id if to_id == request.user.id else to_id for from_id, to_id in friendships}
+    shared_set = set(
+        SharedTour.objects.filter(tour=tour, shared_with_id__in=requested_ids).values_list('shared_with_id', flat=True)
+    )
+
+    already_shared = []
+    not_friends = []
+    new_ids = []
+    for friend_id in requested_ids:
+        if friend_id not in friend_set:
             not_friends.append(friend_id)
-            continue
-        
-        # Check if already shared
-        existing = SharedTour.objects.filter(tour=tour, shared_with_id=friend_id).first()
-        if existing:
+        elif friend_id in shared_set:
             already_shared.append(friend_id)
-            continue
-        
-        # Create share
-        SharedTour.objects.create(
-            tour=tour,
-            shared_by=request.user,
-            shared_with_id=friend_id,
-        )
-        shared_count += 1
+        else:
+            new_ids.append(friend_id)
+            shared_set.add(friend_id)
+
+    SharedTour.objects.bulk_create(
+        SharedTour(tour=tour, shared_by=request.user, shared_with_id=friend_id) for friend_id in new_ids
+    )
+    if new_ids:
+        # bulk_create() sends no signals; invalidate the recipients' feeds here.
+        bump_now_and_on_commit(lambda: bump_tour_feed_versions(new_ids))
+    shared_count = len(new_ids)
     
     response = {
         'success': True,
@@ -919,47 +1022,15 @@ def share_tour(request, tour_id):
 
 
 @login_required
+@condition(etag_func=_shared_tours_etag, last_modified_func=_shared_tours_last_modified)
 def shared_tours_list(request):
     """Get all tours shared with the current user."""
-    shared_tours = SharedTour.objects.filter(
-        shared_with=request.user
-    ).select_related('tour', 'shared_by', 'tour__user').prefetch_related('tour__stops__location')
-    
-    tours_data = []
-    for share in shared_tours:
-        tour = share.tour
-        stops = []
-        for stop in tour.stops.all():
-            stops.append({
-                'id': stop.id,
-                'location_id': stop.location.id,
-                'order': stop.order,
-                'location': {
-                    'id': stop.location.id,
-                    'name': stop.location.name,
-                    'slug': stop.location.slug,
-                    'description': stop.location.description,
-                    'latitude': float(stop.location.latitude),
-                    'longitude': float(stop.location.longitude),
-                    'address': stop.location.address,
-                    'category': stop.location.category,
-                }
-            })
-        
-        tours_data.append({
-            'share_id': share.id,
-            'tour_id': tour.id,
-            'name': tour.name,
-            'description': tour.description,
-            'created_at': tour.created_at.isoformat(),
-            'shared_by': share.shared_by.username,
-            'shared_by_id': share.shared_by.id,
-            'shared_at': share.created_at.isoformat(),
-            'stops': stops,
-            'route_data': tour.route_data,
-        })
-    
-    return JsonResponse({'tours': tours_data})
+    def build_payload():
+        serializer = TourSerializer(request.user)
+        shared_tours = serializer.prepare_shares(SharedTour.objects.filter(shared_with=request.user))
+        return {'tours': [serializer.serialize_share(share) for share in shared_tours]}
+
+    return _tour_feed_document(request, include_official=False).response(request, build_payload)
 
 
 @login_required
@@ -975,10 +1046,10 @@ def remove_shared_tour(request, share_id):
 @require_http_methods(['DELETE'])
 def revoke_tour_share(request, share_id):
     """Tour owner revokes sharing from a specific user."""
-    share = get_object_or_404(SharedTour, id=share_id)
+    share = get_object_or_404(SharedTour.objects.select_related('tour'), id=share_id)
 
     # Validate ownership
-    if share.tour.user != request.user:
+    if share.tour.user_id != request.user.id:
         return JsonResponse({'error': 'You can only revoke shares of your own tours.'}, status=403)
 
     share.delete()
@@ -988,6 +1059,10 @@ def revoke_tour_share(request, share_id):
 # -------------------------------------------------------------------------
 #  ADMIN FEEDBACK VIEWS (User Story #13)
 # -------------------------------------------------------------------------
+FEEDBACK_TREND_PANEL_SIZE = 5
+FEEDBACK_TREND_MAX_DAYS = 90
+
+
 @user_passes_test(admin_check)
 def feedback_dashboard(request):
     """Admin dashboard to view and manage user feedback."""
@@ -1033,10 +1108,29 @@ def feedback_dashboard(request):
         'date_from': date_from,
         'date_to': date_to,
         'status_choices': Rating.STATUS_CHOICES,
+        'declining_locations': [trend for trend in rating_trends() if trend['change'] < 0][:FEEDBACK_TREND_PANEL_SIZE],
     }
     return render(request, 'campus/feedback_dashboard.html', context)
 
 
+@user_passes_test(admin_check)
+@require_GET
+def feedback_trends(request):
+    """
+    Per-location rating trends from the daily rollups, most declining first.
+
+    ``days`` (default 7) sets the window compared against the window before it.
+    """
+    try:
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= FEEDBACK_TREND_MAX_DAYS:
+        return JsonResponse({'error': f'days must be between 1 and {FEEDBACK_TREND_MAX_DAYS}.'}, status=400)
+
+    return JsonResponse({'days': days, 'locations': rating_trends(days)})
+
+
 @csrf_exempt
 @user_passes_test(admin_check)
 @require_POST
@@ -1073,3 +1167,50 @@ def respond_to_feedback(request, rating_id):
         'responded_by': rating.responded_by.username if rating.responded_by else None,
         'responded_at': rating.responded_at.isoformat() if rating.responded_at else None,
     })
+
+
+# -------------------------------------------------------------------------
+#  ADMIN REQUEST PROFILES AND METRICS (see campus.profiling, campus.metrics)
+# -------------------------------------------------------------------------
+@user_passes_test(admin_check)
+@require_GET
+def request_profiles(request):
+    """Staff list of profiled requests, newest first."""
+    profiles = RequestProfile.objects.select_related('user').defer('queries', 'report', 'stats')
+    paginator = Paginator(profiles, 25)
+    return render(request, 'campus/request_profiles.html', {
+        'page_obj': paginator.get_page(request.GET.get('page', 1)),
+    })
+
+
+@user_passes_test(admin_check)
+@require_GET
+def request_profile(request, profile_id):
+    """One profiled request: the profiler report and its SQL, with repeated queries flagged."""
+    profile = get_object_or_404(RequestProfile.objects.select_related('user').defer('stats'), id=profile_id)
+    return render(request, 'campus/request_profile.html', {
+        'profile': profile,
+        'duplicates': duplicate_shapes(profile.queries),
+        'slowest_queries': sorted(profile.queries, key=lambda query: query['ms'], reverse=True)[:10],
+    })
+
+
+@user_passes_test(admin_check)
+@require_GET
+def request_profile_stats(request, profile_id):
+    """The raw cProfile stats, for pstats or snakeviz."""
+    profile = get_object_or_404(RequestProfile.objects.only('id', 'stats'), id=profile_id)
+    response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="request-{profile.id}.prof"'
+    return response
+
+
+@require_GET
+def metrics_endpoint(request):
+    """Prometheus scrape endpoint for this process's metrics."""
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+    if not token_ok and not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
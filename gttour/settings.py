@@ -39,11 +39,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'campus.metrics.MetricsMiddleware',
+    'campus.queries.QueryInspectionMiddleware',
+    'campus.traffic.TrafficCaptureMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'campus.profiling.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,6 +83,49 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# File-based so that every worker process sees the same catalog versions.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+    }
+}
+
+# `manage.py test` swaps in a private in-memory cache, see gttour.test_runner.
+TEST_RUNNER = 'gttour.test_runner.CampusTestRunner'
+
+# Location photo derivatives (campus.images) are rendered on a thread pool
+# after upload; set IMAGE_DERIVATIVES_INLINE to render in the request instead.
+IMAGE_DERIVATIVE_WORKERS = 2
+IMAGE_DERIVATIVES_INLINE = False
+
+# Per-request query counts and repeated-query (N+1) warnings, see
+# campus.queries. Development only: capturing SQL costs memory and time.
+QUERY_INSPECTION = DEBUG
+QUERY_DUPLICATE_THRESHOLD = 5
+
+# Fraction of requests written to a rotating JSON-lines log for
+# `manage.py replay_traffic`, see campus.traffic. 0 turns capture off.
+TRAFFIC_CAPTURE_RATE = float(os.environ.get('TRAFFIC_CAPTURE_RATE', '0'))
+TRAFFIC_CAPTURE_FILE = BASE_DIR / 'traffic' / 'capture.jsonl'
+TRAFFIC_CAPTURE_MAX_BYTES = 10 * 1024 * 1024
+TRAFFIC_CAPTURE_BACKUPS = 5
+TRAFFIC_CAPTURE_MAX_BODY = 64 * 1024
+TRAFFIC_CAPTURE_EXCLUDE = ['/static/', '/media/', '/admin/']
+
+# Per-process request, query, external call and cache metrics, scraped from
+# campus:metrics by staff or with `Authorization: Bearer $METRICS_TOKEN`.
+METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Staff can profile a single request with ?__profile=1, see campus.profiling.
+REQUEST_PROFILING = True
+REQUEST_PROFILE_KEEP = 100
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 